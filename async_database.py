@@ -0,0 +1,89 @@
+import asyncio
+import threading
+
+import tracing
+
+# Async queries of every session run on one event loop in a daemon thread, so
+# the async connection pool (which is bound to its loop) is shared by all of them.
+_loop = None
+_loop_lock = threading.Lock()
+
+
+def _event_loop():
+    global _loop
+    with _loop_lock:
+        if _loop is None:
+            _loop = asyncio.new_event_loop()
+            threading.Thread(target=_loop.run_forever, name="async-database", daemon=True).start()
+        return _loop
+
+
+def run(coroutine):
+    """Run ``coroutine`` on the shared event loop and wait for its result."""
+    return asyncio.run_coroutine_threadsafe(coroutine, _event_loop()).result()
+
+
+class ThreadedQuery:
+    """Async facade over a sync query builder: ``execute()`` runs on a worker thread."""
+
+    def __init__(self, query):
+        self._query = query
+
+    def __getattr__(self, name):
+        attribute = getattr(self._query, name)
+        if not callable(attribute):
+            return attribute
+
+        def call(*args, **kwargs):
+            result = attribute(*args, **kwargs)
+            return ThreadedQuery(result) if hasattr(result, "execute") else result
+
+        return call
+
+    async def execute(self):
+        return await asyncio.to_thread(self._query.execute)
+
+
+class ThreadedClient:
+    """Async client for storage backends that only have a sync one (local_database.py)."""
+
+    def __init__(self, client):
+        self._client = client
+
+    def table(self, name):
+        return ThreadedQuery(self._client.table(name))
+
+
+class AsyncDatabase:
+    """Runs the independent queries of a page render concurrently.
+
+    ``gather`` takes functions building an unexecuted query from a client, e.g.
+    ``lambda db: db.table("users").select("*").eq("id", user_id)``, and returns
+    the responses in order once all of them are done, so the wait is the
+    slowest query rather than the sum of all of them.
+    """
+
+    def __init__(self, client):
+        self.client = client
+
+    def gather(self, *queries):
+        if not queries:
+            return []
+        built = [build(self.client) for build in queries]
+        with tracing.span("db.gather", queries=len(built)):
+            try:
+                responses = run(self._gather(built))
+            finally:
+                # The queries ran on the loop thread; their spans belong to this rerun
+                for query in built:
+                    if getattr(query, "span", None) is not None and query.span.end_ns is not None:
+                        tracing.attach(query.span)
+        for query, response in zip(built, responses):
+            size = tracing.payload_bytes(response.data)
+            if size is not None and getattr(query, "span", None) is not None:
+                query.span.set(bytes=size)
+        return responses
+
+    @staticmethod
+    async def _gather(queries):
+        return await asyncio.gather(*(query.execute() for query in queries))
@@ -0,0 +1,62 @@
+"""Dashboard aggregation over raw transactions: pandas passes vs one AggregateCube.
+
+The pandas side is the dashboard's former approach: masked sums for the
+totals and one groupby / pivot per chart. The cube side builds an
+``AggregateCube`` once and rolls every table up from it. Run from the
+project root:
+
+    python -m benchmarks.cube [--sizes 1000 100000 1000000] [--repeats 3]
+"""
+import argparse
+import time
+
+import pandas as pd
+
+from benchmarks.pages import SIZES, synthetic_transactions
+from logic import AggregateCube
+
+
+def pandas_passes(df):
+    income = df[df["transaction_type"] == "income"]["amount"].sum()
+    expense = df[df["transaction_type"] == "expense"]["amount"].sum()
+    trends = df.groupby(["date", "transaction_type"])["amount"].sum().reset_index()
+    heatmaps = [
+        df[df["transaction_type"] == t].pivot_table(index="category", columns="date", values="amount", aggfunc="sum")
+        for t in ("income", "expense")
+    ]
+    by_category = df.groupby(["category", "transaction_type"])["amount"].sum().reset_index()
+    category_trends = df.groupby(["date", "category"])["amount"].sum().reset_index()
+    return income - expense, trends, heatmaps, by_category, category_trends
+
+
+def cube_rollups(df):
+    cube = AggregateCube.from_frame(df)
+    heatmaps = [cube.cells(t) for t in ("income", "expense")]
+    return cube.total("income") - cube.total("expense"), cube.by_date(), heatmaps, cube.by_category(), cube.by_date("category")
+
+
+def best_of(fn, df, repeats):
+    timings = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        fn(df)
+        timings.append(time.perf_counter() - start)
+    return 1000 * min(timings)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sizes", type=int, nargs="+", default=SIZES)
+    parser.add_argument("--repeats", type=int, default=3)
+    args = parser.parse_args()
+
+    rows = []
+    for n in args.sizes:
+        df = synthetic_transactions(n).assign(date=lambda d: pd.to_datetime(d["date"]))
+        before, after = best_of(pandas_passes, df, args.repeats), best_of(cube_rollups, df, args.repeats)
+        rows.append({"rows": n, "pandas ms": before, "cube ms": after, "speedup": before / after})
+    print(pd.DataFrame(rows).to_string(index=False, float_format=lambda x: f"{x:,.1f}"))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,80 @@
+"""Fit latency and holdout error of each forecasting backend on synthetic series.
+
+Run from the project root:
+
+    python -m benchmarks.forecasting [--repeats 5] [--json results.json]
+"""
+import argparse
+import json
+import time
+
+import numpy as np
+import pandas as pd
+
+from forecasting import AUTO, BACKTEST_HORIZONS, MODELS, fit_model
+
+
+def synthetic_series(seed=0):
+    """Series shaped like personal-finance data, keyed by (name, aggregation level)."""
+    rng = np.random.default_rng(seed)
+    days = pd.date_range("2022-01-01", periods=730, freq="D")
+
+    # Expenses on ~15% of days with log-normal sizes: mostly zeros
+    sparse = np.where(rng.random(len(days)) < 0.15, rng.lognormal(3.5, 0.8, len(days)), 0.0)
+    sparse = pd.Series(sparse, index=days)
+
+    # Daily spending with a weekly cycle
+    weekly_cycle = 40 + 25 * np.sin(2 * np.pi * np.arange(len(days)) / 7)
+    dense = pd.Series(np.maximum(weekly_cycle + rng.normal(0, 8, len(days)), 0), index=days)
+
+    # Salary-like monthly income with a slow trend and a yearly bonus
+    months = pd.date_range("2019-01-31", periods=60, freq="ME")
+    monthly = 3000 + 15 * np.arange(len(months)) + np.where(months.month == 12, 1500, 0) + rng.normal(0, 100, len(months))
+
+    return {
+        ("sparse daily", "Daily"): sparse,
+        ("dense daily", "Daily"): dense,
+        ("sparse weekly", "Weekly"): sparse.resample("W").sum(),
+        ("monthly income", "Monthly"): pd.Series(monthly, index=months),
+    }
+
+
+def run(repeats=5, seed=0):
+    results = []
+    for (series_name, level), series in synthetic_series(seed).items():
+        y = series.to_numpy(dtype=float)
+        horizon = BACKTEST_HORIZONS[level]
+        train, test = y[:-horizon], y[-horizon:]
+        for model_name in [AUTO] + list(MODELS):
+            timings = []
+            for _ in range(repeats):
+                start = time.perf_counter()
+                model = fit_model(model_name, train, level)
+                timings.append(time.perf_counter() - start)
+            results.append({
+                "series": series_name,
+                "level": level,
+                "backend": model_name,
+                "selected": model.name,
+                "fit_ms": 1000 * float(np.median(timings)),
+                "mae": float(np.mean(np.abs(model.forecast(horizon) - test))),
+            })
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--repeats", type=int, default=5)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--json", help="Also write the results to this file")
+    args = parser.parse_args()
+
+    results = run(args.repeats, args.seed)
+    print(pd.DataFrame(results).to_string(index=False, float_format=lambda x: f"{x:,.2f}"))
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,78 @@
+"""Recurring-transaction detection: full build vs incremental extend of a RecurrenceIndex.
+
+Synthetic histories get merchant details: a few hundred weekly and monthly
+series among random one-off purchases. The index is built over the whole
+frame, then extended by the last ``--append`` rows as if they had just
+synced. Run from the project root:
+
+    python -m benchmarks.insights [--sizes 1000 100000 1000000] [--append 100] [--repeats 3]
+"""
+import argparse
+import time
+
+import numpy as np
+import pandas as pd
+
+from benchmarks.pages import SIZES, synthetic_transactions
+from insights import RecurrenceIndex
+from logic import TransactionFrame
+
+SERIES = 300
+
+
+def synthetic_frame(n, seed=0):
+    df = synthetic_transactions(n, seed)
+    rng = np.random.default_rng(seed)
+    df["detail"] = [f"shop {i}" for i in rng.integers(0, 20_000, size=n)]
+    # One charge per period of each series, over the same span, replacing random rows
+    days = pd.date_range(end=pd.Timestamp(df["date"].max()), periods=365 * 5, freq="D")
+    charges = []
+    for s in range(SERIES):
+        name = f"Service {chr(97 + s // 26)}{chr(97 + s % 26)}"
+        dates = days[s % 7::7] if s % 4 == 0 else days[days.day == 1 + s % 28]
+        charges.append(pd.DataFrame({"date": dates.strftime("%Y-%m-%d"), "amount": 5 + s * 1.5, "detail": name, "category": "Utilities"}))
+    charges = pd.concat(charges, ignore_index=True).iloc[:n // 2]
+    rows = rng.choice(n, size=len(charges), replace=False)
+    for column in charges.columns:
+        df.loc[rows, column] = charges[column].to_numpy()
+    df.loc[rows, "transaction_type"] = "expense"
+    # Sorted by date, as loads and syncs append them
+    df = df.sort_values("date", kind="stable", ignore_index=True)
+    return TransactionFrame.from_records(df.to_dict("records"))
+
+
+def best_of(fn, repeats):
+    timings = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        result = fn()
+        timings.append(time.perf_counter() - start)
+    return 1000 * min(timings), result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sizes", type=int, nargs="+", default=SIZES)
+    parser.add_argument("--append", type=int, default=100)
+    parser.add_argument("--repeats", type=int, default=3)
+    args = parser.parse_args()
+
+    rows = []
+    for n in args.sizes:
+        frame = synthetic_frame(n)
+        head = TransactionFrame(frame.data.iloc[:n - args.append].reset_index(drop=True))
+        build_ms, index = best_of(lambda: RecurrenceIndex.build(frame), args.repeats)
+
+        def extend():
+            partial = RecurrenceIndex.build(head)
+            start = time.perf_counter()
+            partial.extend(frame)
+            return time.perf_counter() - start
+        extend_ms = 1000 * min(extend() for _ in range(args.repeats))
+        recurring_ms, series = best_of(lambda: index.recurring(), args.repeats)
+        rows.append({"rows": n, "build ms": build_ms, "extend ms": extend_ms, "recurring ms": recurring_ms, "series": len(series)})
+    print(pd.DataFrame(rows).to_string(index=False, float_format=lambda x: f"{x:,.1f}"))
+
+
+if __name__ == "__main__":
+    main()
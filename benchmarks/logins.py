@@ -0,0 +1,102 @@
+"""Logins per second under concurrency, with a password and with a session token.
+
+A password login is what the Login button does: a bcrypt check (on the
+bounded pool in security.py) and a ``users`` row lookup. A token login is a
+returning visit: verifying the signed token and reading the cached profile.
+Both run against an in-memory ``LocalClient``. Run from the project root:
+
+    python -m benchmarks.logins [--concurrency 1 4 16] [--rounds 10] [--workers 4]
+"""
+import argparse
+import json
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+from streamlit.logger import set_log_level
+
+USERS = 32
+CONCURRENCY = [1, 4, 16]
+
+
+def seeded_client(users):
+    from local_database import LocalClient
+    client = LocalClient()
+    for i in range(users):
+        res = client.auth.sign_up({"email": f"user{i}@example.com", "password": f"password-{i}"})
+        client.table("users").insert({"id": res.user.id, "email": res.user.email, "username": f"user{i}"}).execute()
+    return client
+
+
+def measure(login, logins, concurrency):
+    latencies = []
+
+    def timed(i):
+        start = time.perf_counter()
+        login(i)
+        latencies.append(time.perf_counter() - start)
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        list(executor.map(timed, range(logins)))
+    elapsed = time.perf_counter() - start
+    return {
+        "logins_per_second": logins / elapsed,
+        "p50_ms": 1000 * float(np.percentile(latencies, 50)),
+        "p95_ms": 1000 * float(np.percentile(latencies, 95)),
+    }
+
+
+def run(concurrency=CONCURRENCY, logins=64, users=USERS):
+    import security
+
+    client = seeded_client(users)
+
+    def password_login(i):
+        n = i % users
+        res = client.auth.sign_in_with_password({"email": f"user{n}@example.com", "password": f"password-{n}"})
+        row = client.table("users").select("*").eq("id", res.user.id).single().execute().data
+        security.remember_profile(row)
+        return res.user.id
+
+    user_ids = [password_login(i) for i in range(users)]
+    tokens = [security.issue_token(user_id) for user_id in user_ids]
+    load = lambda user_id: client.table("users").select("*").eq("id", user_id).single().execute().data
+
+    def token_login(i):
+        return security.cached_profile(security.verify_token(tokens[i % users]), load)
+
+    results = []
+    for level in concurrency:
+        for kind, login, count in (("password", password_login, logins), ("token", token_login, logins * 100)):
+            results.append({"login": kind, "concurrency": level, **measure(login, count, level)})
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--concurrency", type=int, nargs="+", default=CONCURRENCY)
+    parser.add_argument("--logins", type=int, default=64, help="Password logins per concurrency level")
+    parser.add_argument("--rounds", type=int, default=12, help="bcrypt cost factor (BCRYPT_ROUNDS)")
+    parser.add_argument("--workers", type=int, help="bcrypt pool size (PASSWORD_HASH_WORKERS)")
+    parser.add_argument("--json", help="Also write the results to this file")
+    args = parser.parse_args()
+
+    # Read by security.py through get_setting; set before its first use
+    os.environ["BCRYPT_ROUNDS"] = str(args.rounds)
+    if args.workers:
+        os.environ["PASSWORD_HASH_WORKERS"] = str(args.workers)
+    set_log_level("error")
+
+    results = run(args.concurrency, args.logins)
+    print(f"{'login':<10}{'threads':>8}{'logins/s':>12}{'p50 ms':>10}{'p95 ms':>10}")
+    for r in results:
+        print(f"{r['login']:<10}{r['concurrency']:>8}{r['logins_per_second']:>12,.1f}{r['p50_ms']:>10,.2f}{r['p95_ms']:>10,.2f}")
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
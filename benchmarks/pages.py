@@ -0,0 +1,235 @@
+"""Stage timings of the Dashboard, Transactions and Analysis page pipelines.
+
+Each page's data work is replayed against an in-memory ``LocalClient`` seeded
+with synthetic transactions, without rendering anything. Run from the project
+root:
+
+    python -m benchmarks.pages [--sizes 1000 100000 1000000] [--json results.json]
+
+Results are compared with ``--baseline`` (``benchmarks/pages_baseline.json``
+by default). Timings are machine-specific, so the baseline is not checked in:
+the first run on a machine writes it, and ``--save-baseline`` overwrites it.
+The exit status is 1 when a stage regressed.
+"""
+import argparse
+import json
+import time
+import uuid
+from datetime import date
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+import plotly.express as px
+from streamlit.logger import set_log_level
+
+from charts import downsample_lines, heatmap_matrix
+from data_io import EXPORT_PAGE_SIZE, export_to_file, remove_export
+from forecasting import FREQUENCIES, fit_model
+from local_database import LocalClient
+from logic import AggregateCube, TransactionRepository
+
+USER_ID = "00000000-0000-4000-8000-000000000001"
+SIZES = [1_000, 100_000, 1_000_000]
+BASELINE = Path(__file__).with_name("pages_baseline.json")
+
+INCOME_SHARE = 0.12
+# Category mix and log-normal (mu, sigma) of the amount for each type
+INCOME_CATEGORIES = {"Salary": (0.7, 8.0, 0.15), "Investment": (0.3, 5.0, 1.0)}
+EXPENSE_CATEGORIES = {
+    "Food": (0.35, 2.8, 0.7),
+    "Transport": (0.18, 2.5, 0.6),
+    "Entertainment": (0.12, 3.3, 0.8),
+    "Utilities": (0.08, 4.4, 0.4),
+    "Health": (0.07, 3.8, 1.0),
+    "Education": (0.05, 4.8, 0.9),
+    "Other": (0.15, 3.0, 1.1),
+}
+
+
+def _draw(rng, categories, n):
+    names = list(categories)
+    share, mu, sigma = (np.array(values) for values in zip(*categories.values()))
+    picks = rng.choice(len(names), size=n, p=share / share.sum())
+    return np.array(names)[picks], np.round(rng.lognormal(mu[picks], sigma[picks]), 2)
+
+
+def synthetic_transactions(n, seed=0, years=5, end=date(2024, 12, 31)):
+    """``n`` transactions spread over ``years`` years, busier on weekends."""
+    rng = np.random.default_rng(seed)
+    days = pd.date_range(end=end, periods=365 * years, freq="D")
+    weights = np.where(days.dayofweek >= 5, 1.3, 1.0)
+    dates = days[rng.choice(len(days), size=n, p=weights / weights.sum())]
+
+    is_income = rng.random(n) < INCOME_SHARE
+    income_category, income_amount = _draw(rng, INCOME_CATEGORIES, n)
+    expense_category, expense_amount = _draw(rng, EXPENSE_CATEGORIES, n)
+    return pd.DataFrame({
+        "id": [str(uuid.UUID(bytes=bytes(b))) for b in rng.integers(0, 256, size=(n, 16), dtype=np.uint8)],
+        "user_id": USER_ID,
+        "amount": np.where(is_income, income_amount, expense_amount),
+        "category": np.where(is_income, income_category, expense_category),
+        "detail": "",
+        "transaction_type": np.where(is_income, "income", "expense"),
+        "date": dates.strftime("%Y-%m-%d"),
+    })
+
+
+def seeded_client(n, seed=0):
+    client = LocalClient()
+    df = synthetic_transactions(n, seed)
+    with client.lock, client.connection as connection:
+        connection.executemany(
+            f"INSERT INTO transactions ({', '.join(df.columns)}) VALUES ({', '.join('?' * len(df.columns))})",
+            df.itertuples(index=False, name=None),
+        )
+    return client
+
+
+class StageTimer:
+    def __init__(self):
+        self.timings = {}
+
+    def __call__(self, page, stage, fn):
+        start = time.perf_counter()
+        result = fn()
+        self.timings.setdefault((page, stage), []).append(time.perf_counter() - start)
+        return result
+
+
+def dashboard(repository, timer):
+    daily_totals = timer("Dashboard", "fetch", lambda: repository.daily_totals(USER_ID))
+
+    def aggregate():
+        cube = AggregateCube.from_frame(daily_totals)
+        heatmaps = [
+            heatmap_matrix(cells["date"], cells["category"], cells["amount"])[0]
+            for cells in (cube.cells(t) for t in ("income", "expense"))
+        ]
+        return cube, cube.total("income") - cube.total("expense"), heatmaps
+
+    cube, _, heatmaps = timer("Dashboard", "aggregate", aggregate)
+    grouped = timer("Dashboard", "downsample", lambda: downsample_lines(cube.by_date(), "date", "amount", color="transaction_type"))
+    timer("Dashboard", "figures", lambda: [
+        px.line(grouped, x="date", y="amount", color="transaction_type"),
+        *[px.imshow(heatmap) for heatmap in heatmaps],
+        px.bar(cube.by_category(), x="category", y="amount", color="transaction_type"),
+    ])
+
+
+def transactions(repository, timer):
+    frame, _, cursor = timer("Transactions", "first page", lambda: repository.page(USER_ID))
+    timer("Transactions", "to DataFrame", frame.to_pandas)
+
+    def deep_pages(after=cursor):
+        for _ in range(10):
+            if after is None:
+                break
+            _, _, after = repository.page(USER_ID, after=after)
+
+    timer("Transactions", "next 10 pages", deep_pages)
+    timer("Transactions", "filtered page", lambda: repository.page(
+        USER_ID, start_date=date(2023, 1, 1), end_date=date(2023, 12, 31), category="Food", transaction_type="expense"
+    ))
+    timer("Transactions", "export parquet", lambda: remove_export(export_to_file(
+        repository.iter_pages(USER_ID, page_size=EXPORT_PAGE_SIZE), "Parquet"
+    )))
+
+
+def analysis(repository, timer):
+    df, category_totals = timer("Analysis", "fetch", lambda: (
+        repository.daily_totals(USER_ID).set_index("date").sort_index(), repository.category_totals(USER_ID)
+    ))
+    start, end = df.index.min(), df.index.max()
+    timer("Analysis", "filters", lambda: df[(df.index >= start) & (df.index <= end) & (df["category"] == "Food")])
+
+    def resample():
+        daily = df.resample("D").sum(numeric_only=True)["amount"]
+        income_expense = df.groupby(["date", "transaction_type"])["amount"].sum().unstack(fill_value=0)
+        income_expense = income_expense.reindex(pd.date_range(start, end), fill_value=0)
+        income = df[df["transaction_type"] == "income"].resample(FREQUENCIES["Daily"]).sum(numeric_only=True)["amount"]
+        expense = df[df["transaction_type"] == "expense"].resample(FREQUENCIES["Daily"]).sum(numeric_only=True)["amount"]
+        return daily, income_expense, income, expense
+
+    daily, income_expense, income, expense = timer("Analysis", "resample", resample)
+    # Fitted directly: the app memoizes fits, this measures the fit itself
+    fits = timer("Analysis", "arima fit", lambda: [
+        fit_model("ARIMA", series.to_numpy(dtype=float), "Daily") for series in (income, expense)
+    ])
+    timer("Analysis", "figures", lambda: [
+        px.line(downsample_lines(daily.reset_index(), "date", "amount"), x="date", y="amount"),
+        px.line(downsample_lines(income_expense.rename_axis("date").reset_index(), "date", ["income", "expense"]),
+                x="date", y="value", color="variable"),
+        *[px.line(x=series.index, y=series.values) for series in (income, expense)],
+        *[fit.forecast(30) for fit in fits],
+        px.pie(category_totals.groupby("transaction_type")["amount"].sum().reset_index(), values="amount", names="transaction_type"),
+    ])
+    timer("Analysis", "transaction table", lambda: repository.frame(USER_ID).to_pandas().set_index("date").sort_index())
+
+
+def run(sizes=SIZES, repeats=3, seed=0):
+    # One untimed pass first, so lazy imports and Plotly's template loading are not billed to a stage
+    warm_up = TransactionRepository(seeded_client(100, seed))
+    for page in (dashboard, transactions, analysis):
+        page(warm_up, StageTimer())
+
+    results = []
+    for n in sizes:
+        repository = TransactionRepository(seeded_client(n, seed))
+        timer = StageTimer()
+        for _ in range(repeats):
+            for page in (dashboard, transactions, analysis):
+                repository.invalidate()  # every repeat starts cold
+                page(repository, timer)
+        for (page, stage), timings in timer.timings.items():
+            results.append({"rows": n, "page": page, "stage": stage, "ms": 1000 * float(np.median(timings))})
+    return results
+
+
+def regressions(results, baseline, tolerance=0.5, min_ms=10.0):
+    """Stages slower than the baseline by more than ``tolerance`` (and ``min_ms``)."""
+    previous = {(r["rows"], r["page"], r["stage"]): r["ms"] for r in baseline}
+    flagged = []
+    for result in results:
+        before = previous.get((result["rows"], result["page"], result["stage"]))
+        if before is not None and result["ms"] > before * (1 + tolerance) and result["ms"] - before > min_ms:
+            flagged.append(dict(result, baseline_ms=before, change=result["ms"] / before - 1))
+    return flagged
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sizes", type=int, nargs="+", default=SIZES)
+    parser.add_argument("--repeats", type=int, default=3)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--json", help="Also write the results to this file")
+    parser.add_argument("--baseline", default=str(BASELINE))
+    parser.add_argument("--tolerance", type=float, default=0.5, help="Allowed slowdown before flagging (0.5 = 50%%)")
+    parser.add_argument("--min-ms", type=float, default=10.0, help="Ignore slowdowns smaller than this")
+    parser.add_argument("--save-baseline", action="store_true", help="Overwrite the baseline with these results")
+    args = parser.parse_args()
+
+    # Outside `streamlit run`, session state works but warns on every access
+    set_log_level("error")
+    results = run(args.sizes, args.repeats, args.seed)
+    print(pd.DataFrame(results).to_string(index=False, float_format=lambda x: f"{x:,.1f}"))
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(results, f, indent=2)
+
+    baseline = Path(args.baseline)
+    if args.save_baseline or not baseline.exists():
+        baseline.write_text(json.dumps(results, indent=2) + "\n")
+        print(f"\nSaved the baseline to {baseline}")
+        return
+    flagged = regressions(results, json.loads(baseline.read_text()), args.tolerance, args.min_ms)
+    if flagged:
+        print(f"\n{len(flagged)} stage(s) regressed against {baseline}:")
+        for r in flagged:
+            print(f"  {r['rows']:>9,} rows  {r['page']} / {r['stage']}: {r['baseline_ms']:,.1f} -> {r['ms']:,.1f} ms ({r['change']:+.0%})")
+        raise SystemExit(1)
+    print(f"\nNo regressions against {baseline}")
+
+
+if __name__ == "__main__":
+    main()
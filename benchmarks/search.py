@@ -0,0 +1,64 @@
+"""Transaction search: SearchIndex build, query latency, and incremental updates.
+
+Uses the histories of ``benchmarks.insights`` (merchant details, a few
+hundred recurring series). Each query asks for the third page of results,
+so ranking cannot stop at the first few matches. Run from the project root:
+
+    python -m benchmarks.search [--sizes 1000 100000 1000000] [--repeats 3]
+"""
+import argparse
+import time
+
+import pandas as pd
+
+from benchmarks.insights import synthetic_frame
+from benchmarks.pages import SIZES
+from logic import TransactionFrame
+from search import SearchIndex
+
+QUERIES = [
+    ("service", {}),
+    ("shop 12", {}),
+    ("s", {}),
+    ("", {"category": "Food"}),
+    ("shop", {"min_cents": 1_000, "max_cents": 5_000}),
+    ("no such merchant", {}),
+]
+
+
+def best_of(fn, repeats):
+    timings = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        fn()
+        timings.append(time.perf_counter() - start)
+    return 1000 * min(timings)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sizes", type=int, nargs="+", default=SIZES)
+    parser.add_argument("--repeats", type=int, default=3)
+    args = parser.parse_args()
+
+    rows = []
+    for n in args.sizes:
+        frame = synthetic_frame(n)
+        row = {"rows": n, "build ms": best_of(lambda: SearchIndex.build(frame), args.repeats)}
+        index = SearchIndex.build(frame)
+        for query, filters in QUERIES:
+            label = f"{query or '*'} {' '.join(f'{k}={v}' for k, v in filters.items())}".strip()
+            row[label] = best_of(lambda: index.search(query, offset=100, **filters), args.repeats)
+
+        head = TransactionFrame(frame.data.iloc[:n - 100].reset_index(drop=True))
+        partial = SearchIndex.build(head)
+        row["extend by 100 rows ms"] = best_of(lambda: partial.extend(frame), 1)
+        dropped = frame.has_ids(frame.ids.iloc[[n // 2]])
+        remaining = frame.drop_rows(dropped)
+        row["drop 1 row ms"] = best_of(lambda: index.drop_rows(dropped, remaining), 1)
+        rows.append(row)
+    print(pd.DataFrame(rows).set_index("rows").T.to_string(float_format=lambda x: f"{x:,.1f}"))
+
+
+if __name__ == "__main__":
+    main()
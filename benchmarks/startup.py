@@ -0,0 +1,70 @@
+"""Cold-start time of the app: importing it and rendering the Auth page once.
+
+Every repeat runs in a fresh interpreter, so nothing is already imported.
+Streamlit's own import is timed separately and left out of the app timings.
+Run from the project root:
+
+    python -m benchmarks.startup [--repeats 5] [--json results.json]
+
+Besides the timings, the heavy modules loaded by the first render are listed:
+the sign-in page should not need any of them.
+"""
+import argparse
+import json
+import statistics
+import subprocess
+import sys
+
+HEAVY_MODULES = ["pandas", "numpy", "pyarrow", "plotly.express", "statsmodels", "supabase", "httpx"]
+
+# Runs in the child interpreter; prints one JSON line of timings
+PROBE = """
+import json, sys, time
+start = time.perf_counter()
+import streamlit
+from streamlit.testing.v1 import AppTest
+streamlit_loaded = time.perf_counter()
+import main
+imported = time.perf_counter()
+app = AppTest.from_file("main.py", default_timeout=60).run()
+rendered = time.perf_counter()
+assert not app.exception, app.exception
+print(json.dumps({
+    "streamlit_ms": 1000 * (streamlit_loaded - start),
+    "import_ms": 1000 * (imported - streamlit_loaded),
+    "first_render_ms": 1000 * (rendered - streamlit_loaded),
+    "loaded": [name for name in %r if name in sys.modules],
+}))
+""" % (HEAVY_MODULES,)
+
+
+def measure():
+    output = subprocess.run([sys.executable, "-c", PROBE], capture_output=True, text=True, check=True).stdout
+    return json.loads(output.strip().splitlines()[-1])
+
+
+def run(repeats=5):
+    samples = [measure() for _ in range(repeats)]
+    result = {key: statistics.median(s[key] for s in samples) for key in ("streamlit_ms", "import_ms", "first_render_ms")}
+    result["loaded"] = sorted({name for s in samples for name in s["loaded"]})
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--repeats", type=int, default=5)
+    parser.add_argument("--json", help="Also write the results to this file")
+    args = parser.parse_args()
+
+    result = run(args.repeats)
+    print(f"streamlit import         {result['streamlit_ms']:8,.1f} ms (not counted)")
+    print(f"app import               {result['import_ms']:8,.1f} ms")
+    print(f"Auth page first render   {result['first_render_ms']:8,.1f} ms")
+    print(f"heavy modules loaded     {', '.join(result['loaded']) or 'none'}")
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(result, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
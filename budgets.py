@@ -0,0 +1,284 @@
+import time
+import uuid
+from collections import defaultdict
+from datetime import date
+
+import streamlit as st
+
+# Category key of the every-category totals, and of limits on all spending
+ALL = "*"
+KINDS = {"limit": "Monthly spending limit", "savings": "Monthly savings goal"}
+# Share of a limit at which it warns
+WARNING_SHARE = 0.8
+# Levels worth an alert when a write moves a budget into them
+ALERT_LEVELS = ("warning", "over", "reached")
+
+
+def month_of(value) -> str:
+    # "YYYY-MM" of a date or an ISO date string
+    return value.isoformat()[:7] if isinstance(value, date) else str(value)[:7]
+
+
+def cents(amount) -> int:
+    return int(round(float(amount) * 100))
+
+
+class Budget:
+    """A monthly spending limit on a category (or on ``ALL`` spending), or a monthly savings goal.
+
+    A limit watches its category's expense total; a savings goal watches the
+    month's income and expense totals over every category.
+    """
+
+    __slots__ = ("id", "user_id", "kind", "category", "amount")
+
+    def __init__(self, id, user_id, kind, category, amount):
+        if kind not in KINDS:
+            raise ValueError(f"Unknown budget kind: {kind}")
+        self.id = id
+        self.user_id = user_id
+        self.kind = kind
+        self.category = ALL if kind == "savings" or category is None else category
+        self.amount = float(amount)
+
+    @classmethod
+    def create(cls, user_id, kind, category, amount):
+        return cls(str(uuid.uuid4()), user_id, kind, category, amount)
+
+    @classmethod
+    def from_row(cls, row):
+        return cls(row["id"], row["user_id"], row["kind"], row["category"], row["amount"])
+
+    def to_dict(self):
+        return {
+            "id": self.id,
+            "user_id": self.user_id,
+            "kind": self.kind,
+            "category": None if self.category == ALL else self.category,
+            "amount": self.amount,
+        }
+
+    @property
+    def label(self):
+        if self.kind == "savings":
+            return "Savings goal"
+        return f"{'All spending' if self.category == ALL else self.category} limit"
+
+    def watches(self):
+        """The (category, type) totals this budget depends on."""
+        if self.kind == "limit":
+            return [(self.category, "expense")]
+        return [(ALL, "income"), (ALL, "expense")]
+
+    def value(self, totals, month) -> int:
+        # Spent (limits) or saved (goals) in ``month``, in cents
+        if self.kind == "limit":
+            return totals.get((month, self.category, "expense"), 0)
+        return totals.get((month, ALL, "income"), 0) - totals.get((month, ALL, "expense"), 0)
+
+    def level(self, value) -> str:
+        target = cents(self.amount)
+        if self.kind == "savings":
+            return "reached" if value >= target else "behind"
+        if value > target:
+            return "over"
+        return "warning" if value >= WARNING_SHARE * target else "ok"
+
+
+class BudgetStatus:
+    __slots__ = ("budget", "month", "value", "level")
+
+    def __init__(self, budget, month, value, level):
+        self.budget = budget
+        self.month = month
+        self.value = value / 100
+        self.level = level
+
+    @property
+    def share(self):
+        return self.value / self.budget.amount if self.budget.amount else 0.0
+
+    @property
+    def message(self):
+        budget = self.budget
+        if budget.kind == "savings":
+            return f"Savings goal reached for {self.month}: ${self.value:,.2f} of ${budget.amount:,.2f} saved"
+        if self.level == "over":
+            return f"{budget.label} exceeded for {self.month}: ${self.value:,.2f} of ${budget.amount:,.2f}"
+        return f"{budget.label} at {self.share:.0%} for {self.month}: ${self.value:,.2f} of ${budget.amount:,.2f}"
+
+
+class BudgetLedger:
+    """Running monthly totals of one user, in cents, and the budgets watching them.
+
+    ``totals`` maps (month, category, transaction type) to the sum of
+    amounts, with ``ALL`` as the category of the every-category sums.
+    ``apply`` patches the two cells a transaction falls in and re-evaluates
+    only the budgets watching those cells, so a write costs the same however
+    long the history is.
+    """
+
+    def __init__(self, budgets=(), totals=None):
+        self.totals = defaultdict(int, totals or {})
+        self.budgets = {}
+        self.watchers = defaultdict(list)
+        self.built_at = time.monotonic()
+        for budget in budgets:
+            self.add_budget(budget)
+
+    @classmethod
+    def from_rows(cls, budgets, monthly_totals):
+        """Full recompute from ``budgets`` rows and ``transaction_monthly_totals`` rows."""
+        totals = defaultdict(int)
+        for row in monthly_totals:
+            amount = cents(row["amount"])
+            totals[(row["month"], row["category"], row["transaction_type"])] += amount
+            totals[(row["month"], ALL, row["transaction_type"])] += amount
+        return cls([Budget.from_row(row) for row in budgets], totals)
+
+    def add_budget(self, budget):
+        self.budgets[budget.id] = budget
+        for key in budget.watches():
+            self.watchers[key].append(budget)
+
+    def remove_budget(self, budget_id):
+        budget = self.budgets.pop(budget_id, None)
+        if budget is not None:
+            for key in budget.watches():
+                self.watchers[key].remove(budget)
+
+    def apply(self, row, sign=1):
+        """Add (``sign=1``) or remove (-1) one transaction row; returns the alerts it raised."""
+        month, category, kind = month_of(row["date"]), row["category"], row["transaction_type"]
+        watching = self.watchers.get((category, kind), []) + self.watchers.get((ALL, kind), [])
+        before = [budget.level(budget.value(self.totals, month)) for budget in watching]
+        amount = sign * cents(row["amount"])
+        self.totals[(month, category, kind)] += amount
+        self.totals[(month, ALL, kind)] += amount
+        alerts = []
+        for budget, previous in zip(watching, before):
+            status = self.status(budget, month)
+            if status.level != previous and status.level in ALERT_LEVELS:
+                alerts.append(status)
+        return alerts
+
+    def status(self, budget, month):
+        value = budget.value(self.totals, month)
+        return BudgetStatus(budget, month, value, budget.level(value))
+
+    def statuses(self, month):
+        return [self.status(budget, month) for budget in self.budgets.values()]
+
+    def months(self):
+        """Months with any transaction, newest first."""
+        return sorted({month for month, category, _ in self.totals if category == ALL}, reverse=True)
+
+    def drift(self, other):
+        """``{cell: (ours, theirs)}`` for the totals that differ from ``other``'s."""
+        cells = set(self.totals) | set(other.totals)
+        return {
+            cell: (self.totals.get(cell, 0), other.totals.get(cell, 0))
+            for cell in cells
+            if self.totals.get(cell, 0) != other.totals.get(cell, 0)
+        }
+
+
+class BudgetEngine:
+    """Budgets and savings goals, evaluated against running monthly totals.
+
+    A user's ``BudgetLedger`` is built by one full recompute (their
+    ``budgets`` rows and the ``transaction_monthly_totals`` view, see
+    schema.sql), at the latest right before their first write, and from then
+    on patched by every insert and delete the ``TransactionRepository`` makes. Alerts raised by those writes are queued
+    for the page (``pop_alerts``). Writes made elsewhere (another device or
+    session) are picked up by rebuilding the ledger when it is read
+    (``ledger``, ``statuses``) more than ``reconcile_interval`` seconds after
+    the last build, or on demand with ``reconcile``. Writes never rebuild it.
+    """
+
+    TABLE = "budgets"
+    MONTHLY_TOTALS = "transaction_monthly_totals"
+
+    def __init__(self, client, reconcile_interval=300.0, async_database=None):
+        self.client = client
+        self.reconcile_interval = reconcile_interval
+        # Runs the two queries of a recompute concurrently
+        self.async_database = async_database
+
+    @property
+    def _ledgers(self):
+        if "budget_ledgers" not in st.session_state:
+            st.session_state.budget_ledgers = {}
+        return st.session_state.budget_ledgers
+
+    @property
+    def _alerts(self):
+        if "budget_alerts" not in st.session_state:
+            st.session_state.budget_alerts = {}
+        return st.session_state.budget_alerts
+
+    def _build(self, user_id):
+        queries = [
+            lambda client: client.table(self.TABLE).select("*").eq("user_id", user_id),
+            lambda client: client.table(self.MONTHLY_TOTALS).select("*").eq("user_id", user_id),
+        ]
+        if self.async_database is not None:
+            budgets, totals = self.async_database.gather(*queries)
+        else:
+            budgets, totals = [query(self.client).execute() for query in queries]
+        return BudgetLedger.from_rows(budgets.data, totals.data)
+
+    def ledger(self, user_id) -> BudgetLedger:
+        ledger = self._ledgers.get(user_id)
+        if ledger is None or time.monotonic() - ledger.built_at >= self.reconcile_interval:
+            ledger = self._ledgers[user_id] = self._build(user_id)
+        return ledger
+
+    def prepare(self, user_id):
+        """Build the user's ledger if there is none yet, before a write is applied to it.
+
+        An existing ledger is kept however old it is, so a write only ever patches it.
+        """
+        if user_id not in self._ledgers:
+            self._ledgers[user_id] = self._build(user_id)
+
+    def reconcile(self, user_id) -> dict:
+        """Recompute the user's totals from the database; returns the cells the running totals had wrong."""
+        previous = self._ledgers.get(user_id)
+        ledger = self._ledgers[user_id] = self._build(user_id)
+        return {} if previous is None else previous.drift(ledger)
+
+    def apply(self, user_id, rows, sign=1):
+        """Patch the running totals with inserted (``sign=1``) or deleted (-1) transaction rows."""
+        ledger = self._ledgers.get(user_id)
+        if ledger is None:
+            return  # not built yet; the recompute will include these rows
+        alerts = []
+        for row in rows:
+            alerts.extend(ledger.apply(row, sign))
+        if alerts:
+            self._alerts.setdefault(user_id, []).extend(alerts)
+
+    def pop_alerts(self, user_id):
+        return self._alerts.pop(user_id, [])
+
+    def statuses(self, user_id, month=None):
+        return self.ledger(user_id).statuses(month or month_of(date.today()))
+
+    def add_budget(self, budget: Budget):
+        self.client.table(self.TABLE).insert(budget.to_dict()).execute()
+        ledger = self._ledgers.get(budget.user_id)
+        if ledger is not None:
+            ledger.add_budget(budget)
+
+    def delete_budget(self, user_id, budget_id):
+        self.client.table(self.TABLE).delete().eq("id", budget_id).eq("user_id", user_id).execute()
+        ledger = self._ledgers.get(user_id)
+        if ledger is not None:
+            ledger.remove_budget(budget_id)
+
+    def invalidate(self, user_id=None):
+        if user_id is None:
+            self._ledgers.clear()
+        else:
+            self._ledgers.pop(user_id, None)
@@ -0,0 +1,139 @@
+import numpy as np
+import pandas as pd
+
+HEATMAP_MAX_COLUMNS = 120
+
+# Bucket resolutions from finest to coarsest: (label, numpy unit, days per bucket)
+RESOLUTIONS = [("Day", "D", 1), ("Week", "W", 7), ("Month", "M", 30.44), ("Quarter", "Q", 91.31), ("Year", "Y", 365.25)]
+
+
+def _bucket_codes(days: np.ndarray, unit: str) -> np.ndarray:
+    # Integer bucket number per date; `days` counts days since 1970-01-01 (a Thursday)
+    if unit == "D":
+        return days
+    if unit == "W":
+        return (days + 3) // 7  # Monday-based weeks
+    months = days.astype("datetime64[D]").astype("datetime64[M]").astype(np.int64)
+    if unit == "M":
+        return months
+    if unit == "Q":
+        return months // 3
+    return months // 12
+
+
+def _bucket_starts(codes: np.ndarray, unit: str) -> pd.DatetimeIndex:
+    if unit == "D":
+        starts = codes.astype("datetime64[D]")
+    elif unit == "W":
+        starts = (codes * 7 - 3).astype("datetime64[D]")
+    else:
+        months = {"M": 1, "Q": 3, "Y": 12}[unit] * codes
+        starts = months.astype("datetime64[M]")
+    return pd.DatetimeIndex(starts.astype("datetime64[ns]"))
+
+
+def heatmap_matrix(dates, categories, amounts, max_columns=HEATMAP_MAX_COLUMNS):
+    """Sum ``amounts`` into a category x time-bucket matrix for ``px.imshow``.
+
+    The bucket size is the finest of day/week/month/quarter/year that fits the
+    date span into ``max_columns`` columns (widened to multi-year buckets if
+    even years do not), so the output stays bounded however long the history
+    is. Cells are filled with a single ``np.bincount`` instead of a pivot table.
+    Returns ``(matrix, resolution_label)``.
+    """
+    days = pd.DatetimeIndex(dates).to_numpy().astype("datetime64[D]").astype(np.int64)
+    if len(days) == 0:
+        return pd.DataFrame(), RESOLUTIONS[0][0]
+
+    span = days.max() - days.min() + 1
+    label, unit, _ = next(
+        (resolution for resolution in RESOLUTIONS if span / resolution[2] <= max_columns), RESOLUTIONS[-1]
+    )
+    codes = _bucket_codes(days, unit)
+    first = codes.min()
+    width = max(1, -(-(codes.max() - first + 1) // max_columns))  # buckets merged per column
+    columns = (codes - first) // width
+    n_columns = int(columns.max()) + 1
+    if width > 1:
+        label = f"{width} {label}s"
+
+    category_codes, category_labels = pd.factorize(pd.Series(categories).astype(str), sort=True)
+    cells = np.bincount(
+        category_codes * n_columns + columns,
+        weights=np.asarray(amounts, dtype=float),
+        minlength=len(category_labels) * n_columns,
+    ).reshape(len(category_labels), n_columns)
+
+    matrix = pd.DataFrame(
+        cells,
+        index=pd.Index(category_labels, name="category"),
+        columns=_bucket_starts(first + np.arange(n_columns) * width, unit),
+    )
+    return matrix, label
+
+
+LINE_MAX_POINTS = 1000
+
+
+def lttb_indices(x: np.ndarray, y: np.ndarray, n_out: int) -> np.ndarray:
+    """Largest-Triangle-Three-Buckets: indices of ``n_out`` points that keep the line's shape.
+
+    ``x`` must be sorted and numeric. The first and last points are always kept;
+    from every bucket in between, the point forming the largest triangle with
+    the previously kept point and the next bucket's average is chosen.
+    """
+    n = len(y)
+    if n_out >= n or n_out < 3:
+        return np.arange(n)
+    x = np.asarray(x, dtype=float)
+    y = np.asarray(y, dtype=float)
+    edges = np.append(np.linspace(1, n - 1, n_out - 1).astype(np.int64), n)
+    selected = np.empty(n_out, dtype=np.int64)
+    selected[0], selected[-1] = 0, n - 1
+    a = 0
+    for i in range(n_out - 2):
+        start, end, next_end = edges[i], edges[i + 1], edges[i + 2]
+        avg_x, avg_y = x[end:next_end].mean(), y[end:next_end].mean()
+        area = np.abs((x[a] - avg_x) * (y[start:end] - y[a]) - (x[a] - x[start:end]) * (avg_y - y[a]))
+        a = start + int(np.argmax(area))
+        selected[i + 1] = a
+    return selected
+
+
+def minmax_indices(y: np.ndarray, n_out: int) -> np.ndarray:
+    """Min/max decimation: keep the lowest and highest point of ``n_out // 2`` equal buckets."""
+    n = len(y)
+    if n_out >= n or n_out < 2:
+        return np.arange(n)
+    buckets = np.arange(n) * (n_out // 2) // n
+    order = np.lexsort((y, buckets))
+    starts = np.flatnonzero(np.r_[True, buckets[order][1:] != buckets[order][:-1]])
+    ends = np.r_[starts[1:], n] - 1
+    return np.unique(np.concatenate([order[starts], order[ends]]))
+
+
+def downsample_lines(df: pd.DataFrame, x: str, y, color=None, max_points=LINE_MAX_POINTS, method="lttb") -> pd.DataFrame:
+    """Reduce every trace of a ``px.line`` frame to at most ``max_points`` points.
+
+    Each ``color`` group (or, when ``y`` is a list of columns, each column) is
+    downsampled on its own. Wide input is returned in long form with
+    ``variable``/``value`` columns, as Plotly Express would use.
+    """
+    if isinstance(y, list):
+        df = df.melt(id_vars=[x], value_vars=y, var_name="variable", value_name="value")
+        y, color = "value", "variable"
+
+    groups = [df] if color is None else [group for _, group in df.groupby(color, sort=False, observed=True)]
+    parts = []
+    for group in groups:
+        group = group.sort_values(x)
+        values = group[y].to_numpy(dtype=float)
+        if method == "minmax":
+            keep = minmax_indices(values, max_points)
+        else:
+            positions = group[x].to_numpy()
+            if np.issubdtype(positions.dtype, np.datetime64):
+                positions = positions.astype("datetime64[ns]").astype(np.int64)
+            keep = lttb_indices(positions, values, max_points)
+        parts.append(group.iloc[keep])
+    return pd.concat(parts, ignore_index=True) if parts else df
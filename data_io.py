@@ -0,0 +1,290 @@
+import os
+import re
+import tempfile
+import time
+from itertools import islice
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.csv as pa_csv
+import pyarrow.parquet as pq
+import xlsxwriter
+
+from logic import CATEGORIES, TRANSACTION_TYPES, generate_uuid
+
+# Export format -> (file extension, MIME type)
+EXPORT_FORMATS = {
+    "Parquet": ("parquet", "application/vnd.apache.parquet"),
+    "CSV": ("csv", "text/csv"),
+    "Arrow": ("arrow", "application/vnd.apache.arrow.file"),
+    "Excel": ("xlsx", "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"),
+}
+EXPORT_SCHEMA = pa.schema([
+    ("id", pa.string()),
+    ("date", pa.date32()),
+    ("category", pa.string()),
+    ("transaction_type", pa.string()),
+    ("amount", pa.float64()),
+    ("detail", pa.string()),
+])
+EXPORT_PAGE_SIZE = 5_000
+LARGE_EXPORT_ROWS = 50_000
+
+
+def default_export_format(row_count: int) -> str:
+    # Parquet is columnar and compressed: far smaller and faster to write for big exports
+    return "Parquet" if row_count >= LARGE_EXPORT_ROWS else "CSV"
+
+
+def _write_excel(pages, sink):
+    # constant_memory flushes each row as it is written, so memory stays flat
+    workbook = xlsxwriter.Workbook(sink, {"constant_memory": True})
+    sheet = workbook.add_worksheet("Transactions")
+    date_format = workbook.add_format({"num_format": "yyyy-mm-dd"})
+    sheet.write_row(0, 0, EXPORT_SCHEMA.names)
+    row = 1
+    for table in pages:
+        for record in table.to_pylist():
+            sheet.write_string(row, 0, record["id"])
+            sheet.write_datetime(row, 1, record["date"], date_format)
+            sheet.write_string(row, 2, record["category"] or "")
+            sheet.write_string(row, 3, record["transaction_type"] or "")
+            sheet.write_number(row, 4, record["amount"])
+            sheet.write_string(row, 5, record["detail"] or "")
+            row += 1
+    workbook.close()
+
+
+def _write_export(pages, export_format, sink):
+    tables = (page.to_arrow().cast(EXPORT_SCHEMA) for page in pages)
+
+    if export_format == "Excel":
+        _write_excel(tables, sink)
+    else:
+        if export_format == "Parquet":
+            writer = pq.ParquetWriter(sink, EXPORT_SCHEMA, compression="zstd")
+        elif export_format == "Arrow":
+            writer = pa.ipc.new_file(sink, EXPORT_SCHEMA)
+        else:
+            writer = pa_csv.CSVWriter(sink, EXPORT_SCHEMA)
+        with writer:
+            for table in tables:
+                writer.write_table(table)
+
+
+def export_to_file(pages, export_format: str) -> str:
+    """Write ``TransactionFrame`` pages to a named temporary file, one page at a time.
+
+    Amounts are exported as raw numbers, not display strings. Only the current
+    page and the writer's buffers are held in memory. The file outlives the
+    call: returns its path; remove it with ``remove_export`` once it is
+    downloaded.
+    """
+    if export_format not in EXPORT_FORMATS:
+        raise ValueError(f"Unknown export format: {export_format}")
+    extension, _ = EXPORT_FORMATS[export_format]
+    descriptor, path = tempfile.mkstemp(prefix="savvysmart-export-", suffix=f".{extension}")
+    try:
+        with open(descriptor, "wb") as sink:
+            _write_export(pages, export_format, sink)
+    except BaseException:
+        remove_export(path)
+        raise
+    return path
+
+
+def remove_export(path):
+    try:
+        os.remove(path)
+    except FileNotFoundError:
+        pass
+
+
+IMPORT_FORMATS = ["csv", "xlsx", "ofx", "qfx"]
+IMPORT_CHUNK_ROWS = 5_000
+IMPORT_BATCH_SIZE = 500
+IMPORT_MAX_WORKERS = 4
+
+# Accepted header names (lower-case) for each transaction field
+IMPORT_COLUMNS = {
+    "date": ["date", "transaction date", "posted date", "posting date", "booking date"],
+    "amount": ["amount", "value", "sum"],
+    "category": ["category"],
+    "detail": ["detail", "description", "memo", "name", "payee", "details"],
+    "transaction_type": ["transaction_type", "transaction type", "type"],
+}
+TYPE_ALIASES = {
+    "income": "income", "credit": "income", "deposit": "income", "cr": "income",
+    "expense": "expense", "debit": "expense", "withdrawal": "expense", "dr": "expense",
+}
+HASH_COLUMNS = ["date", "amount", "category", "transaction_type", "detail"]
+
+OFX_TRANSACTION = re.compile(r"<STMTTRN>(.*?)</STMTTRN>", re.S | re.I)
+OFX_FIELD = re.compile(r"<(\w+)>([^<\r\n]*)")
+
+
+class ImportReport:
+    def __init__(self):
+        self.rows_read = 0
+        self.inserted = 0
+        self.duplicates = 0
+        self.rejected = 0
+        self.batches = 0
+        self.errors = []  # (batch number, message)
+        self.seconds = 0.0
+
+    @property
+    def rows_per_second(self):
+        return self.rows_read / self.seconds if self.seconds else 0.0
+
+
+def _read_csv(file, chunk_rows):
+    yield from pd.read_csv(file, dtype=str, chunksize=chunk_rows, skipinitialspace=True)
+
+
+def _read_xlsx(file, chunk_rows):
+    from openpyxl import load_workbook
+
+    # read_only streams rows from the sheet XML instead of loading the workbook
+    workbook = load_workbook(file, read_only=True, data_only=True)
+    try:
+        rows = workbook.active.iter_rows(values_only=True)
+        header = [str(name) for name in next(rows, ())]
+        while chunk := list(islice(rows, chunk_rows)):
+            yield pd.DataFrame(chunk, columns=header)
+    finally:
+        workbook.close()
+
+
+def _read_ofx(file, chunk_rows):
+    # OFX 1.x is SGML (closing tags optional), so fields are matched by regex, not XML
+    text = file.read()
+    if isinstance(text, bytes):
+        text = text.decode("utf-8", errors="replace")
+    records = []
+    for match in OFX_TRANSACTION.finditer(text):
+        fields = {name.upper(): value.strip() for name, value in OFX_FIELD.findall(match.group(1))}
+        posted = fields.get("DTPOSTED", "")  # YYYYMMDD[HHMMSS[.XXX]][[offset:TZ]]
+        records.append({
+            "date": f"{posted[:4]}-{posted[4:6]}-{posted[6:8]}",
+            "amount": fields.get("TRNAMT"),
+            "transaction_type": fields.get("TRNTYPE", "").lower(),
+            "detail": " ".join(filter(None, (fields.get("NAME"), fields.get("MEMO")))),
+        })
+        if len(records) == chunk_rows:
+            yield pd.DataFrame(records)
+            records = []
+    if records:
+        yield pd.DataFrame(records)
+
+
+def read_import_chunks(file, filename: str, chunk_rows=IMPORT_CHUNK_ROWS):
+    """Yield the rows of an uploaded CSV, XLSX or OFX/QFX file as DataFrames of ``chunk_rows``."""
+    extension = filename.rsplit(".", 1)[-1].lower()
+    if extension == "csv":
+        return _read_csv(file, chunk_rows)
+    if extension == "xlsx":
+        return _read_xlsx(file, chunk_rows)
+    if extension in ("ofx", "qfx"):
+        return _read_ofx(file, chunk_rows)
+    raise ValueError(f"Unsupported import file type: .{extension}")
+
+
+def normalize_chunk(chunk: pd.DataFrame):
+    """Map a raw chunk onto the transaction columns. Returns ``(rows, rejected_count)``.
+
+    Amounts may carry currency symbols and thousands separators; negative
+    amounts are expenses when no type column is given. Unknown categories
+    become "Other". Rows without a valid date or amount are rejected.
+    """
+    headers = {str(column).strip().lower(): column for column in chunk.columns}
+    source = {}
+    for field, aliases in IMPORT_COLUMNS.items():
+        source[field] = next((headers[alias] for alias in aliases if alias in headers), None)
+    missing = [field for field in ("date", "amount") if source[field] is None]
+    if missing:
+        raise ValueError(f"Missing required column(s): {', '.join(missing)}")
+
+    def column(field):
+        if source[field] is None:
+            return pd.Series("", index=chunk.index)
+        return chunk[source[field]].fillna("").astype(str).str.strip()
+
+    raw_amount = column("amount")
+    negative = raw_amount.str.startswith("-") | raw_amount.str.startswith("(")
+    amount = pd.to_numeric(raw_amount.str.replace(r"[^\d.]", "", regex=True), errors="coerce")
+    dates = pd.to_datetime(chunk[source["date"]], errors="coerce")
+
+    transaction_type = column("transaction_type").str.lower().map(TYPE_ALIASES)
+    transaction_type = transaction_type.fillna(pd.Series(np.where(negative, "expense", "income"), index=chunk.index))
+
+    category = column("category").str.title()
+    category = category.where(category.isin(CATEGORIES), "Other")
+
+    valid = dates.notna() & amount.notna() & transaction_type.isin(TRANSACTION_TYPES)
+    rows = pd.DataFrame({
+        "date": dates[valid].dt.strftime("%Y-%m-%d"),
+        "amount": amount[valid].round(2),
+        "category": category[valid],
+        "detail": column("detail")[valid],
+        "transaction_type": transaction_type[valid],
+    })
+    return rows.reset_index(drop=True), int((~valid).sum())
+
+
+def content_hashes(rows: pd.DataFrame) -> pd.Series:
+    """64-bit hash of each row's date, amount, category, type and detail."""
+    normalized = pd.DataFrame({
+        "date": pd.to_datetime(rows["date"]).to_numpy().astype("datetime64[D]").astype(np.int64),
+        "amount": np.rint(rows["amount"].to_numpy(dtype=float) * 100).astype(np.int64),
+        "category": rows["category"].astype(str).to_numpy(),
+        "transaction_type": rows["transaction_type"].astype(str).to_numpy(),
+        "detail": rows["detail"].fillna("").astype(str).to_numpy(),
+    })
+    return pd.util.hash_pandas_object(normalized[HASH_COLUMNS], index=False).reset_index(drop=True)
+
+
+def import_transactions(repository, user_id, file, filename: str, batch_size=IMPORT_BATCH_SIZE,
+                        max_workers=IMPORT_MAX_WORKERS, chunk_rows=IMPORT_CHUNK_ROWS, progress=None):
+    """Stream ``file`` into the user's transactions, skipping rows they already have.
+
+    Duplicates are detected by content hash and counted per hash, so two
+    identical purchases on the same day are both kept, while importing the
+    same statement twice adds nothing. ``progress(report)`` is called after
+    every chunk. Returns an ``ImportReport``.
+    """
+    report = ImportReport()
+    started = time.perf_counter()
+    existing = content_hashes(repository.frame(user_id).to_pandas()).value_counts()
+    seen = pd.Series(dtype=np.int64)
+
+    for chunk in read_import_chunks(file, filename, chunk_rows):
+        report.rows_read += len(chunk)
+        rows, rejected = normalize_chunk(chunk)
+        report.rejected += rejected
+
+        hashes = content_hashes(rows)
+        occurrence = hashes.groupby(hashes).cumcount() + hashes.map(seen).fillna(0)
+        is_new = (occurrence >= hashes.map(existing).fillna(0)).to_numpy()
+        seen = seen.add(hashes.value_counts(), fill_value=0)
+        rows = rows[is_new]
+        report.duplicates += int((~is_new).sum())
+
+        if len(rows):
+            rows.insert(0, "id", [generate_uuid() for _ in range(len(rows))])
+            rows.insert(1, "user_id", user_id)
+            records = rows.to_dict("records")
+            errors = repository.add_many(user_id, records, batch_size=batch_size, max_workers=max_workers)
+            for index, error in errors.items():
+                report.errors.append((report.batches + index + 1, str(error)))
+            failed = sum(len(records[index * batch_size:(index + 1) * batch_size]) for index in errors)
+            report.inserted += len(records) - failed
+            report.batches += -(-len(records) // batch_size)
+
+        report.seconds = time.perf_counter() - started
+        if progress is not None:
+            progress(report)
+
+    report.seconds = time.perf_counter() - started
+    return report
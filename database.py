@@ -1,17 +1,106 @@
 import os
-from supabase import create_client, Client
-import httpx
+from functools import cache
 from dotenv import load_dotenv
-from pathlib import Path
 import streamlit as st
+from lazy import LazyProxy
+from tracing import AsyncTracedClient, TracedClient
 
-# Load environment variables from .env file
-os.environ.clear()
-load_dotenv()
+# Importing this module has no side effects: .env and secrets are read on the
+# first get_setting() call, and the client is created on first use.
 
-# === Config ===
-SUPABASE_URL = os.getenv("SUPABASE_URL", st.secrets.get("SUPABASE_URL"))
-SUPABASE_KEY = os.getenv("SUPABASE_KEY", st.secrets.get("SUPABASE_KEY"))
 
-client = httpx.Client(timeout=10.0)  # 10 seconds timeout
-supabase: Client = create_client(SUPABASE_URL, SUPABASE_KEY)
+@cache
+def _load_env():
+    # Values in .env take precedence over the inherited environment
+    load_dotenv(override=True)
+
+
+def get_setting(name, default=None):
+    # .env first, then Streamlit secrets (which may not exist at all)
+    _load_env()
+    value = os.getenv(name)
+    if value is not None:
+        return value
+    try:
+        return st.secrets.get(name, default)
+    except FileNotFoundError:
+        return default
+
+
+def _pool_settings():
+    return dict(
+        max_connections=int(get_setting("HTTP_MAX_CONNECTIONS", 20)),
+        max_keepalive=int(get_setting("HTTP_MAX_KEEPALIVE", 10)),
+        keepalive_expiry=float(get_setting("HTTP_KEEPALIVE_EXPIRY", 60)),
+        http2=str(get_setting("HTTP2", "true")).lower() in ("1", "true", "yes"),
+    )
+
+
+def http_transport():
+    """The connection pool shared by all Supabase requests of this process."""
+    from http_pool import shared_transport
+    return shared_transport(**_pool_settings())
+
+
+def http_timeout():
+    import httpx
+    return httpx.Timeout(float(get_setting("HTTP_TIMEOUT", 10)), connect=float(get_setting("HTTP_CONNECT_TIMEOUT", 5)))
+
+
+def create_storage(backend=None):
+    """Return a client for the storage backend.
+
+    ``backend`` defaults to the STORAGE_BACKEND setting: "supabase" (hosted
+    Postgres + Auth) or "local" (embedded SQLite file, works offline). Every
+    backend exposes the part of the supabase-py client the app uses:
+    ``table(name)`` queries (select/insert/update/delete with filters) on the
+    ``users`` and ``transactions`` tables, and ``auth`` sign-up/sign-in.
+    """
+    backend = backend or get_setting("STORAGE_BACKEND", "supabase")
+    if backend == "supabase":
+        from http_pool import PooledClient
+        return PooledClient(get_setting("SUPABASE_URL"), get_setting("SUPABASE_KEY"), http_transport(), http_timeout())
+    if backend == "local":
+        from local_database import LocalClient
+        return LocalClient(get_setting("LOCAL_DATABASE_PATH", "savvysmart.db"))
+    raise ValueError(f"Unknown storage backend: {backend}")
+
+
+def create_async_storage(backend=None):
+    """Async client for concurrent queries, on the same backend as ``storage``."""
+    backend = backend or get_setting("STORAGE_BACKEND", "supabase")
+    if backend == "supabase":
+        from http_pool import AsyncPooledClient, shared_async_transport
+        return AsyncPooledClient(
+            get_setting("SUPABASE_URL"), get_setting("SUPABASE_KEY"),
+            shared_async_transport(**_pool_settings()), http_timeout(), storage._resolve(),
+        )
+    # The SQLite backend has no async client; its queries run on worker threads
+    from async_database import ThreadedClient
+    return ThreadedClient(storage._resolve())
+
+
+def create_async_database():
+    from async_database import AsyncDatabase
+    return AsyncDatabase(AsyncTracedClient(create_async_storage()))
+
+
+def create_snapshot_cache(backend=None):
+    """On-disk frame snapshots (see snapshots.py); an empty SNAPSHOT_DIR turns them off."""
+    directory = get_setting("SNAPSHOT_DIR", ".snapshots")
+    if not directory:
+        return None
+    from snapshots import SnapshotCache
+    backend = backend or get_setting("STORAGE_BACKEND", "supabase")
+    database = get_setting("SUPABASE_URL") if backend == "supabase" else os.path.abspath(get_setting("LOCAL_DATABASE_PATH", "savvysmart.db"))
+    return SnapshotCache(
+        directory, int(get_setting("SNAPSHOT_MAX_BYTES", 512 * 2**20)), namespace=f"{backend}:{database}",
+        min_interval=float(get_setting("SNAPSHOT_SAVE_SECONDS", 30)),
+    )
+
+
+storage = LazyProxy(create_storage, "storage client")
+# Every query and auth call is recorded as a span of the current rerun (see tracing.py)
+supabase = LazyProxy(lambda: TracedClient(storage._resolve()), "traced storage client")
+# Runs a page's independent queries concurrently (see async_database.py)
+async_database = LazyProxy(create_async_database, "async database")
@@ -0,0 +1,278 @@
+import hashlib
+import multiprocessing
+import threading
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import numpy as np
+import pandas as pd
+
+MAX_CACHED_FITS = 64
+
+# Resampling rule, seasonal period and backtest horizon per aggregation level
+FREQUENCIES = {"Daily": "D", "Weekly": "W", "Monthly": "ME"}
+SEASON_LENGTHS = {"Daily": 7, "Weekly": 4, "Monthly": 12}
+BACKTEST_HORIZONS = {"Daily": 7, "Weekly": 4, "Monthly": 3}
+BACKTEST_FOLDS = 3
+
+AUTO = "Auto"
+# Croston only competes on series with at least this share of zero periods (an
+# average interval between non-zero periods above ~1.32, Syntetos-Boylan's cut-off)
+INTERMITTENT_ZERO_SHARE = 0.25
+
+
+class ForecastModel:
+    """Forecasting backend: fit on equally spaced observations, then forecast.
+
+    Subclasses set ``name`` and implement ``fit``/``forecast``. Backends with
+    ``parallel = True`` are slow enough to be fitted in the process pool.
+    """
+
+    name = None
+    parallel = False
+
+    def __init__(self, season_length=1):
+        self.season_length = season_length
+
+    def fit(self, y: np.ndarray) -> "ForecastModel":
+        raise NotImplementedError
+
+    def forecast(self, steps: int) -> np.ndarray:
+        raise NotImplementedError
+
+
+class ArimaModel(ForecastModel):
+    name = "ARIMA"
+    parallel = True
+
+    def fit(self, y):
+        from statsmodels.tsa.arima.model import ARIMA
+        self.result = ARIMA(y, order=(1, 1, 1)).fit()
+        return self
+
+    def forecast(self, steps):
+        return np.asarray(self.result.forecast(steps=steps))
+
+
+class HoltModel(ForecastModel):
+    """Holt's linear exponential smoothing.
+
+    (alpha, beta) is chosen by one-step-ahead squared error over a grid; every
+    grid point is filtered at once, so a fit is one NumPy pass over the series.
+    """
+
+    name = "Holt"
+    GRID = np.linspace(0.05, 0.95, 10)
+
+    def fit(self, y):
+        alpha, beta = (grid.ravel() for grid in np.meshgrid(self.GRID, self.GRID))
+        level = np.full(alpha.shape, y[0], dtype=float)
+        trend = np.full(alpha.shape, y[1] - y[0] if len(y) > 1 else 0.0, dtype=float)
+        sse = np.zeros(alpha.shape)
+        for value in y[1:]:
+            predicted = level + trend
+            sse += (value - predicted) ** 2
+            new_level = alpha * value + (1 - alpha) * predicted
+            trend = beta * (new_level - level) + (1 - beta) * trend
+            level = new_level
+        best = np.argmin(sse)
+        self.alpha, self.beta = alpha[best], beta[best]
+        self.level, self.trend = level[best], trend[best]
+        return self
+
+    def forecast(self, steps):
+        return np.maximum(self.level + self.trend * np.arange(1, steps + 1), 0.0)
+
+
+class SeasonalNaiveModel(ForecastModel):
+    """Repeat the last full season (plain naive when the series is shorter)."""
+
+    name = "Seasonal naive"
+
+    def fit(self, y):
+        period = self.season_length if len(y) >= self.season_length else 1
+        self.last_season = np.asarray(y[-period:], dtype=float)
+        return self
+
+    def forecast(self, steps):
+        return np.resize(self.last_season, steps)
+
+
+def _smoothed_last(x: np.ndarray, alpha: float) -> float:
+    # Final value of simple exponential smoothing initialised at x[0], in closed form
+    n = len(x)
+    weights = alpha * (1 - alpha) ** np.arange(n - 1, -1, -1)
+    return float(weights @ x + (1 - alpha) ** n * x[0])
+
+
+class CrostonModel(ForecastModel):
+    """Croston's method with the Syntetos-Boylan bias correction.
+
+    Suited to intermittent series (mostly zero days): demand sizes and the
+    intervals between non-zero periods are smoothed separately.
+    """
+
+    name = "Croston"
+    ALPHA = 0.1
+
+    def fit(self, y):
+        nonzero = np.flatnonzero(y)
+        if len(nonzero) == 0:
+            self.rate = 0.0
+            return self
+        sizes = np.asarray(y, dtype=float)[nonzero]
+        intervals = np.diff(np.concatenate(([-1], nonzero))).astype(float)
+        size = _smoothed_last(sizes, self.ALPHA)
+        interval = _smoothed_last(intervals, self.ALPHA)
+        self.rate = (1 - self.ALPHA / 2) * size / interval
+        return self
+
+    def forecast(self, steps):
+        return np.full(steps, self.rate)
+
+
+MODELS = {model.name: model for model in (ArimaModel, HoltModel, SeasonalNaiveModel, CrostonModel)}
+AUTO_CANDIDATES = ("Holt", "Seasonal naive", "ARIMA")
+
+
+def auto_candidates(y: np.ndarray):
+    """The backends Auto compares on ``y``: Croston joins them when the series is intermittent."""
+    if len(y) and np.mean(np.asarray(y) == 0) >= INTERMITTENT_ZERO_SHARE:
+        return AUTO_CANDIDATES + ("Croston",)
+    return AUTO_CANDIDATES
+
+
+def backtest(model_name: str, y: np.ndarray, season_length: int, horizon: int, folds=BACKTEST_FOLDS) -> float:
+    """Mean absolute error of a backend over rolling forecast origins.
+
+    The last ``folds`` windows of ``horizon`` points are each forecast from the
+    data before them. Returns ``inf`` when the series is too short to test,
+    or when the backend fails or forecasts NaN on it.
+    """
+    errors = []
+    for fold in range(folds, 0, -1):
+        origin = len(y) - fold * horizon
+        if origin < max(2, season_length):
+            continue
+        try:
+            model = MODELS[model_name](season_length).fit(y[:origin])
+            error = np.mean(np.abs(model.forecast(horizon) - y[origin:origin + horizon]))
+        except Exception:
+            return float("inf")
+        errors.append(error)
+    error = float(np.mean(errors)) if errors else float("inf")
+    return float("inf") if np.isnan(error) else error
+
+
+def select_model(y: np.ndarray, aggregation_level: str, candidates=None):
+    """Pick the candidate with the lowest backtest error. Returns ``(name, scores)``.
+
+    ``candidates`` default to ``auto_candidates(y)``.
+    """
+    if candidates is None:
+        candidates = auto_candidates(y)
+    season_length = SEASON_LENGTHS[aggregation_level]
+    horizon = BACKTEST_HORIZONS[aggregation_level]
+    scores = {name: backtest(name, y, season_length, horizon) for name in candidates}
+    best = min(scores, key=scores.get)
+    if np.isinf(scores[best]):
+        best = candidates[0]
+    return best, scores
+
+
+def fit_model(model_name: str, y: np.ndarray, aggregation_level: str) -> ForecastModel:
+    scores = None
+    if model_name == AUTO:
+        model_name, scores = select_model(y, aggregation_level)
+    model = MODELS[model_name](SEASON_LENGTHS[aggregation_level]).fit(y)
+    model.backtest_scores = scores
+    return model
+
+
+def forecast_index(index: pd.DatetimeIndex, steps: int) -> pd.DatetimeIndex:
+    # Continue the series at its own frequency (daily, weekly or monthly)
+    return pd.date_range(index[-1], periods=steps + 1, freq=index.freq)[1:]
+
+
+# Fitted models are shared by every session in the process; a fit only depends
+# on the resampled series, the aggregation level and the backend, never on the user.
+_fits = OrderedDict()
+_fits_lock = threading.Lock()
+_executor = None
+_executor_lock = threading.Lock()
+
+
+def _get_executor():
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            # "spawn" keeps workers independent of the server's threads
+            _executor = ProcessPoolExecutor(max_workers=2, mp_context=multiprocessing.get_context("spawn"))
+        return _executor
+
+
+def series_key(series: pd.Series, aggregation_level: str, model_name: str = AUTO) -> str:
+    digest = hashlib.sha1(pd.util.hash_pandas_object(series, index=True).values.tobytes())
+    digest.update(f"{aggregation_level}:{model_name}".encode("utf-8"))
+    return digest.hexdigest()
+
+
+def fit_forecasts(series_by_name: dict, aggregation_level: str, model_name: str = AUTO, on_fit=None) -> dict:
+    """Fit a backend to each series, reusing earlier fits of identical data.
+
+    ``model_name`` is a key of ``MODELS`` or ``AUTO`` (pick by backtest).
+    Slow backends, and Auto (which backtests ARIMA), run concurrently in a
+    process pool. Returns
+    ``{name: result}`` where a result is a fitted ``ForecastModel`` (call
+    ``forecast(steps)`` on it; that does not refit) or the exception raised.
+    ``on_fit(name, result)`` is called as each series is done, cached ones
+    first (e.g. to report progress from a background job); if it raises,
+    unstarted fits are cancelled.
+    """
+    keys = {name: series_key(series, aggregation_level, model_name) for name, series in series_by_name.items()}
+    results, pending = {}, {}
+    with _fits_lock:
+        for name, key in keys.items():
+            if key in _fits:
+                _fits.move_to_end(key)
+                results[name] = _fits[key]
+    if on_fit is not None:
+        for name, result in list(results.items()):
+            on_fit(name, result)
+
+    parallel = model_name == AUTO or MODELS[model_name].parallel
+    for name, series in series_by_name.items():
+        if name in results:
+            continue
+        values = series.to_numpy(dtype=float)
+        if parallel:
+            pending[name] = _get_executor().submit(fit_model, model_name, values, aggregation_level)
+        else:
+            try:
+                results[name] = fit_model(model_name, values, aggregation_level)
+            except Exception as e:
+                results[name] = e
+            if on_fit is not None:
+                on_fit(name, results[name])
+
+    names = {future: name for name, future in pending.items()}
+    try:
+        for future in as_completed(names):
+            try:
+                results[names[future]] = future.result()
+            except Exception as e:
+                results[names[future]] = e
+            if on_fit is not None:
+                on_fit(names[future], results[names[future]])
+    except BaseException:
+        for future in names:
+            future.cancel()
+        raise
+
+    with _fits_lock:
+        for name, result in results.items():
+            if not isinstance(result, Exception) and keys[name] not in _fits:
+                _fits[keys[name]] = result
+        while len(_fits) > MAX_CACHED_FITS:
+            _fits.popitem(last=False)
+    return results
@@ -0,0 +1,238 @@
+import threading
+import time
+import warnings
+import weakref
+
+import httpx
+import supabase
+from gotrue.http_clients import SyncClient as AuthHttpClient
+from postgrest import AsyncPostgrestClient, SyncPostgrestClient
+from postgrest.utils import SyncClient as RestHttpClient
+from supabase import AsyncClient, Client
+from supabase._async.auth_client import AsyncSupabaseAuthClient
+from supabase._sync.auth_client import SyncSupabaseAuthClient
+
+# PooledClient and AsyncPooledClient override private supabase-py hooks
+# (_init_postgrest_client, _init_supabase_auth_client): ClientOptions in this
+# release has no way to pass an httpx client or transport. Their signatures
+# can change between releases; tests/test_http_pool.py checks them against the
+# installed version, so run it when bumping the pin in requirements.txt.
+SUPABASE_VERSION = "2.15.1"
+if supabase.__version__ != SUPABASE_VERSION:
+    warnings.warn(
+        f"http_pool.py overrides private supabase-py hooks checked against supabase=={SUPABASE_VERSION}, "
+        f"found {supabase.__version__}; run tests/test_http_pool.py",
+        stacklevel=2,
+    )
+
+# One connection pool per process: every Streamlit session, every table query
+# and every auth call reuses its keep-alive (HTTP/2) connections instead of
+# paying a new TLS handshake.
+_transports = {}
+_transport_lock = threading.Lock()
+
+
+class PoolCounters:
+    """Request and connection counters of a shared transport."""
+
+    def _init_counters(self, limits):
+        self.limits = limits
+        self.requests = 0
+        self.errors = 0
+        self.request_seconds = 0.0
+        self.connections_opened = 0
+        self._seen = weakref.WeakSet()
+        self._lock = threading.Lock()
+
+    def _count(self, seconds, failed):
+        with self._lock:
+            self.requests += 1
+            self.errors += failed
+            self.request_seconds += seconds
+            for connection in self._pool.connections:
+                if connection not in self._seen:
+                    self._seen.add(connection)
+                    self.connections_opened += 1
+
+    def stats(self):
+        connections = self._pool.connections
+        return {
+            "requests": self.requests,
+            "errors": self.errors,
+            "request_seconds": self.request_seconds,
+            "connections_opened": self.connections_opened,
+            "open": len(connections),
+            "idle": sum(connection.is_idle() for connection in connections),
+            "http2": sum(connection.info().startswith("HTTP/2") for connection in connections),
+        }
+
+
+class SharedTransport(PoolCounters, httpx.HTTPTransport):
+    """HTTP transport shared by many clients, counting requests and new connections."""
+
+    def __init__(self, limits, http2=True, retries=1):
+        super().__init__(limits=limits, http2=http2, retries=retries)
+        self._init_counters(limits)
+
+    def handle_request(self, request):
+        start, failed = time.perf_counter(), True
+        try:
+            response = super().handle_request(request)
+            failed = False
+            return response
+        finally:
+            self._count(time.perf_counter() - start, failed)
+
+    def close(self):
+        # Clients are dropped and rebuilt (e.g. on every sign-in); the pool outlives them
+        pass
+
+    def shutdown(self):
+        super().close()
+
+
+class AsyncSharedTransport(PoolCounters, httpx.AsyncHTTPTransport):
+    """Async counterpart of ``SharedTransport``; only used from the event loop in async_database.py."""
+
+    def __init__(self, limits, http2=True, retries=1):
+        super().__init__(limits=limits, http2=http2, retries=retries)
+        self._init_counters(limits)
+
+    async def handle_async_request(self, request):
+        start, failed = time.perf_counter(), True
+        try:
+            response = await super().handle_async_request(request)
+            failed = False
+            return response
+        finally:
+            self._count(time.perf_counter() - start, failed)
+
+    async def aclose(self):
+        pass
+
+    async def shutdown(self):
+        await super().aclose()
+
+
+def _limits(max_connections, max_keepalive, keepalive_expiry):
+    return httpx.Limits(
+        max_connections=max_connections,
+        max_keepalive_connections=max_keepalive,
+        keepalive_expiry=keepalive_expiry,
+    )
+
+
+def shared_transport(max_connections=20, max_keepalive=10, keepalive_expiry=60.0, http2=True):
+    """The process-wide transport; settings only apply to the first call."""
+    with _transport_lock:
+        if "sync" not in _transports:
+            _transports["sync"] = SharedTransport(_limits(max_connections, max_keepalive, keepalive_expiry), http2=http2)
+        return _transports["sync"]
+
+
+def shared_async_transport(max_connections=20, max_keepalive=10, keepalive_expiry=60.0, http2=True):
+    """The process-wide async transport, a pool of its own next to the sync one."""
+    with _transport_lock:
+        if "async" not in _transports:
+            _transports["async"] = AsyncSharedTransport(
+                _limits(max_connections, max_keepalive, keepalive_expiry), http2=http2
+            )
+        return _transports["async"]
+
+
+def pool_stats():
+    """Counters and connection states of the shared pools (None until the first Supabase call)."""
+    if not _transports:
+        return None
+    totals = {}
+    for transport in list(_transports.values()):
+        for key, value in transport.stats().items():
+            totals[key] = totals.get(key, 0) + value
+    totals["avg_request_ms"] = 1000 * totals.pop("request_seconds") / totals["requests"] if totals["requests"] else 0.0
+    return totals
+
+
+class PooledPostgrestClient(SyncPostgrestClient):
+    def __init__(self, base_url, *, transport, **kwargs):
+        self._transport = transport
+        super().__init__(base_url, **kwargs)
+
+    def create_session(self, base_url, headers, timeout, verify=True, proxy=None):
+        return RestHttpClient(
+            base_url=base_url, headers=headers, timeout=timeout, transport=self._transport, follow_redirects=True
+        )
+
+
+class PooledClient(Client):
+    """Supabase client whose PostgREST and auth requests all go through ``transport``."""
+
+    def __init__(self, supabase_url, supabase_key, transport, timeout, options=None):
+        self._transport = transport
+        self._timeout = timeout
+        super().__init__(supabase_url, supabase_key, options)
+
+    # Private hooks of supabase==SUPABASE_VERSION, see the check at the top
+    def _init_supabase_auth_client(self, auth_url, client_options, verify=True, proxy=None):
+        return SyncSupabaseAuthClient(
+            url=auth_url,
+            auto_refresh_token=client_options.auto_refresh_token,
+            persist_session=client_options.persist_session,
+            storage=client_options.storage,
+            headers=client_options.headers,
+            flow_type=client_options.flow_type,
+            http_client=AuthHttpClient(transport=self._transport, timeout=self._timeout, follow_redirects=True),
+        )
+
+    def _init_postgrest_client(self, rest_url, headers, schema, timeout=None, verify=True, proxy=None):
+        return PooledPostgrestClient(
+            rest_url, headers=headers, schema=schema, timeout=self._timeout, transport=self._transport
+        )
+
+
+class AsyncPooledPostgrestClient(AsyncPostgrestClient):
+    def __init__(self, base_url, *, transport, **kwargs):
+        self._transport = transport
+        super().__init__(base_url, **kwargs)
+
+    def create_session(self, base_url, headers, timeout, verify=True, proxy=None):
+        return httpx.AsyncClient(
+            base_url=base_url, headers=headers, timeout=timeout, transport=self._transport, follow_redirects=True
+        )
+
+
+class AsyncPooledClient(AsyncClient):
+    """Async Supabase client for concurrent queries (see async_database.py).
+
+    It has no session of its own: queries carry the access token of
+    ``sync_client``, the client the app signs in with.
+    """
+
+    def __init__(self, supabase_url, supabase_key, transport, timeout, sync_client, options=None):
+        self._transport = transport
+        self._timeout = timeout
+        self._sync_client = sync_client
+        super().__init__(supabase_url, supabase_key, options)
+
+    def table(self, table_name):
+        authorization = self._sync_client.options.headers.get("Authorization")
+        if authorization and authorization != self.options.headers.get("Authorization"):
+            self.options.headers["Authorization"] = authorization
+            self._postgrest = None
+        return super().table(table_name)
+
+    # Private hooks of supabase==SUPABASE_VERSION, see the check at the top
+    def _init_supabase_auth_client(self, auth_url, client_options, verify=True, proxy=None):
+        return AsyncSupabaseAuthClient(
+            url=auth_url,
+            auto_refresh_token=False,
+            persist_session=client_options.persist_session,
+            storage=client_options.storage,
+            headers=client_options.headers,
+            flow_type=client_options.flow_type,
+            http_client=httpx.AsyncClient(transport=self._transport, timeout=self._timeout, follow_redirects=True),
+        )
+
+    def _init_postgrest_client(self, rest_url, headers, schema, timeout=None, verify=True, proxy=None):
+        return AsyncPooledPostgrestClient(
+            rest_url, headers=headers, schema=schema, timeout=self._timeout, transport=self._transport
+        )
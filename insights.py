@@ -0,0 +1,267 @@
+import hashlib
+from datetime import date
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.compute as pc
+
+# Recurrence periods: name, nominal length in days, accepted interval range (inclusive)
+PERIODS = [
+    ("weekly", 7.0, 6, 8),
+    ("biweekly", 14.0, 12, 16),
+    ("monthly", 30.44, 27, 34),
+    ("quarterly", 91.31, 85, 98),
+    ("yearly", 365.25, 355, 375),
+]
+PERIOD_NAMES = np.array([name for name, _, _, _ in PERIODS], dtype=object)
+PERIOD_LOWS = np.array([low for _, _, low, _ in PERIODS])
+PERIOD_HIGHS = np.array([high for _, _, _, high in PERIODS])
+
+# Amount bands are this factor wide, on two grids offset by half a band, so a
+# series whose amounts vary by less than half a band fits in one band of either
+BAND_RATIO = 1.25
+BAND_OFFSETS = (0.0, 0.5)
+MIN_OCCURRENCES = 3
+# Share of a series' intervals that must match its period
+MIN_REGULARITY = 0.75
+# A series is still active if its next charge is at most this many periods overdue
+GRACE_PERIODS = 0.5
+
+NO_DAY = np.iinfo(np.int64).min
+EPOCH = date(1970, 1, 1)
+
+
+def normalize_details(details) -> pa.Array:
+    """Lower-case letters only, so "NETFLIX.COM 0423" and "Netflix.com 0523" match."""
+    text = pc.utf8_lower(pc.fill_null(details, ""))
+    text = pc.replace_substring_regex(text, r"[^\p{L}]+", " ")
+    return pc.utf8_trim_whitespace(text)
+
+
+def _codes(values, mapping):
+    # Codes of ``values`` (an Arrow array) in ``mapping`` ({value: code}), adding new values
+    encoded = pc.dictionary_encode(pc.fill_null(values, ""))
+    if isinstance(encoded, pa.ChunkedArray):
+        encoded = encoded.combine_chunks()
+    dictionary = encoded.dictionary.to_pylist()
+    lookup = np.fromiter((mapping.setdefault(value, len(mapping)) for value in dictionary), np.int64, len(dictionary))
+    indices = encoded.indices.to_numpy(zero_copy_only=False)
+    return lookup[indices] if len(lookup) else np.zeros(len(indices), np.int64)
+
+
+class _SeriesTable:
+    """Per-group counts and interval statistics of one band grid."""
+
+    def __init__(self, offset):
+        self.offset = offset
+        self.groups = {}
+        self.row_groups = np.empty(0, np.int64)
+        self.count = np.empty(0, np.int64)
+        self.amount_sum = np.empty(0, np.int64)
+        self.last_day = np.empty(0, np.int64)
+        self.last_cents = np.empty(0, np.int64)
+        self.matches = np.empty((0, len(PERIODS)), np.int64)
+        self.matched_days = np.empty((0, len(PERIODS)), np.int64)
+        self.category = np.empty(0, object)
+        self.transaction_type = np.empty(0, object)
+        self.last_detail = np.empty(0, object)
+
+    def assign(self, base_keys, log_amounts, categories, types):
+        """Group ids of new rows, adding groups for unseen keys."""
+        bands = np.floor(log_amounts + self.offset).astype(np.int64)
+        keys = base_keys << 8 | bands
+        codes, uniques = pd.factorize(keys)
+        known = np.fromiter((self.groups.get(key, -1) for key in uniques.tolist()), np.int64, len(uniques))
+        new = np.flatnonzero(known < 0)
+        if new.size:
+            known[new] = np.arange(len(self.groups), len(self.groups) + new.size)
+            self.groups.update(zip(uniques[new].tolist(), known[new].tolist()))
+            first_rows = np.unique(codes, return_index=True)[1][new]
+            self._grow(new.size, categories[first_rows], types[first_rows])
+        groups = known[codes]
+        self.row_groups = np.concatenate([self.row_groups, groups])
+        return groups
+
+    def _grow(self, added, categories, types):
+        zeros = np.zeros(added, np.int64)
+        self.count = np.concatenate([self.count, zeros])
+        self.amount_sum = np.concatenate([self.amount_sum, zeros])
+        self.last_day = np.concatenate([self.last_day, np.full(added, NO_DAY)])
+        self.last_cents = np.concatenate([self.last_cents, zeros])
+        self.matches = np.concatenate([self.matches, np.zeros((added, len(PERIODS)), np.int64)])
+        self.matched_days = np.concatenate([self.matched_days, np.zeros((added, len(PERIODS)), np.int64)])
+        self.category = np.concatenate([self.category, categories])
+        self.transaction_type = np.concatenate([self.transaction_type, types])
+        self.last_detail = np.concatenate([self.last_detail, np.empty(added, object)])
+
+    def late(self, groups, days):
+        # Groups with a new row dated before their latest known row
+        earliest = pd.Series(days).groupby(groups).min()
+        index = earliest.index.to_numpy()
+        return index[earliest.to_numpy() < self.last_day[index]].astype(np.int64)
+
+    def reset(self, groups):
+        for column in (self.count, self.amount_sum, self.last_cents, self.matches, self.matched_days):
+            column[groups] = 0
+        self.last_day[groups] = NO_DAY
+
+    def ingest(self, groups, days, amounts, details):
+        if len(groups) == 0:
+            return
+        order = np.lexsort((days, groups))
+        g, d, a = groups[order], days[order], amounts[order]
+        first = np.r_[True, g[1:] != g[:-1]]
+        last = np.r_[g[1:] != g[:-1], True]
+
+        # Interval to the previous row of the group; for a group's first new
+        # row, to the latest row ingested before
+        previous = np.empty_like(d)
+        previous[1:] = d[:-1]
+        previous[first] = self.last_day[g[first]]
+        has_previous = previous != NO_DAY
+        intervals, interval_groups = (d - previous)[has_previous], g[has_previous]
+        period = np.searchsorted(PERIOD_LOWS, intervals, side="right") - 1
+        matched = (period >= 0) & (intervals <= PERIOD_HIGHS[np.maximum(period, 0)])
+        cells = interval_groups[matched] * len(PERIODS) + period[matched]
+        np.add.at(self.matches.reshape(-1), cells, 1)
+        np.add.at(self.matched_days.reshape(-1), cells, intervals[matched])
+
+        np.add.at(self.count, g, 1)
+        np.add.at(self.amount_sum, g, a)
+        self.last_day[g[last]] = d[last]
+        self.last_cents[g[last]] = a[last]
+        self.last_detail[g[last]] = details.take(pa.array(order[last])).to_pylist()
+
+    def recurring(self, today):
+        best = self.matches.argmax(axis=1) if len(self.matches) else np.empty(0, np.int64)
+        best_count = self.matches[np.arange(len(best)), best]
+        regular = (self.count >= MIN_OCCURRENCES) & (best_count > 0) & (best_count >= MIN_REGULARITY * (self.count - 1))
+        groups = np.flatnonzero(regular)
+        best, best_count = best[groups], best_count[groups]
+
+        every = self.matched_days[groups, best] / best_count
+        last_day = self.last_day[groups]
+        next_day = last_day + np.rint(every).astype(np.int64)
+        return pd.DataFrame({
+            "detail": self.last_detail[groups],
+            "category": self.category[groups],
+            "transaction_type": self.transaction_type[groups],
+            "period": PERIOD_NAMES[best],
+            "every_days": every,
+            "occurrences": self.count[groups],
+            "average_amount": self.amount_sum[groups] / self.count[groups] / 100,
+            "last_amount": self.last_cents[groups] / 100,
+            "last_date": last_day.astype("datetime64[D]"),
+            "next_date": next_day.astype("datetime64[D]"),
+            "active": today - next_day <= GRACE_PERIODS * every,
+        })
+
+
+class RecurrenceIndex:
+    """Recurring transactions (rent, salary, subscriptions) of one user's history.
+
+    Rows are grouped by normalized detail, category, type and amount band
+    (amounts on a log scale, ``BAND_RATIO`` apart). Within a group, the day
+    intervals between consecutive rows are matched against ``PERIODS`` with
+    one vectorized search, and per-group counts and sums are kept. A group is
+    recurring when at least ``MIN_REGULARITY`` of its intervals match its most
+    common period.
+
+    The aggregates are additive, so ``extend`` only ingests the rows appended
+    to a frame since the last call. Backdated rows re-ingest just the groups
+    they fall in. A frame that is not an extension of the last one (rows
+    deleted or replaced) needs a new index.
+    """
+
+    def __init__(self):
+        self.rows = 0
+        self._ids_digest = hashlib.blake2b(digest_size=16)
+        self._details, self._categories, self._types = {}, {}, {}
+        self._tables = [_SeriesTable(offset) for offset in BAND_OFFSETS]
+
+    @classmethod
+    def build(cls, frame):
+        index = cls()
+        index.extend(frame)
+        return index
+
+    @staticmethod
+    def _days(data):
+        return pa.array(data["date"]).cast(pa.int32()).to_numpy(zero_copy_only=False).astype(np.int64)
+
+    def covers(self, frame):
+        """Whether ``frame`` starts with the rows this index has seen."""
+        if len(frame) < self.rows:
+            return False
+        digest = hashlib.blake2b(frame.id_bytes(0, self.rows), digest_size=16)
+        return digest.digest() == self._ids_digest.digest()
+
+    def extend(self, frame):
+        """Ingest the rows of ``frame`` after the ones already seen; False if it does not extend them."""
+        if not self.covers(frame):
+            return False
+        if len(frame) == self.rows:
+            return True
+        start, stop = self.rows, len(frame)
+        data = frame.data.iloc[start:stop]
+        details = pa.array(data["detail"])
+        days = self._days(data)
+        amounts = data["amount_cents"].to_numpy(dtype=np.int64)
+        categories = data["category"].astype(object).to_numpy()
+        types = data["transaction_type"].astype(object).to_numpy()
+
+        # (detail, category, type) in 31 + 16 + 8 bits; each grid appends its band
+        detail_codes = _codes(normalize_details(details), self._details)
+        category_codes = _codes(pa.array(categories, pa.string(), from_pandas=True), self._categories)
+        type_codes = _codes(pa.array(types, pa.string(), from_pandas=True), self._types)
+        base_keys = (detail_codes << 16 | category_codes) << 8 | type_codes
+        log_amounts = np.log(np.maximum(np.abs(amounts), 1)) / np.log(BAND_RATIO)
+
+        self._ids_digest.update(frame.id_bytes(start, stop))
+        self.rows = stop
+        for table in self._tables:
+            groups = table.assign(base_keys, log_amounts, categories, types)
+            late = table.late(groups, days)
+            if late.size == 0:
+                table.ingest(groups, days, amounts, details)
+                continue
+            # Backdated rows: recount their groups from every row of those groups
+            table.reset(late)
+            on_time = ~np.isin(groups, late)
+            table.ingest(groups[on_time], days[on_time], amounts[on_time], details.filter(pa.array(on_time)))
+            rows = np.flatnonzero(np.isin(table.row_groups, late))
+            table.ingest(
+                table.row_groups[rows], self._days(frame.data)[rows],
+                frame.data["amount_cents"].to_numpy(dtype=np.int64)[rows], pa.array(frame.data["detail"]).take(pa.array(rows)),
+            )
+        return True
+
+    def recurring(self, today=None) -> pd.DataFrame:
+        """One row per recurring series, soonest next charge first."""
+        today = ((today or date.today()) - EPOCH).days
+        series = pd.concat([table.recurring(today) for table in self._tables], ignore_index=True)
+        # A series found on both grids ends with the same row; keep its longest run
+        series = series.sort_values("occurrences", ascending=False, kind="stable")
+        series = series.drop_duplicates(["detail", "category", "transaction_type", "last_date"])
+        return series.sort_values("next_date", ignore_index=True)
+
+    def upcoming(self, days=30, today=None) -> pd.DataFrame:
+        """Projected charges of the active series over the next ``days`` days, by date."""
+        today = today or date.today()
+        series = self.recurring(today)
+        series = series[series["active"]].reset_index(drop=True)
+        start = (today - EPOCH).days
+        last = series["last_date"].to_numpy().astype("datetime64[D]").astype(np.int64)
+        every = series["every_days"].to_numpy()
+        # Charges at last + k * every, for the k that fall in [today, today + days]
+        first = np.maximum(np.ceil((start - last) / every), 1).astype(np.int64)
+        stop = np.floor((start + days - last) / every).astype(np.int64)
+        repeats = np.maximum(stop - first + 1, 0)
+        rows = np.repeat(np.arange(len(series)), repeats)
+        k = first[rows] + np.arange(repeats.sum()) - np.repeat(np.cumsum(repeats) - repeats, repeats)
+        charge_days = last[rows] + np.rint(k * every[rows]).astype(np.int64)
+        projected = series.iloc[rows][["detail", "category", "transaction_type", "period"]].reset_index(drop=True)
+        projected.insert(0, "date", charge_days.astype("datetime64[D]"))
+        projected["amount"] = series["last_amount"].to_numpy()[rows]
+        return projected.sort_values("date", ignore_index=True)
@@ -0,0 +1,216 @@
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+
+from database import get_setting
+
+QUEUED, RUNNING, DONE, FAILED, CANCELLED = "queued", "running", "done", "failed", "cancelled"
+
+
+class JobCancelled(Exception):
+    """Raised inside a job by ``Job.report`` once the job was cancelled."""
+
+
+class Job:
+    """One background computation and what the page polls of it.
+
+    The job function receives the job and calls ``report`` as it goes; that
+    updates ``progress`` (0 to 1), ``message`` and ``partial`` (a result so far,
+    e.g. the forecasts already fitted) and stops the job if it was cancelled.
+    ``cleanup(result)`` releases what a result holds outside the process
+    memory (e.g. an export's temporary file) once the runner drops the job.
+    """
+
+    def __init__(self, key, function, args, cleanup=None):
+        self.key = key
+        self.status = QUEUED
+        self.progress = 0.0
+        self.message = ""
+        self.partial = None
+        self.result = None
+        self.error = None
+        self.submitted_at = time.monotonic()
+        self.finished_at = None
+        self._function = function
+        self._args = args
+        self._cancelled = threading.Event()
+        self._finished = threading.Event()
+        self._future = None
+        self._cleanup = cleanup
+
+    @property
+    def done(self):
+        return self.status in (DONE, FAILED, CANCELLED)
+
+    @property
+    def cancelled(self):
+        return self._cancelled.is_set()
+
+    def report(self, progress=None, message=None, partial=None):
+        if self._cancelled.is_set():
+            raise JobCancelled()
+        if progress is not None:
+            self.progress = min(max(float(progress), 0.0), 1.0)
+        if message is not None:
+            self.message = message
+        if partial is not None:
+            self.partial = partial
+
+    def cancel(self):
+        """Stop the job: a queued one never starts, a running one at its next ``report``."""
+        self._cancelled.set()
+        if self._future is not None and self._future.cancel():
+            self._finish(CANCELLED)
+
+    def wait(self, timeout=None):
+        """Block until the job is done; returns whether it is."""
+        return self._finished.wait(timeout)
+
+    def _run(self):
+        if self._cancelled.is_set():
+            self._finish(CANCELLED)
+            return
+        self.status = RUNNING
+        try:
+            result = self._function(self, *self._args)
+        except JobCancelled:
+            self._finish(CANCELLED)
+        except Exception as e:
+            self.error = e
+            self._finish(FAILED)
+        else:
+            self.result = result
+            self.progress = 1.0
+            self._finish(DONE)
+
+    def _finish(self, status):
+        if self._finished.is_set():
+            return
+        self.finished_at = time.monotonic()
+        self.status = status
+        self._function = self._args = None  # let the inputs go
+        self._finished.set()
+
+    def _release(self):
+        # Called once the runner no longer holds the job
+        if self._cleanup is not None and self.status == DONE:
+            self._cleanup(self.result)
+        self.result = None
+
+
+class JobRunner:
+    """Runs heavy page work (forecast fits, exports, full-history loads) off the script thread.
+
+    Jobs are keyed by ``(user_id, kind, inputs)``: submitting a job whose key
+    is already queued, running or finished returns that job instead of
+    starting another, so reruns (and other sessions of the same user) pick
+    up the work where it is rather than throwing it away. At most
+    ``max_workers`` jobs run at once; the rest queue. Finished jobs, failed
+    and cancelled ones included, are kept for ``ttl`` seconds, and at most
+    ``max_finished`` of them (least recently looked up first out), so a page
+    can show what happened until the user retries. ``discard`` drops a
+    result sooner, e.g. once it has been downloaded.
+    """
+
+    def __init__(self, max_workers=2, max_finished=32, ttl=600.0):
+        self.max_workers = max_workers
+        self.max_finished = max_finished
+        self.ttl = ttl
+        self._jobs = OrderedDict()
+        self._lock = threading.Lock()
+        self._executor = None
+
+    def _pool(self):
+        if self._executor is None:
+            self._executor = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix="jobs")
+        return self._executor
+
+    def _live(self, job):
+        return job is not None and (job.finished_at is None or time.monotonic() - job.finished_at < self.ttl)
+
+    def get(self, user_id, kind, inputs=()):
+        """The live or finished job of this key, or None."""
+        key = (user_id, kind, inputs)
+        with self._lock:
+            job = self._jobs.get(key)
+            if job is None or not job.done:
+                return job
+            if time.monotonic() - job.finished_at >= self.ttl:
+                del self._jobs[key]
+                job._release()
+                return None
+            self._jobs.move_to_end(key)
+            return job
+
+    def submit(self, user_id, kind, inputs, function, *args, fresh=False, cleanup=None):
+        """Run ``function(job, *args)`` in the pool, unless the same key already is.
+
+        ``inputs`` must be hashable and identify what the job computes (e.g.
+        a digest of its data and its options). ``fresh`` replaces a finished
+        job of the key instead of reusing it, e.g. to retry or for a new
+        export of the same filters. ``cleanup`` is passed to the ``Job``.
+        """
+        key = (user_id, kind, inputs)
+        with self._lock:
+            job = self._jobs.get(key)
+            if self._live(job) and not (fresh and job.done):
+                self._jobs.move_to_end(key)
+                return job
+            if job is not None:
+                job._release()
+            job = Job(key, function, args, cleanup)
+            self._jobs[key] = job
+            self._jobs.move_to_end(key)
+            self._prune()
+            job._future = self._pool().submit(job._run)
+        return job
+
+    def cancel(self, user_id, kind=None):
+        """Cancel the unfinished jobs of a user (e.g. on sign-out), or only those of ``kind``.
+
+        Their finished jobs are dropped and released. Cancelled ones stay until
+        they stop, then go like any finished job.
+        """
+        with self._lock:
+            keys = [key for key in self._jobs if key[0] == user_id and kind in (None, key[1])]
+            finished = [self._jobs.pop(key) for key in keys if self._jobs[key].done]
+            running = [self._jobs[key] for key in keys if key in self._jobs]
+        for job in running:
+            job.cancel()
+        for job in finished:
+            job._release()
+
+    def discard(self, user_id, kind, inputs=()):
+        """Drop the finished job of this key and release its result."""
+        with self._lock:
+            job = self._jobs.get((user_id, kind, inputs))
+            if job is None or not job.done:
+                return
+            del self._jobs[job.key]
+        job._release()
+
+    def _prune(self):
+        now = time.monotonic()
+        finished = [key for key, job in self._jobs.items() if job.done]
+        expired = [key for key in finished if now - self._jobs[key].finished_at >= self.ttl]
+        kept = [key for key in finished if key not in expired]
+        for key in expired + kept[:max(len(kept) - self.max_finished, 0)]:
+            self._jobs.pop(key)._release()
+
+    def stats(self):
+        with self._lock:
+            jobs = list(self._jobs.values())
+        counts = {status: 0 for status in (QUEUED, RUNNING, DONE, FAILED, CANCELLED)}
+        for job in jobs:
+            counts[job.status] += 1
+        return counts
+
+
+def create_job_runner():
+    """Job runner sized by JOB_WORKERS, JOB_MAX_RESULTS and JOB_RESULT_TTL (seconds)."""
+    return JobRunner(
+        max_workers=int(get_setting("JOB_WORKERS", 2)),
+        max_finished=int(get_setting("JOB_MAX_RESULTS", 32)),
+        ttl=float(get_setting("JOB_RESULT_TTL", 600)),
+    )
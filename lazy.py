@@ -0,0 +1,35 @@
+import importlib
+import threading
+
+
+class LazyProxy:
+    """Stands in for an object that is only built on first attribute access.
+
+    Used to keep heavy modules (pandas, Plotly, pyarrow, ...) and the storage
+    client out of the import path of pages that never touch them.
+    """
+
+    def __init__(self, factory, name=None):
+        self._factory = factory
+        self._name = name
+        self._target = None
+        self._lock = threading.Lock()
+
+    def _resolve(self):
+        if self._target is None:
+            with self._lock:
+                if self._target is None:
+                    self._target = self._factory()
+        return self._target
+
+    def __getattr__(self, name):
+        return getattr(self._resolve(), name)
+
+    def __repr__(self):
+        state = "loaded" if self._target is not None else "not loaded"
+        return f"<lazy {self._name or self._factory!r} ({state})>"
+
+
+def lazy_import(name):
+    """Module proxy: ``pd = lazy_import("pandas")`` imports pandas at the first ``pd.<attr>``."""
+    return LazyProxy(lambda: importlib.import_module(name), name)
@@ -0,0 +1,405 @@
+import re
+import sqlite3
+import threading
+import uuid
+from datetime import datetime, timezone
+
+from security import check_password, hash_password
+
+# SQLite counterpart of the Supabase schema (README.md + schema.sql), including
+# the sync triggers and the aggregate views the app reads. `auth_users` stands in
+# for Supabase Auth's own user table.
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS auth_users (
+    id TEXT PRIMARY KEY,
+    email TEXT NOT NULL UNIQUE,
+    encrypted_password TEXT NOT NULL,
+    created_at TEXT NOT NULL,
+    email_confirmed_at TEXT
+);
+
+CREATE TABLE IF NOT EXISTS users (
+    id TEXT PRIMARY KEY,
+    email TEXT,
+    username TEXT,
+    password TEXT,
+    avatar_url TEXT,
+    created_at TEXT
+);
+
+CREATE TABLE IF NOT EXISTS transactions (
+    id TEXT PRIMARY KEY,
+    user_id TEXT NOT NULL,
+    amount REAL NOT NULL,
+    category TEXT,
+    detail TEXT,
+    transaction_type TEXT NOT NULL,
+    date TEXT NOT NULL,
+    updated_at TEXT NOT NULL DEFAULT (strftime('%Y-%m-%dT%H:%M:%f+00:00', 'now'))
+);
+
+-- Serves the user filter of every query plus keyset paging on (date desc, id desc)
+CREATE INDEX IF NOT EXISTS transactions_user_date_idx ON transactions (user_id, date DESC, id DESC);
+CREATE INDEX IF NOT EXISTS transactions_user_updated_at_idx ON transactions (user_id, updated_at);
+
+CREATE TABLE IF NOT EXISTS transaction_tombstones (
+    id TEXT PRIMARY KEY,
+    user_id TEXT NOT NULL,
+    deleted_at TEXT NOT NULL DEFAULT (strftime('%Y-%m-%dT%H:%M:%f+00:00', 'now'))
+);
+
+CREATE INDEX IF NOT EXISTS transaction_tombstones_user_deleted_at_idx ON transaction_tombstones (user_id, deleted_at);
+
+CREATE TRIGGER IF NOT EXISTS transactions_touch_updated_at
+AFTER UPDATE ON transactions
+BEGIN
+    UPDATE transactions SET updated_at = strftime('%Y-%m-%dT%H:%M:%f+00:00', 'now') WHERE id = NEW.id;
+END;
+
+CREATE TRIGGER IF NOT EXISTS transactions_record_tombstone
+AFTER DELETE ON transactions
+BEGIN
+    INSERT OR REPLACE INTO transaction_tombstones (id, user_id) VALUES (OLD.id, OLD.user_id);
+END;
+
+CREATE VIEW IF NOT EXISTS transaction_changes AS
+SELECT id, user_id, amount, category, detail, transaction_type, date,
+       updated_at AS changed_at, 0 AS deleted
+FROM transactions
+UNION ALL
+SELECT id, user_id, NULL, NULL, NULL, NULL, NULL, deleted_at AS changed_at, 1 AS deleted
+FROM transaction_tombstones;
+
+CREATE VIEW IF NOT EXISTS transaction_daily_totals AS
+SELECT user_id, date, category, transaction_type, SUM(amount) AS amount, COUNT(*) AS count
+FROM transactions
+GROUP BY user_id, date, category, transaction_type;
+
+CREATE VIEW IF NOT EXISTS transaction_category_totals AS
+SELECT user_id, category, transaction_type, SUM(amount) AS amount, COUNT(*) AS count
+FROM transactions
+GROUP BY user_id, category, transaction_type;
+
+CREATE TABLE IF NOT EXISTS budgets (
+    id TEXT PRIMARY KEY,
+    user_id TEXT NOT NULL,
+    kind TEXT NOT NULL CHECK (kind IN ('limit', 'savings')),
+    category TEXT,
+    amount REAL NOT NULL CHECK (amount > 0),
+    created_at TEXT NOT NULL DEFAULT (strftime('%Y-%m-%dT%H:%M:%f+00:00', 'now'))
+);
+
+CREATE INDEX IF NOT EXISTS budgets_user_id_idx ON budgets (user_id);
+
+CREATE VIEW IF NOT EXISTS transaction_monthly_totals AS
+SELECT user_id, substr(date, 1, 7) AS month, category, transaction_type, SUM(amount) AS amount, COUNT(*) AS count
+FROM transactions
+GROUP BY user_id, substr(date, 1, 7), category, transaction_type;
+"""
+
+OPERATORS = {"eq": "=", "neq": "!=", "gt": ">", "gte": ">=", "lt": "<", "lte": "<="}
+
+
+def trigrams(text):
+    # pg_trgm's trigram set: lower-case alphanumeric words, each padded as "  word "
+    padded = ["  " + word + " " for word in re.findall(r"[^\W_]+", (text or "").lower())]
+    return {word[i:i + 3] for word in padded for i in range(len(word) - 2)}
+
+
+def similarity(a, b):
+    left, right = trigrams(a), trigrams(b)
+    union = len(left | right)
+    return len(left & right) / union if union else 0.0
+
+
+def search_transactions(connection, p_user_id, p_query="", p_category=None, p_min_amount=None,
+                        p_max_amount=None, p_limit=50, p_offset=0):
+    """``search_transactions`` of schema.sql, without the trigram index."""
+    conditions, params = ["user_id = ?"], [p_user_id]
+    for column, op, value in (("category", "=", p_category), ("amount", ">=", p_min_amount), ("amount", "<=", p_max_amount)):
+        if value is not None:
+            conditions.append(f"{column} {op} ?")
+            params.append(value)
+    for word in re.findall(r"[^\W_]+", (p_query or "").lower()):
+        conditions.append("instr(py_lower(coalesce(detail, '')), ?) > 0")
+        params.append(word)
+    rows = connection.execute(
+        f"SELECT *, similarity(detail, ?) AS rank, COUNT(*) OVER () AS total FROM transactions "
+        f"WHERE {' AND '.join(conditions)} ORDER BY rank DESC, date DESC, id DESC LIMIT ? OFFSET ?",
+        [p_query or ""] + params + [int(p_limit), int(p_offset)],
+    )
+    return [dict(row) for row in rows.fetchall()]
+
+
+# Database functions callable with ``client.rpc(name, params)``
+FUNCTIONS = {"search_transactions": search_transactions}
+
+
+class LocalResponse:
+    def __init__(self, data, count=None):
+        self.data = data
+        self.count = count
+
+
+class LocalQuery:
+    """Chainable query with the subset of the postgrest-py builder API the app uses."""
+
+    def __init__(self, client, table):
+        self.client = client
+        self.table = table
+        self.action = "select"
+        self.columns = "*"
+        self.count = None
+        self.payload = None
+        self.is_single = False
+        self.conditions = []
+        self.params = []
+        self.ordering = []
+        self.limit_rows = None
+
+    # --- actions ---
+    def select(self, *columns, count=None):
+        self.action = "select"
+        self.columns = ", ".join(columns) if columns else "*"
+        if not re.fullmatch(r"[\w\s,*]+", self.columns):
+            raise ValueError(f"Invalid column list: {self.columns}")
+        self.count = count
+        return self
+
+    def insert(self, json):
+        self.action = "insert"
+        self.payload = json if isinstance(json, list) else [json]
+        return self
+
+    def update(self, json):
+        self.action = "update"
+        self.payload = json
+        return self
+
+    def delete(self):
+        self.action = "delete"
+        return self
+
+    # --- filters ---
+    def _filter(self, column, op, value):
+        self.conditions.append(f"{self._column(column)} {OPERATORS[op]} ?")
+        self.params.append(value)
+        return self
+
+    def eq(self, column, value):
+        return self._filter(column, "eq", value)
+
+    def neq(self, column, value):
+        return self._filter(column, "neq", value)
+
+    def gt(self, column, value):
+        return self._filter(column, "gt", value)
+
+    def gte(self, column, value):
+        return self._filter(column, "gte", value)
+
+    def lt(self, column, value):
+        return self._filter(column, "lt", value)
+
+    def lte(self, column, value):
+        return self._filter(column, "lte", value)
+
+    def in_(self, column, values):
+        values = list(values)
+        self.conditions.append(f"{self._column(column)} IN ({', '.join('?' * len(values))})")
+        self.params.extend(values)
+        return self
+
+    def or_(self, filters):
+        sql, params = self._parse_logic("or", filters)
+        self.conditions.append(sql)
+        self.params.extend(params)
+        return self
+
+    # --- modifiers ---
+    def order(self, column, *, desc=False):
+        self.ordering.append(f"{self._column(column)} {'DESC' if desc else 'ASC'}")
+        return self
+
+    def limit(self, size):
+        self.limit_rows = size
+        return self
+
+    def single(self):
+        self.is_single = True
+        return self
+
+    @staticmethod
+    def _column(name):
+        if not re.fullmatch(r"\w+", name):
+            raise ValueError(f"Invalid column name: {name}")
+        return f'"{name}"'
+
+    def _parse_logic(self, joiner, filters):
+        # PostgREST logic tree, e.g. "date.lt.2024-01-01,and(date.eq.2024-01-01,id.lt.abc)"
+        parts, depth, current = [], 0, ""
+        for char in filters:
+            if char == "," and depth == 0:
+                parts.append(current)
+                current = ""
+                continue
+            depth += char == "("
+            depth -= char == ")"
+            current += char
+        parts.append(current)
+
+        clauses, params = [], []
+        for part in parts:
+            nested = re.fullmatch(r"(and|or)\((.*)\)", part)
+            if nested:
+                sql, nested_params = self._parse_logic(*nested.groups())
+            else:
+                column, op, value = part.split(".", 2)
+                sql, nested_params = f"{self._column(column)} {OPERATORS[op]} ?", [value]
+            clauses.append(sql)
+            params.extend(nested_params)
+        return "(" + f" {joiner.upper()} ".join(clauses) + ")", params
+
+    def _where(self):
+        return f" WHERE {' AND '.join(self.conditions)}" if self.conditions else ""
+
+    def execute(self):
+        table = self._column(self.table)
+        with self.client.lock, self.client.connection as connection:
+            if self.action == "insert":
+                rows = []
+                for record in self.payload:
+                    columns = ", ".join(self._column(column) for column in record)
+                    placeholders = ", ".join("?" * len(record))
+                    cursor = connection.execute(
+                        f"INSERT INTO {table} ({columns}) VALUES ({placeholders}) RETURNING *",
+                        list(record.values()),
+                    )
+                    rows.extend(dict(row) for row in cursor.fetchall())
+                return LocalResponse(rows)
+
+            if self.action == "update":
+                assignments = ", ".join(f"{self._column(column)} = ?" for column in self.payload)
+                cursor = connection.execute(
+                    f"UPDATE {table} SET {assignments}{self._where()} RETURNING *",
+                    list(self.payload.values()) + self.params,
+                )
+                return LocalResponse([dict(row) for row in cursor.fetchall()])
+
+            if self.action == "delete":
+                cursor = connection.execute(f"DELETE FROM {table}{self._where()} RETURNING *", self.params)
+                return LocalResponse([dict(row) for row in cursor.fetchall()])
+
+            count = None
+            if self.count:
+                count = connection.execute(f"SELECT COUNT(*) FROM {table}{self._where()}", self.params).fetchone()[0]
+            sql = f"SELECT {self.columns} FROM {table}{self._where()}"
+            if self.ordering:
+                sql += f" ORDER BY {', '.join(self.ordering)}"
+            if self.limit_rows is not None:
+                sql += f" LIMIT {int(self.limit_rows)}"
+            rows = [dict(row) for row in connection.execute(sql, self.params).fetchall()]
+
+        if self.is_single:
+            if len(rows) != 1:
+                raise ValueError(f"Expected a single row from '{self.table}', got {len(rows)}")
+            return LocalResponse(rows[0], count)
+        return LocalResponse(rows, count)
+
+
+class LocalFunctionCall:
+    def __init__(self, client, function, params):
+        self.client = client
+        self.function = function
+        self.params = params
+
+    def execute(self):
+        with self.client.lock:
+            return LocalResponse(self.function(self.client.connection, **self.params))
+
+
+class LocalAuthUser:
+    def __init__(self, id, email, created_at, email_confirmed_at=None):
+        self.id = id
+        self.email = email
+        self.created_at = created_at
+        self.email_confirmed_at = email_confirmed_at
+
+
+class LocalAuthResponse:
+    def __init__(self, user):
+        self.user = user
+
+
+class LocalAuth:
+    """Email + password auth with the methods of ``supabase.auth`` the app calls.
+
+    There is no mail server offline, so accounts are confirmed on sign-up.
+    """
+
+    def __init__(self, client):
+        self.client = client
+
+    @staticmethod
+    def _user(row):
+        confirmed_at = row["email_confirmed_at"]
+        return LocalAuthUser(
+            row["id"], row["email"], datetime.fromisoformat(row["created_at"]),
+            datetime.fromisoformat(confirmed_at) if confirmed_at else None,
+        )
+
+    def sign_up(self, credentials):
+        now = datetime.now(timezone.utc).isoformat()
+        hashed = hash_password(credentials["password"])
+        with self.client.lock, self.client.connection as connection:
+            try:
+                row = connection.execute(
+                    "INSERT INTO auth_users (id, email, encrypted_password, created_at, email_confirmed_at) "
+                    "VALUES (?, ?, ?, ?, ?) RETURNING *",
+                    (str(uuid.uuid4()), credentials["email"], hashed, now, now),
+                ).fetchone()
+            except sqlite3.IntegrityError:
+                raise ValueError("User already registered")
+        return LocalAuthResponse(self._user(row))
+
+    def sign_in_with_password(self, credentials):
+        with self.client.lock:
+            row = self.client.connection.execute(
+                "SELECT * FROM auth_users WHERE email = ?", (credentials["email"],)
+            ).fetchone()
+        if row is None or not check_password(credentials["password"], row["encrypted_password"]):
+            raise ValueError("Invalid login credentials")
+        return LocalAuthResponse(self._user(row))
+
+    def resend_confirmation_email(self, email):
+        pass
+
+
+class LocalClient:
+    """Embedded SQLite stand-in for the Supabase client.
+
+    Exposes ``table(name)`` with the same chained query API as supabase-py,
+    ``rpc(name, params)`` for the functions of schema.sql, and an ``auth``
+    object for sign-up/sign-in, so the whole app can run without a network:
+    offline deployments, tests and benchmarks. ``path`` is a database
+    file, or ":memory:" for a throwaway database.
+    """
+
+    def __init__(self, path=":memory:"):
+        self.path = path
+        self.lock = threading.RLock()
+        self.connection = sqlite3.connect(path, check_same_thread=False)
+        self.connection.row_factory = sqlite3.Row
+        # SQLite's lower() only folds ASCII
+        self.connection.create_function("py_lower", 1, str.lower, deterministic=True)
+        self.connection.create_function("similarity", 2, similarity, deterministic=True)
+        if path != ":memory:":
+            self.connection.execute("PRAGMA journal_mode=WAL")
+        self.connection.executescript(SCHEMA)
+        self.auth = LocalAuth(self)
+
+    def table(self, name):
+        return LocalQuery(self, name)
+
+    def rpc(self, name, params=None):
+        return LocalFunctionCall(self, FUNCTIONS[name], params or {})
@@ -1,37 +1,61 @@
+from __future__ import annotations
+
+import time
 import uuid
-import bcrypt
-import pandas as pd
+from concurrent.futures import ThreadPoolExecutor
+from functools import cache
 from datetime import date
 import streamlit as st
+from lazy import lazy_import
+
+# Only loaded once transactions are touched, not for the sign-in page
+np = lazy_import("numpy")
+pd = lazy_import("pandas")
+pa = lazy_import("pyarrow")
+pc = lazy_import("pyarrow.compute")
+insights = lazy_import("insights")
+search = lazy_import("search")
+
+CATEGORIES = ["Food", "Transport", "Entertainment", "Utilities", "Health", "Education", "Salary", "Investment", "Other"]
+TRANSACTION_TYPES = ["income", "expense"]
 
 def generate_uuid():
     return str(uuid.uuid4())
 
 class User:
-    def __init__(self, id, email, username, password=None, avatar_url=None, created_at=None):
+    def __init__(self, id, email, username, password=None, avatar_url=None, created_at=None, password_hash=None):
         self.id = id
         self.email = email
         self.username = username
-        self.password_hash = None
+        self.password_hash = password_hash
         self.avatar_url = avatar_url or "https://icons.iconarchive.com/icons/iconarchive/wild-camping/512/Bird-Owl-icon.png"
         self.created_at = created_at
         if password:
             self.password_hash = self.hash_password(password)
 
     def hash_password(self, password: str) -> str:
-        salt = bcrypt.gensalt()
-        return bcrypt.hashpw(password.encode('utf-8'), salt).decode('utf-8')
+        from security import hash_password
+        return hash_password(password)
 
     def check_password(self, password: str) -> bool:
-        return bcrypt.checkpw(password.encode('utf-8'), self.password_hash.encode('utf-8'))
+        from security import check_password
+        return check_password(password, self.password_hash)
+
+    @classmethod
+    def from_row(cls, row):
+        # The 'password' column of the users table already holds a bcrypt hash
+        row = dict(row)
+        return cls(password_hash=row.pop("password", None), **row)
 
     @classmethod
     def from_session(cls):
         if "user" in st.session_state:
-            return cls(**st.session_state.user)
+            return cls.from_row(st.session_state.user)
         return None
 
 class Transaction:
+    __slots__ = ("id", "user_id", "amount", "category", "detail", "transaction_type", "date")
+
     def __init__(self, id, user_id, amount, category, detail, transaction_type, date):
         self.id = id
         self.user_id = user_id
@@ -40,3 +64,760 @@ class Transaction:
         self.detail = detail
         self.transaction_type = transaction_type
         self.date = date
+
+    def to_dict(self):
+        return {
+            "id": self.id,
+            "user_id": self.user_id,
+            "amount": self.amount,
+            "category": self.category,
+            "detail": self.detail,
+            "transaction_type": self.transaction_type,
+            "date": self.date.isoformat() if isinstance(self.date, date) else self.date,
+        }
+
+@cache
+def record_schema():
+    # Arrow schema of transaction records as the API returns them
+    return pa.schema([
+        ("id", pa.string()),
+        ("amount", pa.float64()),
+        ("category", pa.string()),
+        ("detail", pa.string()),
+        ("transaction_type", pa.string()),
+        ("date", pa.string()),
+    ])
+
+
+class TransactionFrame:
+    """Compact, columnar table of one user's transactions.
+
+    JSON records are converted once, in bulk, with Arrow compute kernels:
+    ids become 16-byte binary UUIDs, dates are date32, category and type are
+    categoricals and amounts are integer cents. The user id is kept once on the
+    frame instead of per row. Use ``to_pandas()`` for display and the ``ids``,
+    ``dates`` and ``amounts`` accessors for familiar dtypes.
+    """
+
+    __slots__ = ("user_id", "data")
+
+    def __init__(self, data: pd.DataFrame, user_id=None):
+        self.data = data
+        self.user_id = user_id
+
+    @staticmethod
+    def _uuid_bytes(ids) -> pa.FixedSizeBinaryArray:
+        # Strip dashes, then decode the contiguous hex buffer in one call
+        hexed = pc.replace_substring(pa.array(ids, pa.string()), "-", "")
+        if isinstance(hexed, pa.ChunkedArray):
+            hexed = hexed.combine_chunks()
+        offsets = np.frombuffer(hexed.buffers()[1], dtype=np.int32)[hexed.offset:hexed.offset + len(hexed) + 1]
+        if hexed.null_count or not (np.diff(offsets) == 32).all():
+            raise ValueError("Transaction ids must be UUIDs")
+        raw = b"" if len(hexed) == 0 else bytes.fromhex(
+            hexed.buffers()[2].to_pybytes()[offsets[0]:offsets[-1]].decode("ascii")
+        )
+        return pa.FixedSizeBinaryArray.from_buffers(pa.binary(16), len(hexed), [None, pa.py_buffer(raw)])
+
+    @staticmethod
+    def _categorical(values: pa.ChunkedArray, known) -> pd.Categorical:
+        categorical = pc.dictionary_encode(values).to_pandas().astype("category")
+        extras = sorted(set(categorical.cat.categories) - set(known))
+        return categorical.cat.set_categories(list(known) + extras)
+
+    @classmethod
+    def from_records(cls, records, user_id=None) -> "TransactionFrame":
+        table = pa.Table.from_pylist(list(records), schema=record_schema())
+        data = pd.DataFrame({
+            "id": pd.Series(cls._uuid_bytes(table["id"]), dtype=pd.ArrowDtype(pa.binary(16))),
+            "date": pd.Series(pc.cast(table["date"], pa.date32()), dtype=pd.ArrowDtype(pa.date32())),
+            "category": cls._categorical(table["category"], CATEGORIES),
+            "transaction_type": cls._categorical(table["transaction_type"], TRANSACTION_TYPES),
+            "amount_cents": pc.cast(pc.round(pc.multiply(table["amount"], 100)), pa.int64()).to_numpy(),
+            "detail": pd.Series(table["detail"], dtype=pd.ArrowDtype(pa.string())),
+        })
+        return cls(data, user_id)
+
+    def __len__(self):
+        return len(self.data)
+
+    @property
+    def empty(self):
+        return self.data.empty
+
+    def _arrow(self, column) -> pa.Array:
+        array = pa.array(self.data[column])
+        return array.combine_chunks() if isinstance(array, pa.ChunkedArray) else array
+
+    def id_bytes(self, start=0, stop=None):
+        """The raw 16-byte ids of rows ``start:stop``, back to back (e.g. to hash which rows an index has seen)."""
+        ids = pa.array(self.data["id"].iloc[start:stop])
+        if isinstance(ids, pa.ChunkedArray):
+            ids = ids.combine_chunks()
+        return memoryview(ids.buffers()[1].slice(ids.offset * 16, len(ids) * 16)) if len(ids) else b""
+
+    @property
+    def ids(self) -> pd.Series:
+        # Format the binary ids back into canonical UUID strings, vectorized
+        raw = self._arrow("id")
+        n = len(raw)
+        hexed = pa.StringArray.from_buffers(
+            n, pa.py_buffer(np.arange(0, 32 * n + 1, 32, dtype=np.int32)),
+            pa.py_buffer(np.frombuffer(raw.buffers()[1], dtype="S16")[raw.offset:raw.offset + n].tobytes().hex().encode()),
+        )
+        parts = [pc.utf8_slice_codeunits(hexed, start, stop) for start, stop in ((0, 8), (8, 12), (12, 16), (16, 20), (20, 32))]
+        return pd.Series(pc.binary_join_element_wise(*parts, "-").to_numpy(zero_copy_only=False), index=self.data.index, name="id")
+
+    @property
+    def dates(self) -> pd.Series:
+        days = self._arrow("date").cast(pa.int32()).to_numpy(zero_copy_only=False)
+        return pd.Series(days.astype("datetime64[D]").astype("datetime64[ns]"), index=self.data.index, name="date")
+
+    @property
+    def amounts(self) -> pd.Series:
+        return (self.data["amount_cents"] / 100).rename("amount")
+
+    def to_pandas(self) -> pd.DataFrame:
+        return pd.DataFrame({
+            "id": self.ids,
+            "user_id": self.user_id,
+            "amount": self.amounts,
+            "category": self.data["category"],
+            "detail": self.data["detail"],
+            "transaction_type": self.data["transaction_type"],
+            "date": self.dates,
+        })
+
+    def to_arrow(self) -> pa.Table:
+        """Plain Arrow table with string ids and categories and float amounts, for exports."""
+        return pa.table({
+            "id": pa.array(self.ids, pa.string()),
+            "date": self._arrow("date"),
+            "category": pa.array(self.data["category"].astype(object), pa.string()),
+            "transaction_type": pa.array(self.data["transaction_type"].astype(object), pa.string()),
+            "amount": pa.array(self.amounts, pa.float64()),
+            "detail": self._arrow("detail"),
+        })
+
+    def concat(self, other: "TransactionFrame") -> "TransactionFrame":
+        left, right = self.data, other.data
+        for column in ("category", "transaction_type"):
+            categories = left[column].cat.categories.union(right[column].cat.categories, sort=False)
+            left = left.assign(**{column: left[column].cat.set_categories(categories)})
+            right = right.assign(**{column: right[column].cat.set_categories(categories)})
+        return TransactionFrame(pd.concat([left, right], ignore_index=True), self.user_id)
+
+    def has_ids(self, ids) -> np.ndarray:
+        """Boolean mask of the rows whose id is in ``ids``."""
+        return self.data["id"].isin(pd.Series(self._uuid_bytes(list(ids)), dtype=pd.ArrowDtype(pa.binary(16)))).to_numpy()
+
+    def drop_rows(self, mask) -> "TransactionFrame":
+        return TransactionFrame(self.data[~mask].reset_index(drop=True), self.user_id)
+
+    def drop_ids(self, ids) -> "TransactionFrame":
+        return self.drop_rows(self.has_ids(ids))
+
+class AggregateCube:
+    """Amount and row count of transactions over date x category x type.
+
+    Built in one vectorized pass: each axis is factorized once and both
+    measures are summed with ``np.bincount`` over the flattened cell index.
+    Totals, per-category and per-date tables are roll-ups of the dense arrays,
+    so a page derives all of its cards and charts without rescanning rows.
+    """
+
+    __slots__ = ("dates", "categories", "types", "amount", "count")
+
+    def __init__(self, dates: pd.DatetimeIndex, categories: pd.Index, types: pd.Index, amount: np.ndarray, count: np.ndarray):
+        self.dates = dates
+        self.categories = categories
+        self.types = types
+        self.amount = amount
+        self.count = count
+
+    @classmethod
+    def from_columns(cls, dates, categories, types, amounts, counts=None) -> "AggregateCube":
+        """``counts`` are per-row counts of pre-aggregated rows; each row counts once without them."""
+        date_codes, date_labels = pd.factorize(pd.DatetimeIndex(dates), sort=True)
+        category_codes, category_labels = pd.factorize(categories, sort=True)
+        type_codes, type_labels = pd.factorize(types, sort=True)
+        shape = (len(date_labels), len(category_labels), len(type_labels))
+        cells = (date_codes * shape[1] + category_codes) * shape[2] + type_codes
+        size = shape[0] * shape[1] * shape[2]
+        amount = np.bincount(cells, weights=np.asarray(amounts, dtype=float), minlength=size)
+        count = np.bincount(cells, weights=None if counts is None else np.asarray(counts, dtype=float), minlength=size)
+        return cls(
+            pd.DatetimeIndex(date_labels, name="date"),
+            pd.Index(np.asarray(category_labels).astype(str), name="category"),
+            pd.Index(np.asarray(type_labels).astype(str), name="transaction_type"),
+            amount.reshape(shape),
+            count.astype(np.int64).reshape(shape),
+        )
+
+    @classmethod
+    def from_frame(cls, df: pd.DataFrame) -> "AggregateCube":
+        # Raw transactions, or rows already summed per cell with a "count" column
+        return cls.from_columns(
+            df["date"], df["category"], df["transaction_type"], df["amount"], df["count"] if "count" in df else None
+        )
+
+    @classmethod
+    def from_transactions(cls, frame: TransactionFrame) -> "AggregateCube":
+        return cls.from_columns(frame.dates, frame.data["category"], frame.data["transaction_type"], frame.amounts)
+
+    @property
+    def empty(self):
+        return not self.count.any()
+
+    def between(self, start=None, end=None) -> "AggregateCube":
+        """The cube restricted to ``start <= date <= end`` (a view, no copy)."""
+        lo = 0 if start is None else self.dates.searchsorted(pd.Timestamp(start), "left")
+        hi = len(self.dates) if end is None else self.dates.searchsorted(pd.Timestamp(end), "right")
+        return AggregateCube(self.dates[lo:hi], self.categories, self.types, self.amount[lo:hi], self.count[lo:hi])
+
+    def totals(self) -> pd.Series:
+        """Amount per transaction type."""
+        return pd.Series(self.amount.sum(axis=(0, 1)), index=self.types, name="amount")
+
+    def total(self, transaction_type) -> float:
+        totals = self.totals()
+        return float(totals.get(transaction_type, 0.0))
+
+    @staticmethod
+    def _long(amount, count, rows, columns):
+        # Non-empty cells of a 2-D roll-up as a long table, ordered like a groupby
+        i, j = np.nonzero(count)
+        return pd.DataFrame({
+            rows.name: rows[i], columns.name: columns[j], "amount": amount[i, j], "count": count[i, j],
+        })
+
+    def by_category(self) -> pd.DataFrame:
+        """category, transaction_type, amount, count."""
+        return self._long(self.amount.sum(axis=0), self.count.sum(axis=0), self.categories, self.types)
+
+    def by_date(self, by="transaction_type") -> pd.DataFrame:
+        """date, ``by`` ("transaction_type" or "category"), amount, count."""
+        axis, labels = (1, self.types) if by == "transaction_type" else (2, self.categories)
+        return self._long(self.amount.sum(axis=axis), self.count.sum(axis=axis), self.dates, labels)
+
+    def cells(self, transaction_type) -> pd.DataFrame:
+        """date, category, amount, count of one transaction type."""
+        if transaction_type not in self.types:
+            return pd.DataFrame(columns=["date", "category", "amount", "count"])
+        t = self.types.get_loc(transaction_type)
+        return self._long(self.amount[:, :, t], self.count[:, :, t], self.dates, self.categories)
+
+
+class TransactionRepository:
+    """Owns all reads and writes of the 'transactions' table.
+
+    Each user's history is fetched once per session and kept as a
+    ``TransactionFrame``; inserts and deletes patch the cached frame in place so reruns
+    never go back to the network. Changes made elsewhere (another device or
+    session) are picked up by an incremental sync at most every
+    ``sync_interval`` seconds, which only asks for rows changed since the last
+    high-water mark (see ``transaction_changes`` in schema.sql).
+    """
+
+    TABLE = "transactions"
+    CHANGES = "transaction_changes"
+    DAILY_TOTALS = "transaction_daily_totals"
+    CATEGORY_TOTALS = "transaction_category_totals"
+    SEARCH = "search_transactions"
+    AGGREGATE_COLUMNS = {
+        DAILY_TOTALS: ["date", "category", "transaction_type", "amount", "count"],
+        CATEGORY_TOTALS: ["category", "transaction_type", "amount", "count"],
+    }
+
+    def __init__(self, client, sync_interval=15.0, async_database=None, snapshots=None, budgets=None):
+        self.client = client
+        self.sync_interval = sync_interval
+        # Runs the queries of prefetch() concurrently; without it they run one after another
+        self.async_database = async_database
+        # On-disk frames (snapshots.SnapshotCache) that outlive sessions and restarts
+        self.snapshots = snapshots
+        # Running budget totals (budgets.BudgetEngine), patched by every insert and delete
+        self.budgets = budgets
+
+    @property
+    def _cache(self):
+        if "transactions_cache" not in st.session_state:
+            st.session_state.transactions_cache = {}
+        return st.session_state.transactions_cache
+
+    @property
+    def _query_cache(self):
+        # Pages and aggregates, per user: {key: (fetched_at, result)}
+        if "transactions_query_cache" not in st.session_state:
+            st.session_state.transactions_query_cache = {}
+        return st.session_state.transactions_query_cache
+
+    @property
+    def _cube_cache(self):
+        # {user_id: (frame or daily totals it was built from, AggregateCube)}
+        if "transactions_cube_cache" not in st.session_state:
+            st.session_state.transactions_cube_cache = {}
+        return st.session_state.transactions_cube_cache
+
+    @property
+    def _insights_cache(self):
+        # {user_id: (frame the index has seen, insights.RecurrenceIndex)}
+        if "transactions_insights_cache" not in st.session_state:
+            st.session_state.transactions_insights_cache = {}
+        return st.session_state.transactions_insights_cache
+
+    @property
+    def _search_cache(self):
+        # {user_id: (frame the index has seen, search.SearchIndex)}
+        if "transactions_search_cache" not in st.session_state:
+            st.session_state.transactions_search_cache = {}
+        return st.session_state.transactions_search_cache
+
+    @property
+    def _sync_state(self):
+        if "transactions_sync_state" not in st.session_state:
+            st.session_state.transactions_sync_state = {}
+        return st.session_state.transactions_sync_state
+
+    @staticmethod
+    def _watermark(timestamps):
+        # Keep the server's own string for the latest timestamp, so comparing it
+        # back on the server is exact whatever precision the server uses
+        timestamps = pd.Series(timestamps, dtype="object").dropna().reset_index(drop=True)
+        if timestamps.empty:
+            return None
+        return timestamps[pd.to_datetime(timestamps, utc=True, format="ISO8601").idxmax()]
+
+    def _stale(self, user_id, key):
+        queries = self._query_cache.get(user_id, {})
+        return key not in queries or time.monotonic() - queries[key][0] >= self.sync_interval
+
+    def _store(self, user_id, key, result):
+        self._query_cache.setdefault(user_id, {})[key] = (time.monotonic(), result)
+
+    def _cached_query(self, user_id, key, fetch):
+        if self._stale(user_id, key):
+            self._store(user_id, key, fetch())
+        return self._query_cache[user_id][key][1]
+
+    def _frame_query(self, user_id):
+        return lambda client: client.table(self.TABLE).select("*").eq("user_id", user_id)
+
+    def _load_frame(self, user_id, rows):
+        self._cache[user_id] = TransactionFrame.from_records(rows, user_id)
+        watermark = self._watermark([row.get("updated_at") for row in rows])
+        self._sync_state[user_id] = {
+            "watermark": watermark,
+            "synced_at": time.monotonic(),
+            # The next sync fetches the rows at the watermark again; they are already here
+            "applied": {row["id"]: (False, watermark) for row in rows if row.get("updated_at") == watermark},
+        }
+        self._save_snapshot(user_id)
+
+    def fetch_frame(self, user_id):
+        """Load the user's frame without touching session state: ``(frame, watermark, synced_at)``.
+
+        For background jobs, whose threads have no Streamlit session; hand the
+        result to ``adopt_frame`` on the script thread. A frame restored from
+        a snapshot has not been synced (``synced_at`` is None).
+        """
+        snapshot = self.snapshots.load(user_id) if self.snapshots is not None else None
+        if snapshot is not None:
+            return snapshot + (None,)
+        synced_at = time.monotonic()
+        rows = self._frame_query(user_id)(self.client).execute().data
+        frame, watermark = TransactionFrame.from_records(rows, user_id), self._watermark([row.get("updated_at") for row in rows])
+        if self.snapshots is not None:
+            try:
+                self.snapshots.save(user_id, frame, watermark)
+            except OSError:
+                pass  # a cache; the next full load tries again
+        return frame, watermark, synced_at
+
+    def adopt_frame(self, user_id, frame, watermark, synced_at):
+        """Cache a frame from ``fetch_frame`` for this session, unless one already is.
+
+        It is synced on the next ``frame()`` call once it is ``sync_interval`` old.
+        """
+        if user_id in self._cache:
+            return
+        self._cache[user_id] = frame
+        self._sync_state[user_id] = {"watermark": watermark, "synced_at": float("-inf") if synced_at is None else synced_at}
+
+    def _restore(self, user_id):
+        """Load the frame from the user's snapshot and catch up with the server.
+
+        Only the changes after the snapshot's watermark are fetched, so the
+        check costs one indexed query. Returns False without a usable snapshot.
+        """
+        if self.snapshots is None:
+            return False
+        snapshot = self.snapshots.load(user_id)
+        if snapshot is None:
+            return False
+        self._cache[user_id], watermark = snapshot
+        self._sync_state[user_id] = {"watermark": watermark, "synced_at": time.monotonic()}
+        self.sync(user_id)
+        return True
+
+    def _save_snapshot(self, user_id):
+        # Written in the background and at most every snapshots.min_interval seconds. Local
+        # inserts and deletes are not saved: the next restore syncs them from the server
+        if self.snapshots is not None:
+            self.snapshots.save_later(user_id, self._cache[user_id], self._sync_state[user_id]["watermark"])
+
+    def has_frame(self, user_id):
+        """Whether ``frame()`` can answer from memory, without a full load."""
+        return user_id in self._cache
+
+    def frame(self, user_id) -> TransactionFrame:
+        # The returned frame is shared across reruns; callers must not mutate it
+        if user_id not in self._cache:
+            if not self._restore(user_id):
+                self._load_frame(user_id, self._frame_query(user_id)(self.client).execute().data)
+        elif time.monotonic() - self._sync_state[user_id]["synced_at"] >= self.sync_interval:
+            self.sync(user_id)
+        return self._cache[user_id]
+
+    def sync(self, user_id):
+        """Merge rows changed or deleted on the server since the last sync.
+
+        Returns the number of changes applied. Rows at exactly the watermark
+        are fetched again on purpose, so writes that committed with the same
+        timestamp are not missed; those, and this session's own inserts and
+        deletes, are recognized and skipped, so they do not rebuild the frame.
+        """
+        if user_id not in self._cache:
+            self.frame(user_id)
+            return 0
+        state = self._sync_state[user_id]
+        query = self.client.table(self.CHANGES).select("*").eq("user_id", user_id)
+        if state["watermark"] is not None:
+            query = query.gte("changed_at", state["watermark"])
+        res = query.execute()
+        state["synced_at"] = time.monotonic()
+        if not res.data:
+            return 0
+
+        changes = pd.DataFrame(res.data)
+        state["watermark"] = self._watermark(changes["changed_at"])
+        changes = self._unapplied(state, changes)
+        if changes.empty:
+            return 0
+        merged = self._drop_ids(user_id, changes["id"])
+        upserts = changes[~changes["deleted"].astype(bool)]
+        if not upserts.empty:
+            merged = merged.concat(TransactionFrame.from_records(upserts.to_dict("records"), user_id))
+        self._cache[user_id] = merged
+        self._query_cache.pop(user_id, None)
+        self._save_snapshot(user_id)
+        return len(changes)
+
+    @staticmethod
+    def _unapplied(state, changes):
+        """The ``changes`` the frame does not have yet.
+
+        ``state["applied"]`` maps ids to ``(deleted, changed_at)`` of the
+        changes already merged: the rows at the watermark, which the next sync
+        fetches again, and the session's own writes (``changed_at`` is None
+        when the write did not return it).
+        """
+        applied = state.get("applied", {})
+        deleted = changes["deleted"].astype(bool).to_numpy()
+        known = np.array([
+            id in applied and applied[id][0] == gone and applied[id][1] in (None, changed_at)
+            for id, changed_at, gone in zip(changes["id"], changes["changed_at"], deleted)
+        ], bool)
+        changed_at = pd.to_datetime(changes["changed_at"], utc=True, format="ISO8601")
+        latest = (changed_at == changed_at.max()).to_numpy()
+        fetched = set(changes["id"])
+        state["applied"] = {id: entry for id, entry in applied.items() if id not in fetched}
+        state["applied"].update(zip(changes["id"][latest], zip(deleted[latest].tolist(), changes["changed_at"][latest])))
+        return changes[~known]
+
+    def _mark_applied(self, user_id, rows, deleted=False):
+        # This session's writes are in the frame already; sync() skips them when they come back
+        state = self._sync_state.get(user_id)
+        if state is not None:
+            applied = state.setdefault("applied", {})
+            for row in rows:
+                applied[row["id"]] = (deleted, None if deleted else row.get("updated_at"))
+
+    def _aggregate_query(self, user_id, view):
+        return lambda client: client.table(view).select("*").eq("user_id", user_id)
+
+    def _aggregate_frame(self, view, rows):
+        df = pd.DataFrame(rows, columns=self.AGGREGATE_COLUMNS[view])
+        df["amount"] = df["amount"].astype("float64")
+        df["count"] = df["count"].astype("int64")
+        if "date" in df:
+            df["date"] = pd.to_datetime(df["date"])
+        return df
+
+    def _aggregate(self, user_id, view):
+        return self._cached_query(
+            user_id, view, lambda: self._aggregate_frame(view, self._aggregate_query(user_id, view)(self.client).execute().data)
+        )
+
+    def daily_totals(self, user_id) -> pd.DataFrame:
+        """Amount and row count per date x category x type, summed by the database."""
+        return self._aggregate(user_id, self.DAILY_TOTALS)
+
+    def category_totals(self, user_id) -> pd.DataFrame:
+        """Amount and row count per category x type, summed by the database."""
+        return self._aggregate(user_id, self.CATEGORY_TOTALS)
+
+    def prefetch(self, user_id, *names, extra=()):
+        """Fetch what ``names`` still miss from the cache in one concurrent round.
+
+        ``names`` are "frame", "daily_totals", "category_totals" and "cube" (what
+        ``cube()`` reads); the methods of the same name then answer from the
+        cache. A frame with a snapshot is restored from disk instead. ``extra`` are more query
+        builders (``lambda client: client.table(...)...``) to run in the same
+        round, e.g. the profile row; their responses are returned in order.
+        """
+        pending = []
+        for name in names:
+            if name == "cube":
+                if user_id in self._cache or self._restore(user_id):
+                    continue
+                name = "daily_totals"
+            if name == "frame":
+                if user_id not in self._cache and not self._restore(user_id):
+                    pending.append((self._frame_query(user_id), lambda rows: self._load_frame(user_id, rows)))
+                continue
+            view = {"daily_totals": self.DAILY_TOTALS, "category_totals": self.CATEGORY_TOTALS}[name]
+            if self._stale(user_id, view):
+                pending.append((
+                    self._aggregate_query(user_id, view),
+                    lambda rows, view=view: self._store(user_id, view, self._aggregate_frame(view, rows)),
+                ))
+
+        queries = [query for query, _ in pending] + list(extra)
+        if self.async_database is not None:
+            responses = self.async_database.gather(*queries)
+        else:
+            responses = [query(self.client).execute() for query in queries]
+        for (_, store), res in zip(pending, responses):
+            store(res.data)
+        return responses[len(pending):]
+
+    def cube(self, user_id) -> AggregateCube:
+        """Date x category x type totals as an ``AggregateCube``.
+
+        Built from the local frame when there is one (loaded this session or
+        in a snapshot), otherwise from ``daily_totals``. Rebuilt only when that
+        source changes.
+        """
+        if user_id in self._cache or (self.snapshots is not None and self.snapshots.exists(user_id)):
+            source, build = self.frame(user_id), AggregateCube.from_transactions
+        else:
+            source, build = self.daily_totals(user_id), AggregateCube.from_frame
+        cached = self._cube_cache.get(user_id)
+        if cached is None or cached[0] is not source:
+            cached = self._cube_cache[user_id] = (source, build(source))
+        return cached[1]
+
+    def recurring(self, user_id) -> "insights.RecurrenceIndex":
+        """Recurring transactions of the user's full history, as an ``insights.RecurrenceIndex``.
+
+        Inserts and syncs only append to the frame, so the index is extended
+        with the new rows; a delete or an edited row rebuilds it.
+        """
+        frame = self.frame(user_id)
+        cached = self._insights_cache.get(user_id)
+        if cached is None or cached[0] is not frame:
+            index = None if cached is None else cached[1]
+            if index is None or not index.extend(frame):
+                index = insights.RecurrenceIndex.build(frame)
+            cached = self._insights_cache[user_id] = (frame, index)
+        return cached[1]
+
+    def search_index(self, user_id) -> "search.SearchIndex":
+        """``search.SearchIndex`` of the user's full history, extended with appended rows."""
+        frame = self.frame(user_id)
+        cached = self._search_cache.get(user_id)
+        if cached is None or cached[0] is not frame:
+            index = None if cached is None else cached[1]
+            if index is None or not index.extend(frame):
+                index = search.SearchIndex.build(frame)
+            cached = self._search_cache[user_id] = (frame, index)
+        return cached[1]
+
+    def search(self, user_id, query="", category=None, min_amount=None, max_amount=None, page=0, page_size=50):
+        """One page of the transactions whose detail contains every word of ``query``, best match first.
+
+        Returns ``(frame, total)``. With the full history local (loaded this
+        session or in a snapshot) an in-process ``search_index`` answers;
+        otherwise the ``search_transactions`` function of schema.sql does,
+        on the database's trigram index.
+        """
+        if user_id in self._cache or (self.snapshots is not None and self.snapshots.exists(user_id)):
+            index = self.search_index(user_id)
+            # The frame the positions refer to
+            frame = self._search_cache[user_id][0]
+            positions, total = index.search(
+                query, category,
+                None if min_amount is None else round(min_amount * 100),
+                None if max_amount is None else round(max_amount * 100),
+                offset=page * page_size, limit=page_size,
+            )
+            return TransactionFrame(frame.data.iloc[positions].reset_index(drop=True), user_id), total
+        return self._cached_query(
+            user_id, ("search", query, category, min_amount, max_amount, page, page_size),
+            lambda: self._fetch_search(user_id, query, category, min_amount, max_amount, page, page_size),
+        )
+
+    def _fetch_search(self, user_id, query, category, min_amount, max_amount, page, page_size):
+        rows = self.client.rpc(self.SEARCH, {
+            "p_user_id": user_id, "p_query": query, "p_category": category,
+            "p_min_amount": min_amount, "p_max_amount": max_amount,
+            "p_limit": page_size, "p_offset": page * page_size,
+        }).execute().data
+        # Every row carries the number of matches
+        return TransactionFrame.from_records(rows, user_id), rows[0]["total"] if rows else 0
+
+    def _filtered_query(self, user_id, start_date=None, end_date=None, category=None, transaction_type=None, count=None):
+        query = self.client.table(self.TABLE).select("*", count=count).eq("user_id", user_id)
+        if start_date is not None:
+            query = query.gte("date", start_date.isoformat())
+        if end_date is not None:
+            query = query.lte("date", end_date.isoformat())
+        if category is not None:
+            query = query.eq("category", category)
+        if transaction_type is not None:
+            query = query.eq("transaction_type", transaction_type)
+        return query
+
+    def page(self, user_id, start_date=None, end_date=None, category=None, transaction_type=None,
+             after=None, page_size=50):
+        """Fetch one page of filtered transactions, newest first.
+
+        Pages are keyed by the (date, id) of the last row of the previous page
+        rather than an offset, so every fetch costs ``page_size`` rows no matter
+        how deep the user pages. Returns ``(frame, total, next_cursor)``; the
+        exact total is only counted for the first page and is ``None`` after.
+        """
+        filters = (start_date, end_date, category, transaction_type)
+        return self._cached_query(
+            user_id, ("page",) + filters + (after, page_size),
+            lambda: self._fetch_page(user_id, filters, after, page_size, count=after is None),
+        )
+
+    def _fetch_page(self, user_id, filters, after, page_size, count=False):
+        query = self._filtered_query(user_id, *filters, count="exact" if count else None)
+        if after is not None:
+            after_date, after_id = after
+            query = query.or_(f"date.lt.{after_date},and(date.eq.{after_date},id.lt.{after_id})")
+        # One extra row tells whether another page follows
+        res = query.order("date", desc=True).order("id", desc=True).limit(page_size + 1).execute()
+        rows = res.data[:page_size]
+        next_cursor = None
+        if len(res.data) > page_size:
+            next_cursor = (rows[-1]["date"], rows[-1]["id"])
+        return TransactionFrame.from_records(rows, user_id), res.count, next_cursor
+
+    def iter_pages(self, user_id, start_date=None, end_date=None, category=None, transaction_type=None,
+                   page_size=1000):
+        """Yield every filtered transaction, one keyset page at a time.
+
+        Pages are not cached, so walking a long history (e.g. for an export)
+        only ever holds one page in memory.
+        """
+        filters = (start_date, end_date, category, transaction_type)
+        after = None
+        while True:
+            frame, _, after = self._fetch_page(user_id, filters, after, page_size)
+            if not frame.empty:
+                yield frame
+            if after is None:
+                return
+
+    def _before_write(self, user_id):
+        # Build the budget totals first, so the write is applied on top of them exactly once
+        if self.budgets is not None:
+            self.budgets.prepare(user_id)
+
+    def add(self, transaction: Transaction):
+        record = transaction.to_dict()
+        self._before_write(transaction.user_id)
+        res = self.client.table(self.TABLE).insert(record).execute()
+        self._query_cache.pop(transaction.user_id, None)
+        cached = self._cache.get(transaction.user_id)
+        if cached is not None:
+            self._cache[transaction.user_id] = cached.concat(TransactionFrame.from_records([record]))
+            self._mark_applied(transaction.user_id, res.data or [record])
+        if self.budgets is not None:
+            self.budgets.apply(transaction.user_id, [record])
+
+    def add_many(self, user_id, records, batch_size=500, max_workers=4) -> dict:
+        """Insert ``records`` in batches, with at most ``max_workers`` requests in flight.
+
+        Returns ``{batch_index: exception}`` for the batches that failed; rows of
+        the successful batches are merged into the cached frame.
+        """
+        self._before_write(user_id)
+        batches = [records[i:i + batch_size] for i in range(0, len(records), batch_size)]
+        insert = lambda batch: self.client.table(self.TABLE).insert(batch).execute()
+        errors, inserted, returned = {}, [], []
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            futures = [executor.submit(insert, batch) for batch in batches]
+            for index, (batch, future) in enumerate(zip(batches, futures)):
+                try:
+                    returned.extend(future.result().data or batch)
+                    inserted.extend(batch)
+                except Exception as e:
+                    errors[index] = e
+
+        if inserted:
+            # Session state is only touched here, on the script thread
+            self._query_cache.pop(user_id, None)
+            cached = self._cache.get(user_id)
+            if cached is not None:
+                self._cache[user_id] = cached.concat(TransactionFrame.from_records(inserted, user_id))
+                self._mark_applied(user_id, returned)
+            if self.budgets is not None:
+                self.budgets.apply(user_id, inserted)
+        return errors
+
+    def delete(self, user_id, transaction_id):
+        self._before_write(user_id)
+        res = self.client.table(self.TABLE).delete().eq("id", transaction_id).eq("user_id", user_id).execute()
+        self._query_cache.pop(user_id, None)
+        if user_id in self._cache:
+            self._drop_ids(user_id, [transaction_id])
+            self._mark_applied(user_id, [{"id": transaction_id}], deleted=True)
+        if self.budgets is not None:
+            # The deleted rows come back in the response
+            self.budgets.apply(user_id, res.data, sign=-1)
+
+    def _drop_ids(self, user_id, ids) -> TransactionFrame:
+        # Drops rows from the cached frame and, in step, from its search index
+        cached = self._cache[user_id]
+        dropped = cached.has_ids(ids)
+        frame = self._cache[user_id] = cached.drop_rows(dropped)
+        indexed = self._search_cache.get(user_id)
+        if indexed is not None and dropped.any():
+            index = indexed[1]
+            if index.extend(cached):
+                index.drop_rows(dropped, frame)
+                self._search_cache[user_id] = (frame, index)
+            else:
+                del self._search_cache[user_id]
+        return frame
+
+    def invalidate(self, user_id=None):
+        if user_id is None:
+            self._cache.clear()
+            self._query_cache.clear()
+            self._sync_state.clear()
+            self._cube_cache.clear()
+            self._insights_cache.clear()
+            self._search_cache.clear()
+        else:
+            self._cache.pop(user_id, None)
+            self._query_cache.pop(user_id, None)
+            self._sync_state.pop(user_id, None)
+            self._cube_cache.pop(user_id, None)
+            self._insights_cache.pop(user_id, None)
+            self._search_cache.pop(user_id, None)
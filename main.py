@@ -1,18 +1,138 @@
+import importlib
+import json
+import sys
 import streamlit as st
-from database import supabase
-from ui import AuthPage, DashboardPage, TransactionPage, AnalysisPage, ProfilePage
+import security
+import tracing
+from database import get_setting
 from logic import User
 
+# Page classes by page name, imported the first time the page is shown
+PAGES = {
+    "Auth": ("ui", "AuthPage"),
+    "Dashboard": ("ui", "DashboardPage"),
+    "Transactions": ("ui", "TransactionPage"),
+    "Analysis": ("ui", "AnalysisPage"),
+    "Budgets": ("ui", "BudgetPage"),
+    "Profile": ("ui", "ProfilePage"),
+}
+
+# Spans of every rerun are appended here (JSON lines, rotated) when TRACE_FILE is set
+tracing.configure_export(get_setting("TRACE_FILE"))
+
+
+def load_page(name):
+    module, cls = PAGES[name]
+    return getattr(importlib.import_module(module), cls)()
+
+
+def load_profile(user_id):
+    from database import supabase
+    rows = supabase.table("users").select("*").eq("id", user_id).execute().data
+    return rows[0] if rows else None
+
+
+def restore_session():
+    # A signed token in the session cookie brings a returning user back without
+    # signing in again; the profile comes from the process-wide cache. The token
+    # is swapped for a new one on every restore
+    st.query_params.pop("session", None)  # links from before the cookie
+    if st.session_state.get("signed_out"):
+        # The cookie sent with this connection predates the logout
+        return None
+    user_id, token = security.rotate_token(st.context.cookies.get(security.SESSION_COOKIE))
+    if user_id is None:
+        return None
+    row = security.cached_profile(user_id, load_profile)
+    if row is None:
+        return None
+    st.session_state.session_token = token
+    st.session_state.user = row
+    if st.session_state.page == "Auth":
+        st.session_state.page = "Dashboard"
+    return User.from_row(row)
+
+
+def end_session():
+    security.revoke_token(st.session_state.get("session_token"))
+    # Stop the user's background work and delete its results (e.g. export files)
+    user = User.from_session()
+    if user and "ui" in sys.modules:
+        sys.modules["ui"].job_runner.cancel(user.id)
+    st.session_state.clear()
+    st.session_state.session_token = ""
+    st.session_state.signed_out = True
+
+
+def write_session_cookie():
+    # Streamlit cannot send Set-Cookie headers, so a script in the page stores
+    # the token, and page scripts can read it (no HttpOnly). Only runs when the
+    # token changed (login, rotation, sign-out); an empty token deletes the cookie
+    token = st.session_state.get("session_token")
+    if token is None or st.session_state.get("session_cookie") == token:
+        return
+    st.session_state.session_cookie = token
+    import streamlit.components.v1 as components
+    max_age = int(security.session_ttl()) if token else 0
+    components.html(
+        f"""
+        <script>
+        const secure = window.parent.location.protocol === "https:" ? "; Secure" : "";
+        window.parent.document.cookie = {json.dumps(f"{security.SESSION_COOKIE}={token}")}
+            + "; Path=/; Max-Age={max_age}; SameSite=Strict" + secure;
+        </script>
+        """,
+        height=0,
+    )
+
+
+def render_trace_panel():
+    # Opt-in breakdown of where this rerun's time went
+    if not st.toggle("Show performance trace", key="debug_trace"):
+        return
+    st.caption("Last full rerun. Sections that rerun on their own are traced separately, to TRACE_FILE.")
+    import pandas as pd
+    rows = [
+        {
+            "Span": "\u2003" * span.depth + span.name,
+            "ms": round(span.duration_ms, 1),
+            "Rows": span.attributes.get("rows"),
+            "Bytes": span.attributes.get("bytes"),
+        }
+        for span in tracing.spans()
+    ]
+    trace = pd.DataFrame(rows, columns=["Span", "ms", "Rows", "Bytes"]).astype({"Rows": "Int64", "Bytes": "Int64"})
+    st.dataframe(trace, hide_index=True, use_container_width=True)
+
+    # Shared Supabase connection pool (only exists once a Supabase request was made)
+    if "http_pool" in sys.modules:
+        stats = sys.modules["http_pool"].pool_stats()
+        if stats:
+            st.caption(
+                f"HTTP pool: {stats['requests']} requests over {stats['connections_opened']} connections "
+                f"({stats['open']} open, {stats['idle']} idle, {stats['http2']} HTTP/2), "
+                f"{stats['avg_request_ms']:.0f} ms avg, {stats['errors']} errors"
+            )
+
+    # Background jobs (forecast fits, exports, full-history loads) of all sessions
+    if "ui" in sys.modules:
+        jobs = sys.modules["ui"].job_runner.stats()
+        st.caption("Jobs: " + ", ".join(f"{count} {status}" for status, count in jobs.items()))
+
+
 def main():
     st.set_page_config(page_title="SavvySmart", layout="wide")
 
     if "page" not in st.session_state:
         st.session_state.page = "Auth"
 
-    user = User.from_session()
+    tracing.begin_rerun(st.session_state.page, detailed=st.session_state.get("debug_trace", False))
+
+    user = User.from_session() or restore_session()
 
     # Sidebar navigation
     with st.sidebar:
+        write_session_cookie()
         # Display avatar and app title
         avatar_url = user.avatar_url if user else "https://icons.iconarchive.com/icons/iconarchive/wild-camping/512/Bird-Owl-icon.png"
         st.markdown(
@@ -84,7 +204,7 @@ def main():
                 """,
                 unsafe_allow_html=True,
             )
-            for page in ["Dashboard", "Transactions", "Analysis", "Profile"]:
+            for page in ["Dashboard", "Transactions", "Analysis", "Budgets", "Profile"]:
                 if st.session_state.page == page:
                     st.markdown(
                         f'<a href="#" class="nav-link" style="background-color: #57C785; color: white;" onclick="window.location.reload();">{page.capitalize()}</a>',
@@ -105,7 +225,7 @@ def main():
                 if st.session_state.logout_confirm:
                     st.warning("Are you sure you want to log out?")
                     if st.button("Yes, Log out"):
-                        st.session_state.clear()
+                        end_session()
                         st.rerun()
                     if st.button("Cancel"):
                         st.session_state.logout_confirm = False
@@ -120,7 +240,7 @@ def main():
                 if st.session_state.change_account_confirm:
                     st.warning("Are you sure you want to change the account?")
                     if st.button("Yes, Change Account"):
-                        st.session_state.clear()
+                        end_session()
                         st.session_state.page = "Auth"
                         st.rerun()
                     if st.button("Cancel"):
@@ -154,16 +274,14 @@ def main():
 
     # Render the selected page
     if st.session_state.page == "Auth":
-        AuthPage().render()
-    elif user:
-        if st.session_state.page == "Dashboard":
-            DashboardPage().render(user)
-        elif st.session_state.page == "Transactions":
-            TransactionPage().render(user)
-        elif st.session_state.page == "Analysis":
-            AnalysisPage().render(user)
-        elif st.session_state.page == "Profile":
-            ProfilePage().render(user)
+        load_page("Auth").render()
+    elif user and st.session_state.page in PAGES:
+        load_page(st.session_state.page).render(user)
+
+    tracing.end_rerun()
+    with st.sidebar:
+        st.markdown("---")
+        render_trace_panel()
 
 if __name__ == "__main__":
     main()
@@ -0,0 +1,149 @@
+-- SavvySmart schema additions for the Supabase Postgres database.
+-- Run once in the Supabase SQL editor after creating the `users` and
+-- `transactions` tables described in README.md.
+
+-- === Incremental sync ===
+-- Every insert/update stamps the row, every delete leaves a tombstone, and
+-- `transaction_changes` exposes both so a client can ask for everything that
+-- changed since its last high-water mark in a single query.
+
+alter table transactions
+    add column if not exists updated_at timestamptz not null default clock_timestamp();
+
+create index if not exists transactions_user_updated_at_idx
+    on transactions (user_id, updated_at);
+
+create or replace function touch_updated_at() returns trigger
+language plpgsql as $$
+begin
+    new.updated_at := clock_timestamp();
+    return new;
+end;
+$$;
+
+drop trigger if exists transactions_touch_updated_at on transactions;
+create trigger transactions_touch_updated_at
+    before insert or update on transactions
+    for each row execute function touch_updated_at();
+
+create table if not exists transaction_tombstones (
+    id uuid primary key,
+    user_id uuid not null,
+    deleted_at timestamptz not null default clock_timestamp()
+);
+
+create index if not exists transaction_tombstones_user_deleted_at_idx
+    on transaction_tombstones (user_id, deleted_at);
+
+create or replace function record_transaction_tombstone() returns trigger
+language plpgsql as $$
+begin
+    insert into transaction_tombstones (id, user_id)
+    values (old.id, old.user_id)
+    on conflict (id) do update set deleted_at = excluded.deleted_at;
+    return old;
+end;
+$$;
+
+drop trigger if exists transactions_record_tombstone on transactions;
+create trigger transactions_record_tombstone
+    after delete on transactions
+    for each row execute function record_transaction_tombstone();
+
+create or replace view transaction_changes with (security_invoker = true) as
+select id, user_id, amount, category, detail, transaction_type, date,
+       updated_at as changed_at, false as deleted
+from transactions
+union all
+select id, user_id, null, null, null, null, null,
+       deleted_at as changed_at, true as deleted
+from transaction_tombstones;
+
+-- === Aggregates ===
+-- The Dashboard and Analysis pages read these instead of raw rows. Filtering
+-- on user_id is pushed below the GROUP BY, so each request only aggregates
+-- that user's rows.
+
+-- (user_id, date desc, id desc) also matches the keyset order of the
+-- Transactions page, so a page is a single index range scan.
+drop index if exists transactions_user_id_idx;
+create index if not exists transactions_user_date_idx
+    on transactions (user_id, date desc, id desc);
+
+create or replace view transaction_daily_totals with (security_invoker = true) as
+select user_id, date, category, transaction_type,
+       sum(amount) as amount, count(*) as count
+from transactions
+group by user_id, date, category, transaction_type;
+
+create or replace view transaction_category_totals with (security_invoker = true) as
+select user_id, category, transaction_type,
+       sum(amount) as amount, count(*) as count
+from transactions
+group by user_id, category, transaction_type;
+
+-- === Budgets and savings goals ===
+-- Monthly spending limits (per category, or on all spending when category is
+-- null) and monthly savings goals. The app keeps running monthly totals and
+-- patches them on every write; `transaction_monthly_totals` is the full
+-- recompute it starts from and reconciles against.
+
+create table if not exists budgets (
+    id uuid primary key,
+    user_id uuid not null,
+    kind text not null check (kind in ('limit', 'savings')),
+    category text,
+    amount numeric not null check (amount > 0),
+    created_at timestamptz not null default now()
+);
+
+create index if not exists budgets_user_id_idx on budgets (user_id);
+
+create or replace view transaction_monthly_totals with (security_invoker = true) as
+select user_id, to_char(date, 'YYYY-MM') as month, category, transaction_type,
+       sum(amount) as amount, count(*) as count
+from transactions
+group by user_id, to_char(date, 'YYYY-MM'), category, transaction_type;
+
+-- === Search ===
+-- Ranked search over details, with category and amount filters. A trigram
+-- index serves the substring match, so a query only visits the rows holding
+-- its longest word; matches rank by trigram similarity to the query, then
+-- newest first. `total` is the number of matches, repeated on every row.
+
+create extension if not exists pg_trgm;
+
+create index if not exists transactions_detail_trgm_idx
+    on transactions using gin (lower(coalesce(detail, '')) gin_trgm_ops);
+
+create or replace function search_transactions(
+    p_user_id uuid,
+    p_query text default '',
+    p_category text default null,
+    p_min_amount numeric default null,
+    p_max_amount numeric default null,
+    p_limit integer default 50,
+    p_offset integer default 0
+) returns table (
+    id uuid, user_id uuid, amount numeric, category text, detail text,
+    transaction_type text, date date, rank real, total bigint
+)
+language sql stable security invoker as $$
+    with query as (
+        select coalesce(array_agg(word order by length(word) desc), '{}') as words
+        from regexp_split_to_table(lower(coalesce(p_query, '')), '[^[:alnum:]]+') as word
+        where word <> ''
+    )
+    select t.id, t.user_id, t.amount::numeric, t.category, t.detail, t.transaction_type, t.date,
+           similarity(lower(coalesce(t.detail, '')), lower(coalesce(p_query, ''))) as rank,
+           count(*) over () as total
+    from transactions t, query q
+    where t.user_id = p_user_id
+      and (p_category is null or t.category = p_category)
+      and (p_min_amount is null or t.amount >= p_min_amount)
+      and (p_max_amount is null or t.amount <= p_max_amount)
+      and lower(coalesce(t.detail, '')) like '%' || coalesce(q.words[1], '') || '%'
+      and lower(coalesce(t.detail, '')) like all (select '%' || word || '%' from unnest(q.words) as word)
+    order by rank desc, t.date desc, t.id desc
+    limit p_limit offset p_offset;
+$$;
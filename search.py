@@ -0,0 +1,226 @@
+import hashlib
+
+import numpy as np
+import pyarrow as pa
+import pyarrow.compute as pc
+
+PAGE_SIZE = 50
+# Separates the words of a padded detail; no trigram spans it
+WORD_BREAK = "\x01"
+# Three spaces, the only trigram of an empty detail
+BLANK = 0x202020
+# Ranking keys pack score and date into one int64
+SCORE_STEPS = (1 << 32) - 1
+MAX_DAY = (1 << 20) - 1
+
+
+def _words(texts) -> pa.Array:
+    # Lower-case alphanumeric words, one space apart
+    words = pc.replace_substring_regex(pc.utf8_lower(pc.fill_null(texts, "")), r"[^\p{L}\p{N}]+", " ")
+    return pc.utf8_trim_whitespace(words)
+
+
+def _padded(words) -> pa.Array:
+    # Every word as "  word ", like pg_trgm pads them
+    inner = pc.replace_substring(words, " ", " " + WORD_BREAK + "  ")
+    return pc.binary_join_element_wise(WORD_BREAK + "  ", inner, " ", "")
+
+
+def _trigrams(texts):
+    """(string index, trigram) of each 3-byte window of ``texts`` that does not span a word break."""
+    if isinstance(texts, pa.ChunkedArray):
+        texts = texts.combine_chunks()
+    offsets = np.frombuffer(texts.buffers()[1], np.int32)[texts.offset:texts.offset + len(texts) + 1]
+    if len(texts) == 0 or offsets[-1] - offsets[0] < 3:
+        return np.empty(0, np.int64), np.empty(0, np.int64)
+    data = np.frombuffer(texts.buffers()[2], np.uint8)[offsets[0]:offsets[-1]].astype(np.int32)
+    owner = np.repeat(np.arange(len(texts)), np.diff(offsets))
+    keys = data[:-2] << 16 | data[1:-1] << 8 | data[2:]
+    breaks = data == ord(WORD_BREAK)
+    valid = (owner[:-2] == owner[2:]) & ~(breaks[:-2] | breaks[1:-1] | breaks[2:]) & (keys != BLANK)
+    return owner[:-2][valid], keys[valid].astype(np.int64)
+
+
+class SearchIndex:
+    """Ranked search over one user's transactions by detail, category and amount.
+
+    Details are indexed by distinct lower-cased text: an inverted index maps
+    each trigram (3-byte window of a word padded like pg_trgm's) to the sorted
+    codes of the details holding it. A query keeps the details that hold every
+    trigram of its words and contain each word, and ranks them by trigram
+    similarity to the whole query, as ``search_transactions`` in schema.sql
+    does with pg_trgm, then by date and id, newest and largest first, so
+    pages line up with the function's. Category and amount filters are
+    vectorized masks over per-row arrays aligned with the frame.
+
+    New rows only index details not seen before, so ``extend`` costs the
+    appended rows, and ``drop_rows`` compacts the row arrays in place.
+    """
+
+    def __init__(self):
+        self.rows = 0
+        self._ids_digest = hashlib.blake2b(digest_size=16)
+        self._details = {}
+        self._texts = []
+        self._text = None
+        self._trigram_counts = np.empty(0, np.int64)
+        self._postings = {}
+        self._categories = {}
+        self.row_detail = np.empty(0, np.int64)
+        self.row_category = np.empty(0, np.int64)
+        self.row_day = np.empty(0, np.int64)
+        self.row_cents = np.empty(0, np.int64)
+        # The 16-byte ids as two big-endian halves, which compare like the ids do
+        self.row_id_high = np.empty(0, np.uint64)
+        self.row_id_low = np.empty(0, np.uint64)
+
+    @classmethod
+    def build(cls, frame):
+        index = cls()
+        index.extend(frame)
+        return index
+
+    def covers(self, frame):
+        """Whether ``frame`` starts with the rows this index has seen."""
+        if len(frame) < self.rows:
+            return False
+        digest = hashlib.blake2b(frame.id_bytes(0, self.rows), digest_size=16)
+        return digest.digest() == self._ids_digest.digest()
+
+    def extend(self, frame):
+        """Index the rows of ``frame`` after the ones already seen; False if it does not extend them."""
+        if not self.covers(frame):
+            return False
+        if len(frame) == self.rows:
+            return True
+        start, stop = self.rows, len(frame)
+        data = frame.data.iloc[start:stop]
+
+        encoded = pc.dictionary_encode(pc.utf8_lower(pc.fill_null(pa.array(data["detail"]), "")))
+        if isinstance(encoded, pa.ChunkedArray):
+            encoded = encoded.combine_chunks()
+        known = len(self._details)
+        lookup = np.fromiter(
+            (self._details.setdefault(text, len(self._details)) for text in encoded.dictionary.to_pylist()),
+            np.int64, len(encoded.dictionary),
+        )
+        # New texts get consecutive codes, in dictionary order
+        self._add_details(encoded.dictionary.filter(pa.array(lookup >= known)), known)
+        detail_codes = lookup[encoded.indices.to_numpy(zero_copy_only=False)] if len(lookup) else np.empty(0, np.int64)
+
+        categories = data["category"].cat
+        category_lookup = np.fromiter(
+            (self._categories.setdefault(category, len(self._categories)) for category in categories.categories),
+            np.int64, len(categories.categories),
+        )
+        # Missing categories have code -1, which picks the appended -1
+        category_codes = np.append(category_lookup, -1)[categories.codes.to_numpy()]
+
+        self.row_detail = np.concatenate([self.row_detail, detail_codes])
+        self.row_category = np.concatenate([self.row_category, category_codes])
+        self.row_day = np.concatenate([self.row_day, pa.array(data["date"]).cast(pa.int32()).to_numpy(zero_copy_only=False)])
+        self.row_cents = np.concatenate([self.row_cents, data["amount_cents"].to_numpy(dtype=np.int64)])
+        ids = np.frombuffer(frame.id_bytes(start, stop), ">u8").reshape(-1, 2).astype(np.uint64)
+        self.row_id_high = np.concatenate([self.row_id_high, ids[:, 0]])
+        self.row_id_low = np.concatenate([self.row_id_low, ids[:, 1]])
+        self._ids_digest.update(frame.id_bytes(start, stop))
+        self.rows = stop
+        return True
+
+    def _add_details(self, texts, first):
+        if len(texts) == 0:
+            return
+        owner, trigrams = _trigrams(_padded(_words(texts)))
+        pairs = np.unique(trigrams << 32 | (owner + first))
+        trigrams, codes = pairs >> 32, pairs & 0xFFFFFFFF
+        self._trigram_counts = np.concatenate([
+            self._trigram_counts, np.bincount(codes - first, minlength=len(texts)),
+        ])
+        bounds = np.flatnonzero(np.diff(trigrams)) + 1
+        for trigram, postings in zip(trigrams[np.r_[0, bounds]].tolist(), np.split(codes, bounds)):
+            # New codes are larger than any before, so postings stay sorted
+            existing = self._postings.get(trigram)
+            self._postings[trigram] = postings if existing is None else np.concatenate([existing, postings])
+        self._texts.append(texts)
+        self._text = None
+
+    def drop_rows(self, mask, frame):
+        """Drop the rows of ``mask``, as ``TransactionFrame.drop_rows`` did to give ``frame``."""
+        keep = ~mask
+        self.row_detail = self.row_detail[keep]
+        self.row_category = self.row_category[keep]
+        self.row_day = self.row_day[keep]
+        self.row_cents = self.row_cents[keep]
+        self.row_id_high = self.row_id_high[keep]
+        self.row_id_low = self.row_id_low[keep]
+        self.rows = len(frame)
+        self._ids_digest = hashlib.blake2b(frame.id_bytes(), digest_size=16)
+
+    def _scores(self, query):
+        """Similarity of each detail to ``query``, or -1 where the detail does not match it."""
+        words = _words(pa.array([query]))
+        scores = np.full(len(self._trigram_counts), -1.0)
+        # Candidates hold every trigram inside the query's words
+        required = np.unique(_trigrams(pc.replace_substring(words, " ", WORD_BREAK))[1])
+        matches = np.zeros(len(scores), np.int64)
+        for trigram in required.tolist():
+            postings = self._postings.get(trigram)
+            if postings is None:
+                return scores
+            matches[postings] += 1
+        candidates = np.flatnonzero(matches == len(required))
+
+        if self._text is None:
+            self._text = pa.concat_arrays(self._texts) if self._texts else pa.array([], pa.string())
+        texts = self._text.take(pa.array(candidates))
+        found = np.ones(len(candidates), bool)
+        for word in words[0].as_py().split():
+            found &= pc.match_substring(texts, word).to_numpy(zero_copy_only=False)
+        candidates = candidates[found]
+
+        # |shared| / |union| of the padded trigram sets, as pg_trgm's similarity()
+        padded = np.unique(_trigrams(_padded(words))[1])
+        shared = np.zeros(len(scores), np.int64)
+        for trigram in padded.tolist():
+            postings = self._postings.get(trigram)
+            if postings is not None:
+                shared[postings] += 1
+        union = len(padded) + self._trigram_counts[candidates] - shared[candidates]
+        scores[candidates] = shared[candidates] / np.maximum(union, 1)
+        return scores
+
+    def search(self, query="", category=None, min_cents=None, max_cents=None, offset=0, limit=PAGE_SIZE):
+        """Frame positions of one page of matching rows, best match first, then newest; and the number of matches.
+
+        Rows match when their detail contains every word of ``query``
+        (case-insensitive) and they pass the category and amount filters.
+        """
+        keep = np.ones(self.rows, bool)
+        if category is not None:
+            keep &= self.row_category == self._categories.get(category, -2)
+        if min_cents is not None:
+            keep &= self.row_cents >= min_cents
+        if max_cents is not None:
+            keep &= self.row_cents <= max_cents
+        scores = np.zeros(self.rows)
+        if query.strip():
+            scores = self._scores(query)[self.row_detail]
+            keep &= scores >= 0
+
+        positions = np.flatnonzero(keep)
+        total, end = len(positions), min(offset + limit, len(positions))
+        if end <= offset:
+            return positions[:0], total
+        # Ascending key = descending score, then date
+        steps = np.rint(scores[positions] * SCORE_STEPS).astype(np.int64)
+        days = np.clip(self.row_day[positions], 0, MAX_DAY)
+        keys = (SCORE_STEPS - steps) << 20 | (MAX_DAY - days)
+        if end < total:
+            # The first ``end`` keys, and every row tied with the last of them
+            top = np.flatnonzero(keys <= np.partition(keys, end - 1)[end - 1])
+        else:
+            top = np.arange(total)
+        # Ties go to the larger id, as "id desc" in search_transactions
+        chosen = positions[top]
+        top = top[np.lexsort((~self.row_id_low[chosen], ~self.row_id_high[chosen], keys[top]))]
+        return positions[top[offset:end]], total
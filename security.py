@@ -0,0 +1,143 @@
+import base64
+import hashlib
+import hmac
+import json
+import os
+import secrets
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import bcrypt
+
+from database import get_setting
+
+# bcrypt is CPU-bound and releases the GIL: hashing runs on a small, bounded
+# pool so a burst of sign-ups or logins cannot take every core from the
+# Streamlit server. Extra requests queue instead.
+_executor = None
+_executor_lock = threading.Lock()
+
+# Verified sessions: {user_id: (expires_at, users row)}, shared by all Streamlit sessions
+_profiles = {}
+# Signed-out and rotated tokens: {token: (invalid_from, forget_at)}
+_revoked = {}
+_profiles_lock = threading.Lock()
+_generated_secret = secrets.token_bytes(32)
+
+# Browser cookie holding the session token; never put it in the URL
+SESSION_COOKIE = "savvysmart_session"
+# A rotated token stays valid this long, for tabs that loaded with it at the same time
+ROTATION_GRACE_SECONDS = 10
+
+
+def _pool():
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            workers = int(get_setting("PASSWORD_HASH_WORKERS", min(4, os.cpu_count() or 1)))
+            _executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="bcrypt")
+        return _executor
+
+
+def hash_password(password: str) -> str:
+    """bcrypt hash of ``password``, with the BCRYPT_ROUNDS cost factor (default 12)."""
+    rounds = int(get_setting("BCRYPT_ROUNDS", 12))
+    salt = bcrypt.gensalt(rounds)
+    return _pool().submit(bcrypt.hashpw, password.encode("utf-8"), salt).result().decode("utf-8")
+
+
+def check_password(password: str, hashed: str) -> bool:
+    return _pool().submit(bcrypt.checkpw, password.encode("utf-8"), hashed.encode("utf-8")).result()
+
+
+def _secret():
+    # Without SESSION_SECRET, tokens are only valid until the server restarts
+    secret = get_setting("SESSION_SECRET")
+    return secret.encode("utf-8") if secret else _generated_secret
+
+
+def _b64(data: bytes) -> str:
+    return base64.urlsafe_b64encode(data).rstrip(b"=").decode("ascii")
+
+
+def _unb64(text: str) -> bytes:
+    return base64.urlsafe_b64decode(text + "=" * (-len(text) % 4))
+
+
+def session_ttl():
+    return float(get_setting("SESSION_TTL", 3600))
+
+
+def issue_token(user_id, ttl=None) -> str:
+    """Signed, expiring token naming ``user_id``; proves an earlier password check."""
+    payload = _b64(json.dumps({
+        "sub": user_id,
+        "exp": int(time.time() + (ttl or session_ttl())),
+        "jti": secrets.token_urlsafe(8),  # tokens issued in the same second still differ
+    }).encode("utf-8"))
+    signature = _b64(hmac.new(_secret(), payload.encode("ascii"), hashlib.sha256).digest())
+    return f"{payload}.{signature}"
+
+
+def verify_token(token):
+    """The user id of a valid, unexpired and unrevoked token, else None."""
+    try:
+        payload, signature = token.split(".")
+        expected = _b64(hmac.new(_secret(), payload.encode("ascii"), hashlib.sha256).digest())
+        if not hmac.compare_digest(signature, expected):
+            return None
+        claims = json.loads(_unb64(payload))
+    except (ValueError, AttributeError):
+        return None
+    now = time.time()
+    if claims["exp"] < now or _revoked.get(token, (float("inf"),))[0] <= now:
+        return None
+    return claims["sub"]
+
+
+def revoke_token(token, grace=0):
+    # Kept until the token would have expired anyway
+    if not token:
+        return
+    with _profiles_lock:
+        now = time.time()
+        for expired in [t for t, (_, forget_at) in _revoked.items() if forget_at < now]:
+            del _revoked[expired]
+        _revoked[token] = (now + grace, now + session_ttl())
+
+
+def rotate_token(token):
+    """``(user_id, new token)`` for a valid ``token``, which is revoked; ``(None, None)`` otherwise.
+
+    Every restored session gets a fresh token, so a leaked one only works until its owner's next visit.
+    """
+    user_id = verify_token(token)
+    if user_id is None:
+        return None, None
+    revoke_token(token, grace=ROTATION_GRACE_SECONDS)
+    return user_id, issue_token(user_id)
+
+
+def remember_profile(row):
+    """Cache the ``users`` row of a signed-in user for token logins."""
+    with _profiles_lock:
+        _profiles[row["id"]] = (time.monotonic() + session_ttl(), dict(row))
+
+
+def update_profile(user_id, **changes):
+    with _profiles_lock:
+        if user_id in _profiles:
+            _profiles[user_id][1].update(changes)
+
+
+def cached_profile(user_id, load):
+    """The cached ``users`` row of ``user_id``; ``load(user_id)`` fills a miss (e.g. after a restart)."""
+    with _profiles_lock:
+        entry = _profiles.get(user_id)
+        if entry is not None and entry[0] > time.monotonic():
+            return dict(entry[1])
+    row = load(user_id)
+    if row is not None:
+        remember_profile(row)
+    return row
@@ -0,0 +1,165 @@
+from __future__ import annotations
+
+import hashlib
+import json
+import os
+import threading
+import time
+import uuid
+
+from lazy import lazy_import
+from logic import TransactionFrame
+
+pd = lazy_import("pandas")
+pa = lazy_import("pyarrow")
+
+FORMAT_VERSION = 1
+METADATA_KEY = b"savvysmart"
+
+
+class SnapshotCache:
+    """On-disk copies of users' transaction frames, for warm starts.
+
+    Each snapshot is one uncompressed Arrow IPC file. It is memory-mapped on
+    load, so the id, date and detail columns are read without a copy. It
+    carries the sync watermark it was taken at, and the repository only asks
+    the server for changes after it (see ``TransactionRepository.sync``). The
+    directory is kept under ``max_bytes`` by evicting the least recently used
+    snapshots; loads bump a file's mtime.
+
+    ``namespace`` (e.g. the database URL) keeps snapshots of different
+    databases apart. ``save_later`` writes on a background thread, at most
+    once every ``min_interval`` seconds per user.
+    """
+
+    def __init__(self, directory, max_bytes=512 * 2**20, namespace="", min_interval=30.0):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.namespace = namespace
+        self.min_interval = min_interval
+        self._lock = threading.Lock()
+        # Queued saves, {user_id: (frame, watermark)}, and when each user's last one was written
+        self._queue = threading.Condition()
+        self._pending = {}
+        self._saved_at = {}
+        self._writer = None
+        self._flushing = False
+
+    def path(self, user_id):
+        key = hashlib.sha256(f"{self.namespace}\0{user_id}".encode("utf-8")).hexdigest()[:32]
+        return os.path.join(self.directory, f"{key}.arrow")
+
+    def exists(self, user_id):
+        return os.path.exists(self.path(user_id))
+
+    def load(self, user_id):
+        """``(frame, watermark)`` from the user's snapshot, or None if there is no usable one."""
+        path = self.path(user_id)
+        try:
+            table = pa.ipc.open_file(pa.memory_map(path)).read_all()
+            meta = json.loads(table.schema.metadata[METADATA_KEY])
+        except (OSError, pa.ArrowInvalid, KeyError, TypeError, ValueError):
+            return None
+        if meta.get("version") != FORMAT_VERSION or meta.get("user_id") != user_id:
+            return None
+        os.utime(path)  # most recently used
+        # Dictionaries become the frame's categoricals and amounts a NumPy array;
+        # the other columns stay Arrow-backed on the mapped buffers
+        data = table.to_pandas(
+            types_mapper=lambda t: None if pa.types.is_dictionary(t) or pa.types.is_integer(t) else pd.ArrowDtype(t)
+        )
+        return TransactionFrame(data, user_id), meta.get("watermark")
+
+    def save(self, user_id, frame: TransactionFrame, watermark):
+        table = pa.Table.from_pandas(frame.data, preserve_index=False)
+        meta = {"version": FORMAT_VERSION, "user_id": user_id, "watermark": watermark}
+        table = table.replace_schema_metadata({METADATA_KEY: json.dumps(meta)})
+        os.makedirs(self.directory, exist_ok=True)
+        path = self.path(user_id)
+        # Written aside and renamed, so readers (other sessions) never see a partial file
+        temporary = f"{path}.{uuid.uuid4().hex}.tmp"
+        try:
+            with pa.OSFile(temporary, "wb") as sink, pa.ipc.new_file(sink, table.schema) as writer:
+                writer.write_table(table)
+            os.replace(temporary, path)
+        finally:
+            if os.path.exists(temporary):
+                os.remove(temporary)
+        self.evict()
+
+    def save_later(self, user_id, frame: TransactionFrame, watermark):
+        """Queue a ``save``; a newer frame for the same user replaces a queued one.
+
+        Frames are never mutated in place, so the writer thread can read
+        ``frame`` while the session moves on to newer ones.
+        """
+        with self._queue:
+            self._pending[user_id] = (frame, watermark)
+            if self._writer is None:
+                self._writer = threading.Thread(target=self._write_pending, name="snapshot-writer", daemon=True)
+                self._writer.start()
+            self._queue.notify_all()
+
+    def flush(self):
+        """Write the queued snapshots now, and wait until they are on disk."""
+        with self._queue:
+            self._flushing = True
+            self._queue.notify_all()
+            self._queue.wait_for(lambda: self._writer is None)
+            self._flushing = False
+
+    def _next_pending(self):
+        # The queued user saved longest ago, once min_interval has passed for them; None when the queue is empty
+        while self._pending:
+            user_id = min(self._pending, key=lambda user_id: self._saved_at.get(user_id, float("-inf")))
+            wait = self._saved_at.get(user_id, float("-inf")) + self.min_interval - time.monotonic()
+            if wait <= 0 or self._flushing:
+                return user_id
+            self._queue.wait(wait)
+        return None
+
+    def _write_pending(self):
+        while True:
+            with self._queue:
+                user_id = self._next_pending()
+                if user_id is None:
+                    self._writer = None
+                    self._queue.notify_all()
+                    return
+                frame, watermark = self._pending.pop(user_id)
+                self._saved_at[user_id] = time.monotonic()
+            try:
+                self.save(user_id, frame, watermark)
+            except OSError:
+                pass  # a cache; the next save tries again
+
+    def discard(self, user_id):
+        with self._queue:
+            self._pending.pop(user_id, None)
+        try:
+            os.remove(self.path(user_id))
+        except FileNotFoundError:
+            pass
+
+    def evict(self):
+        """Delete least recently used snapshots until the directory fits in ``max_bytes``."""
+        with self._lock:
+            entries = []
+            if not os.path.isdir(self.directory):
+                return
+            for entry in os.scandir(self.directory):
+                if entry.name.endswith(".arrow"):
+                    try:
+                        stat = entry.stat()
+                    except FileNotFoundError:
+                        continue
+                    entries.append((stat.st_mtime, stat.st_size, entry.path))
+            total = sum(size for _, size, _ in entries)
+            for _, size, path in sorted(entries):
+                if total <= self.max_bytes:
+                    break
+                try:
+                    os.remove(path)
+                except FileNotFoundError:
+                    pass
+                total -= size
@@ -0,0 +1,66 @@
+import uuid
+
+import numpy as np
+import pandas as pd
+import pytest
+import streamlit as st
+from streamlit.logger import set_log_level
+
+from local_database import LocalClient
+from logic import TransactionRepository
+
+# Session state is used outside a running app here; keep its warnings out of the output
+set_log_level("error")
+
+USER_ID = "00000000-0000-4000-8000-000000000001"
+OTHER_USER_ID = "00000000-0000-4000-8000-000000000002"
+DETAILS = ["Corner Coffee", "Coffee Shop", "Shell Station", "Netflix", "Spotify Premium", "Grocery Market",
+           "Café Olé", "Rent", ""]
+
+
+def transactions(n, seed=0, user_id=USER_ID):
+    """``n`` transaction records over 2024, several per day, with details from ``DETAILS``."""
+    rng = np.random.default_rng(seed)
+    days = pd.Timestamp("2024-01-01") + pd.to_timedelta(rng.integers(0, 366, n), unit="D")
+    return [
+        {
+            "id": str(uuid.UUID(bytes=bytes(raw))),
+            "user_id": user_id,
+            "amount": float(amount),
+            "category": str(category),
+            "detail": str(detail),
+            "transaction_type": "income" if income else "expense",
+            "date": day.strftime("%Y-%m-%d"),
+        }
+        for raw, amount, category, detail, income, day in zip(
+            rng.integers(0, 256, size=(n, 16), dtype=np.uint8),
+            np.round(rng.lognormal(3, 1, n), 2),
+            rng.choice(["Food", "Transport", "Utilities", "Salary", "Other"], n),
+            rng.choice(DETAILS, n),
+            rng.random(n) < 0.2,
+            days,
+        )
+    ]
+
+
+def insert(client, records):
+    """Write ``records`` straight to the database, as another device would."""
+    return client.table("transactions").insert(records).execute().data
+
+
+@pytest.fixture(autouse=True)
+def session_state():
+    # Outside a running app st.session_state is one process-wide mapping
+    st.session_state.clear()
+    yield st.session_state
+    st.session_state.clear()
+
+
+@pytest.fixture
+def client():
+    return LocalClient(":memory:")
+
+
+@pytest.fixture
+def repository(client):
+    return TransactionRepository(client)
@@ -0,0 +1,130 @@
+import uuid
+from collections import defaultdict
+from datetime import date
+
+import pytest
+
+from budgets import ALL, Budget, BudgetEngine, BudgetLedger, cents
+from logic import Transaction, TransactionRepository
+from tests.conftest import OTHER_USER_ID, USER_ID, insert, transactions
+
+MONTH = "2024-03"
+
+
+def expense(amount, category="Food", day=date(2024, 3, 10), transaction_type="expense"):
+    return Transaction(str(uuid.uuid4()), USER_ID, amount, category, "", transaction_type, day)
+
+
+def monthly_totals(rows):
+    # The ledger's cells, summed straight from transaction records
+    totals = defaultdict(int)
+    for row in rows:
+        for category in (row["category"], ALL):
+            totals[(row["date"][:7], category, row["transaction_type"])] += cents(row["amount"])
+    return {cell: total for cell, total in totals.items() if total}
+
+
+def nonzero(ledger):
+    return {cell: total for cell, total in ledger.totals.items() if total}
+
+
+@pytest.fixture
+def engine(client):
+    return BudgetEngine(client)
+
+
+@pytest.fixture
+def repository(client, engine):
+    return TransactionRepository(client, budgets=engine)
+
+
+def test_ledger_matches_the_monthly_totals_view(client, engine):
+    rows = transactions(200) + transactions(20, seed=1, user_id=OTHER_USER_ID)
+    insert(client, rows)
+    assert nonzero(engine.ledger(USER_ID)) == monthly_totals([row for row in rows if row["user_id"] == USER_ID])
+
+
+def test_apply_and_unapply_cancel_out():
+    ledger = BudgetLedger()
+    rows = [expense(amount).to_dict() for amount in (4.5, 12.25, 0.1)]
+    for row in rows:
+        ledger.apply(row)
+    assert nonzero(ledger) == monthly_totals(rows)
+    for row in rows:
+        ledger.apply(row, sign=-1)
+    assert nonzero(ledger) == {}
+
+
+def test_limit_alerts_once_per_level():
+    budget = Budget.create(USER_ID, "limit", "Food", 100)
+    ledger = BudgetLedger([budget])
+    levels = [[status.level for status in ledger.apply(expense(amount).to_dict())] for amount in (70, 15, 5, 20)]
+    assert levels == [[], ["warning"], [], ["over"]]
+    assert ledger.status(budget, MONTH).value == 110
+    # Other categories and months do not count against it
+    assert ledger.apply(expense(500, category="Rent").to_dict()) == []
+    assert ledger.apply(expense(50, day=date(2024, 4, 1)).to_dict()) == []
+    assert ledger.status(budget, "2024-04").level == "ok"
+
+
+def test_savings_goal_counts_income_minus_spending():
+    goal = Budget.create(USER_ID, "savings", None, 1000)
+    ledger = BudgetLedger([goal])
+    assert ledger.apply(expense(2000, category="Salary", transaction_type="income").to_dict()) != []
+    assert ledger.status(goal, MONTH).level == "reached"
+    assert ledger.apply(expense(1500).to_dict()) == []
+    status = ledger.status(goal, MONTH)
+    assert (status.level, status.value) == ("behind", 500)
+
+
+def test_repository_writes_patch_the_running_totals(client, engine, repository):
+    insert(client, transactions(50))
+    budget = Budget.create(USER_ID, "limit", "Food", 10)
+    engine.add_budget(budget)
+    repository.add(expense(9, day=date.today()))
+    alerts = engine.pop_alerts(USER_ID)
+    assert [status.budget.id for status in alerts] == [budget.id]
+    assert engine.pop_alerts(USER_ID) == []
+
+    added = [expense(amount).to_dict() for amount in (3, 4, 5)]
+    assert repository.add_many(USER_ID, added, batch_size=2) == {}
+    repository.delete(USER_ID, added[0]["id"])
+    assert engine.reconcile(USER_ID) == {}
+
+
+def test_writes_never_rebuild_the_ledger(client, engine, repository, monkeypatch):
+    engine.reconcile_interval = 0
+    repository.add(expense(5))
+    ledger = engine._ledgers[USER_ID]
+    monkeypatch.setattr(engine, "_build", lambda user_id: pytest.fail("rebuilt on a write"))
+    repository.add(expense(7))
+    repository.add_many(USER_ID, [expense(1).to_dict()])
+    assert engine._ledgers[USER_ID] is ledger
+    assert ledger.totals[(MONTH, "Food", "expense")] == 1300
+    # Reads past the interval do rebuild it
+    monkeypatch.undo()
+    assert engine.ledger(USER_ID) is not ledger
+
+
+def test_reconcile_reports_writes_made_elsewhere(client, engine):
+    engine.ledger(USER_ID)
+    row = expense(42).to_dict()
+    insert(client, [row])
+    assert engine.reconcile(USER_ID) == {
+        (MONTH, "Food", "expense"): (0, 4200),
+        (MONTH, ALL, "expense"): (0, 4200),
+    }
+    assert engine.reconcile(USER_ID) == {}
+
+
+def test_budgets_are_stored_and_removed(engine):
+    budget = Budget.create(USER_ID, "limit", None, 250)
+    engine.add_budget(budget)
+    assert budget.category == ALL
+    assert [status.budget.id for status in engine.statuses(USER_ID, MONTH)] == [budget.id]
+    engine.invalidate(USER_ID)
+    assert [status.budget.label for status in engine.statuses(USER_ID, MONTH)] == ["All spending limit"]
+    engine.delete_budget(USER_ID, budget.id)
+    assert engine.statuses(USER_ID, MONTH) == []
+    engine.invalidate()
+    assert engine.statuses(USER_ID, MONTH) == []
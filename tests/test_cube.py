@@ -0,0 +1,52 @@
+import pandas as pd
+import pytest
+
+from logic import AggregateCube
+from tests.conftest import USER_ID, insert, transactions
+
+
+@pytest.fixture
+def rows():
+    return pd.DataFrame(transactions(500))
+
+
+def groupby(df, keys):
+    return df.groupby(keys).agg(amount=("amount", "sum"), count=("amount", "size")).reset_index()
+
+
+def assert_same(result, expected, keys):
+    result = result.sort_values(keys, ignore_index=True)
+    expected = expected.sort_values(keys, ignore_index=True)
+    for key in keys:
+        assert result[key].astype(str).tolist() == expected[key].astype(str).tolist()
+    assert result["amount"].to_numpy() == pytest.approx(expected["amount"].to_numpy())
+    assert result["count"].tolist() == expected["count"].tolist()
+
+
+def test_cube_rollups_match_groupby(rows):
+    rows["date"] = pd.to_datetime(rows["date"])
+    cube = AggregateCube.from_frame(rows)
+    assert cube.total("income") == pytest.approx(rows.loc[rows["transaction_type"] == "income", "amount"].sum())
+    assert cube.total("transfer") == 0.0
+    assert_same(cube.by_category(), groupby(rows, ["category", "transaction_type"]), ["category", "transaction_type"])
+    assert_same(cube.by_date(), groupby(rows, ["date", "transaction_type"]), ["date", "transaction_type"])
+    assert_same(cube.by_date("category"), groupby(rows, ["date", "category"]), ["date", "category"])
+    expenses = rows[rows["transaction_type"] == "expense"]
+    assert_same(cube.cells("expense"), groupby(expenses, ["date", "category"]), ["date", "category"])
+
+
+def test_cube_between_matches_a_date_filter(rows):
+    rows["date"] = pd.to_datetime(rows["date"])
+    cube = AggregateCube.from_frame(rows).between("2024-04-01", "2024-04-30")
+    april = rows[(rows["date"] >= "2024-04-01") & (rows["date"] <= "2024-04-30")]
+    assert_same(cube.by_category(), groupby(april, ["category", "transaction_type"]), ["category", "transaction_type"])
+
+
+def test_repository_cube_from_frame_matches_daily_totals(client, repository, rows):
+    insert(client, rows.to_dict("records"))
+    from_totals = repository.cube(USER_ID)
+    repository.frame(USER_ID)
+    from_frame = repository.cube(USER_ID)
+    assert from_frame is not from_totals
+    assert_same(from_frame.by_date("category"), from_totals.by_date("category"), ["date", "category"])
+    assert_same(from_frame.by_category(), groupby(rows, ["category", "transaction_type"]), ["category", "transaction_type"])
@@ -0,0 +1,166 @@
+import io
+import os
+from contextlib import contextmanager
+
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+import pytest
+
+from data_io import (
+    EXPORT_FORMATS, EXPORT_SCHEMA, LARGE_EXPORT_ROWS, default_export_format, export_to_file, import_transactions,
+    remove_export,
+)
+from tests.conftest import USER_ID, insert, transactions
+
+STATEMENT = """Date,Description,Amount,Category
+2024-03-01,Corner Coffee,-4.50,Food
+2024-03-01,Corner Coffee,-4.50,Food
+2024-03-02,Salary March,"2,500.00",Salary
+2024-03-03,Shell Station,(40.00),Transport
+not a date,Broken row,-1.00,Food
+2024-03-04,Bookshop,-12.00,Books
+"""
+
+
+def csv_file(text=STATEMENT):
+    return io.BytesIO(text.encode())
+
+
+def test_import_normalizes_and_rejects(repository):
+    report = import_transactions(repository, USER_ID, csv_file(), "statement.csv", batch_size=2)
+    assert (report.rows_read, report.inserted, report.duplicates, report.rejected) == (6, 5, 0, 1)
+    assert not report.errors
+    frame = repository.frame(USER_ID).to_pandas().sort_values("date", ignore_index=True)
+    assert frame["amount"].tolist() == [4.5, 4.5, 2500.0, 40.0, 12.0]
+    assert frame["transaction_type"].tolist() == ["expense", "expense", "income", "expense", "expense"]
+    assert frame["category"].tolist()[-1] == "Other"
+
+
+def test_reimport_adds_nothing(client, repository):
+    import_transactions(repository, USER_ID, csv_file(), "statement.csv")
+    report = import_transactions(repository, USER_ID, csv_file(), "statement.csv", chunk_rows=2)
+    assert (report.inserted, report.duplicates) == (0, 5)
+    stored = client.table("transactions").select("*").eq("user_id", USER_ID).execute().data
+    assert len(stored) == 5
+
+
+def test_import_keeps_extra_identical_rows(repository):
+    # The first import has the coffee once, the statement twice: one more is new
+    import_transactions(repository, USER_ID, csv_file(STATEMENT.replace("2024-03-01,Corner Coffee,-4.50,Food\n", "", 1)), "a.csv")
+    report = import_transactions(repository, USER_ID, csv_file(), "b.csv", chunk_rows=1)
+    assert (report.inserted, report.duplicates) == (1, 4)
+    assert (repository.frame(USER_ID).to_pandas()["detail"] == "Corner Coffee").sum() == 2
+
+
+def test_import_reads_ofx(repository):
+    ofx = """<OFX><BANKTRANLIST>
+<STMTTRN><TRNTYPE>DEBIT<DTPOSTED>20240305120000<TRNAMT>-9.99<NAME>Netflix<MEMO>Monthly</STMTTRN>
+<STMTTRN><TRNTYPE>CREDIT<DTPOSTED>20240306<TRNAMT>100.00<NAME>Refund</STMTTRN>
+</BANKTRANLIST></OFX>"""
+    report = import_transactions(repository, USER_ID, io.BytesIO(ofx.encode()), "bank.ofx")
+    assert report.inserted == 2
+    frame = repository.frame(USER_ID).to_pandas().sort_values("date", ignore_index=True)
+    assert frame["detail"].tolist() == ["Netflix Monthly", "Refund"]
+    assert frame["transaction_type"].tolist() == ["expense", "income"]
+
+
+def read_export(path, export_format):
+    if export_format == "Parquet":
+        return pq.read_table(path).to_pandas()
+    if export_format == "Arrow":
+        return pa.ipc.open_file(path).read_all().to_pandas()
+    if export_format == "CSV":
+        return pd.read_csv(path, keep_default_na=False, parse_dates=["date"]).assign(date=lambda df: df["date"].dt.date)
+    return pd.read_excel(path, keep_default_na=False).assign(date=lambda df: df["date"].dt.date)
+
+
+@contextmanager
+def exported_file(pages, export_format):
+    path = export_to_file(pages, export_format)
+    try:
+        yield path
+    finally:
+        remove_export(path)
+
+
+@pytest.mark.parametrize("export_format", list(EXPORT_FORMATS))
+def test_export_round_trip(client, repository, export_format):
+    rows = transactions(120)
+    insert(client, rows)
+    with exported_file(repository.iter_pages(USER_ID, page_size=50), export_format) as path:
+        exported = read_export(path, export_format)
+    assert list(exported.columns) == ["id", "date", "category", "transaction_type", "amount", "detail"]
+    expected = pd.DataFrame(rows).sort_values("id", ignore_index=True)
+    exported = exported.sort_values("id", ignore_index=True)
+    assert exported["id"].tolist() == expected["id"].tolist()
+    assert [str(day) for day in exported["date"]] == expected["date"].tolist()
+    assert exported["amount"].tolist() == expected["amount"].tolist()
+    assert exported["detail"].fillna("").tolist() == expected["detail"].tolist()
+    assert exported["category"].tolist() == expected["category"].tolist()
+
+
+def test_export_writes_one_page_at_a_time(client, repository):
+    insert(client, transactions(100))
+    with exported_file(repository.iter_pages(USER_ID, page_size=30), "Parquet") as path:
+        exported = pq.ParquetFile(path)
+        # Every page becomes its own row group as it arrives
+        assert [exported.metadata.row_group(i).num_rows for i in range(exported.num_row_groups)] == [30, 30, 30, 10]
+
+
+def test_export_applies_filters(client, repository):
+    rows = transactions(80)
+    insert(client, rows)
+    pages = repository.iter_pages(USER_ID, category="Food", transaction_type="expense", page_size=10)
+    with exported_file(pages, "CSV") as path:
+        exported = read_export(path, "CSV")
+    expected = {row["id"] for row in rows if row["category"] == "Food" and row["transaction_type"] == "expense"}
+    assert expected and set(exported["id"]) == expected
+
+
+@pytest.mark.parametrize("export_format", ["Parquet", "Arrow"])
+def test_export_without_rows_keeps_the_columns(export_format):
+    with exported_file(iter(()), export_format) as path:
+        exported = read_export(path, export_format)
+    assert exported.empty
+    assert list(exported.columns) == EXPORT_SCHEMA.names
+
+
+def test_csv_export_without_rows_keeps_the_header():
+    with exported_file(iter(()), "CSV") as path, open(path) as f:
+        assert f.read().splitlines() == [",".join(f'"{name}"' for name in EXPORT_SCHEMA.names)]
+
+
+def test_default_export_format_switches_to_parquet_for_large_exports():
+    assert default_export_format(LARGE_EXPORT_ROWS - 1) == "CSV"
+    assert default_export_format(LARGE_EXPORT_ROWS) == "Parquet"
+
+
+def test_export_to_file_outlives_the_call(client, repository):
+    rows = transactions(30)
+    insert(client, rows)
+    path = export_to_file(repository.iter_pages(USER_ID, page_size=7), "Parquet")
+    try:
+        assert path.endswith(".parquet")
+        assert sorted(pq.read_table(path)["id"].to_pylist()) == sorted(row["id"] for row in rows)
+    finally:
+        remove_export(path)
+    assert not os.path.exists(path)
+    remove_export(path)  # removing twice is fine
+
+
+def test_failed_export_leaves_no_file(tmp_path, monkeypatch):
+    monkeypatch.setattr("tempfile.tempdir", str(tmp_path))
+
+    def pages():
+        raise RuntimeError("connection lost")
+        yield
+
+    with pytest.raises(RuntimeError):
+        export_to_file(pages(), "CSV")
+    assert not list(tmp_path.iterdir())
+
+
+def test_export_rejects_unknown_formats(repository):
+    with pytest.raises(ValueError):
+        export_to_file(iter(()), "PDF")
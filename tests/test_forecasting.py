@@ -0,0 +1,61 @@
+import numpy as np
+import pytest
+
+import forecasting
+from benchmarks.forecasting import synthetic_series
+from forecasting import AUTO, BACKTEST_HORIZONS, SEASON_LENGTHS, auto_candidates, backtest, fit_model, select_model
+
+
+@pytest.fixture(scope="module")
+def series():
+    return {name: values.to_numpy(dtype=float) for (name, _), values in synthetic_series().items()}
+
+
+def test_croston_only_competes_on_intermittent_series(series):
+    assert "Croston" in auto_candidates(series["sparse daily"])
+    assert "Croston" not in auto_candidates(series["dense daily"])
+    assert "Croston" not in auto_candidates(series["monthly income"])
+    assert "ARIMA" in auto_candidates(series["monthly income"])
+
+
+@pytest.mark.parametrize("name, level", [("dense daily", "Daily"), ("sparse weekly", "Weekly"), ("monthly income", "Monthly")])
+def test_select_model_returns_the_lowest_backtest_error(series, name, level):
+    y = series[name]
+    best, scores = select_model(y, level)
+    assert set(scores) == set(auto_candidates(y))
+    assert scores[best] == min(scores.values())
+    for candidate, score in scores.items():
+        assert score == pytest.approx(backtest(candidate, y, SEASON_LENGTHS[level], BACKTEST_HORIZONS[level]))
+
+
+def test_monthly_income_is_not_forecast_by_croston(series):
+    y = series["monthly income"][:-BACKTEST_HORIZONS["Monthly"]]
+    model = fit_model(AUTO, y, "Monthly")
+    assert model.name != "Croston"
+    assert model.backtest_scores[model.name] == min(model.backtest_scores.values())
+
+
+def test_failing_or_nan_backends_never_win(monkeypatch):
+    class Failing(forecasting.ForecastModel):
+        def fit(self, y):
+            raise np.linalg.LinAlgError("singular")
+
+    class Blank(forecasting.ForecastModel):
+        def fit(self, y):
+            return self
+
+        def forecast(self, steps):
+            return np.full(steps, np.nan)
+
+    monkeypatch.setitem(forecasting.MODELS, "Failing", Failing)
+    monkeypatch.setitem(forecasting.MODELS, "Blank", Blank)
+    y = np.arange(60, dtype=float)
+    best, scores = select_model(y, "Monthly", candidates=("Failing", "Blank", "Holt"))
+    assert best == "Holt"
+    assert scores["Failing"] == scores["Blank"] == float("inf")
+
+
+def test_short_series_fall_back_to_the_first_candidate():
+    best, scores = select_model(np.array([5.0, 7.0]), "Monthly")
+    assert best == forecasting.AUTO_CANDIDATES[0]
+    assert all(np.isinf(score) for score in scores.values())
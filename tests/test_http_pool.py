@@ -0,0 +1,50 @@
+import asyncio
+import contextlib
+import inspect
+
+import httpx
+import pytest
+from supabase import AsyncClient, Client
+
+from http_pool import AsyncPooledClient, PooledClient
+
+URL = "https://example.supabase.co"
+KEY = "eyJhbGciOiJIUzI1NiJ9.eyJyb2xlIjoiYW5vbiJ9.signature"
+HOOKS = ("_init_postgrest_client", "_init_supabase_auth_client")
+
+
+@pytest.fixture
+def requests():
+    return []
+
+
+@pytest.fixture
+def transport(requests):
+    def handle(request):
+        requests.append(request.url.path)
+        return httpx.Response(200, json=[])
+    return httpx.MockTransport(handle)
+
+
+@pytest.mark.parametrize("pooled, base", [(PooledClient, Client), (AsyncPooledClient, AsyncClient)])
+def test_overridden_hooks_still_exist(pooled, base):
+    # The overrides rely on private supabase-py methods; a new release may rename them or their arguments
+    for hook in HOOKS:
+        assert hasattr(base, hook)
+        ours = [name for name in inspect.signature(getattr(pooled, hook)).parameters if name != "self"]
+        assert ours == list(inspect.signature(getattr(base, hook)).parameters)
+
+
+def test_pooled_client_sends_everything_through_the_transport(transport, requests):
+    client = PooledClient(URL, KEY, transport, timeout=5)
+    assert client.table("users").select("*").execute().data == []
+    with contextlib.suppress(Exception):
+        client.auth.get_user("token")
+    assert requests == ["/rest/v1/users", "/auth/v1/user"]
+
+
+def test_async_pooled_client_sends_queries_through_the_transport(transport, requests):
+    sync_client = PooledClient(URL, KEY, transport, timeout=5)
+    client = AsyncPooledClient(URL, KEY, transport, timeout=5, sync_client=sync_client)
+    assert asyncio.run(client.table("users").select("*").execute()).data == []
+    assert requests == ["/rest/v1/users"]
@@ -0,0 +1,100 @@
+import uuid
+from datetime import date, timedelta
+
+import pandas as pd
+import pyarrow as pa
+import pytest
+
+from benchmarks.insights import synthetic_frame
+from insights import RecurrenceIndex, normalize_details
+from logic import Transaction, TransactionFrame
+from tests.conftest import USER_ID, transactions
+
+TODAY = date(2024, 12, 20)
+
+
+def charge(day, amount, detail, category="Utilities", transaction_type="expense"):
+    return {
+        "id": str(uuid.uuid4()), "user_id": USER_ID, "amount": amount, "category": category,
+        "detail": detail, "transaction_type": transaction_type, "date": day.isoformat(),
+    }
+
+
+def history():
+    """A monthly subscription, weekly groceries, a salary that stopped, and noise."""
+    records = [charge(date(2024, month, 3), 15.99, f"NETFLIX.COM {month:02}24") for month in range(1, 13)]
+    records += [charge(date(2024, 9, 2) + timedelta(weeks=week), 60 + week % 3, "Grocery Market", "Food")
+                for week in range(16)]
+    records += [charge(date(2024, month, 28), 2500, "Salary ACME", "Salary", "income") for month in range(1, 6)]
+    records += transactions(40, seed=3)
+    return sorted(records, key=lambda record: record["date"])
+
+
+def series(index):
+    return index.recurring(TODAY).set_index("detail")
+
+
+def frame_of(records):
+    return TransactionFrame.from_records(records, USER_ID)
+
+
+def test_normalize_details_keeps_letters_only():
+    details = normalize_details(pa.array(["NETFLIX.COM 0423", " Netflix.com-0523 ", None]))
+    assert details.to_pylist() == ["netflix com", "netflix com", ""]
+
+
+def test_detects_periods_and_next_charges():
+    found = series(RecurrenceIndex.build(frame_of(history())))
+    assert found.loc["NETFLIX.COM 1224", "period"] == "monthly"
+    assert found.loc["NETFLIX.COM 1224", "occurrences"] == 12
+    assert found.loc["NETFLIX.COM 1224", "next_date"] == pd.Timestamp("2025-01-02")
+    assert found.loc["Grocery Market", "period"] == "weekly"
+    assert found.loc["Grocery Market", "average_amount"] == pytest.approx(60 + sum(w % 3 for w in range(16)) / 16)
+    assert found["active"].to_dict() == {"NETFLIX.COM 1224": True, "Grocery Market": True, "Salary ACME": False}
+
+
+def test_upcoming_projects_active_series_only():
+    upcoming = RecurrenceIndex.build(frame_of(history())).upcoming(days=14, today=TODAY)
+    assert upcoming["date"].is_monotonic_increasing
+    assert "Salary ACME" not in set(upcoming["detail"])
+    groceries = upcoming[upcoming["detail"] == "Grocery Market"]
+    assert groceries["date"].tolist() == [pd.Timestamp("2024-12-23"), pd.Timestamp("2024-12-30")]
+    assert upcoming.loc[upcoming["detail"] == "NETFLIX.COM 1224", "amount"].tolist() == [15.99]
+
+
+@pytest.mark.parametrize("steps", [2, 7])
+def test_extend_matches_a_full_build(steps):
+    frame = synthetic_frame(5_000)
+    index = RecurrenceIndex()
+    for stop in range(len(frame) // steps, len(frame) + 1, len(frame) // steps):
+        assert index.extend(TransactionFrame(frame.data.iloc[:stop].reset_index(drop=True)))
+    assert index.extend(frame)
+    pd.testing.assert_frame_equal(index.recurring(TODAY), RecurrenceIndex.build(frame).recurring(TODAY))
+
+
+def test_backdated_rows_recount_their_series():
+    records = history()
+    late = [record for record in records if record["detail"].startswith("NETFLIX")][:4]
+    head = frame_of([record for record in records if record not in late])
+    index = RecurrenceIndex.build(head)
+    frame = head.concat(frame_of(late))
+    assert index.extend(frame)
+    pd.testing.assert_frame_equal(index.recurring(TODAY), RecurrenceIndex.build(frame).recurring(TODAY))
+    assert series(index).loc["NETFLIX.COM 1224", "occurrences"] == 12
+
+
+def test_extend_refuses_frames_that_dropped_rows():
+    frame = frame_of(history())
+    index = RecurrenceIndex.build(frame)
+    assert not index.extend(frame.drop_rows(frame.has_ids(frame.ids.iloc[[0]])))
+    assert index.extend(frame)
+
+
+def test_repository_extends_the_index_after_inserts(repository):
+    repository.add_many(USER_ID, history())
+    index = repository.recurring(USER_ID)
+    assert repository.recurring(USER_ID) is index
+    repository.add(Transaction(str(uuid.uuid4()), USER_ID, 15.99, "Utilities", "Netflix.com 0125", "expense",
+                               date(2025, 1, 2)))
+    assert repository.recurring(USER_ID) is index
+    assert series(index).loc["Netflix.com 0125", "occurrences"] == 13
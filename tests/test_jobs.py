@@ -0,0 +1,83 @@
+import threading
+
+from jobs import CANCELLED, DONE, JobRunner
+
+
+def run(runner, key, result="result", **kwargs):
+    job = runner.submit("user", key, (), lambda job: result, **kwargs)
+    assert job.wait(5)
+    return job
+
+
+def test_identical_jobs_are_shared():
+    runner = JobRunner()
+    gate = threading.Event()
+    first = runner.submit("user", "fit", ("a",), lambda job: gate.wait(5))
+    assert runner.submit("user", "fit", ("a",), lambda job: None) is first
+    assert runner.get("user", "fit", ("a",)) is first
+    gate.set()
+    assert first.wait(5) and first.status == DONE
+
+
+def test_cancel_stops_a_running_job():
+    runner = JobRunner()
+    started = threading.Event()
+
+    def work(job):
+        started.set()
+        while True:
+            job.report(0.5)
+
+    job = runner.submit("user", "export", (), work)
+    started.wait(5)
+    runner.cancel("user")
+    assert job.wait(5) and job.status == CANCELLED
+
+
+def test_cancel_releases_finished_results():
+    released = []
+    runner = JobRunner()
+    run(runner, "export", cleanup=released.append)
+    other = runner.submit("other user", "export", (), lambda job: "theirs", cleanup=released.append)
+    assert other.wait(5)
+    runner.cancel("user")
+    assert released == ["result"]
+    assert runner.get("user", "export") is None
+    assert runner.get("other user", "export") is other
+
+
+def test_discard_releases_the_result():
+    released = []
+    runner = JobRunner()
+    job = run(runner, "export", cleanup=released.append)
+    runner.discard("user", "export")
+    assert released == ["result"]
+    assert job.result is None
+    assert runner.get("user", "export") is None
+
+
+def test_expired_pruned_and_replaced_results_are_released():
+    released = []
+    runner = JobRunner(max_finished=2, ttl=600.0)
+    for kind in ("a", "b", "c", "d"):
+        run(runner, kind, result=kind, cleanup=released.append)
+    assert released == ["a"]  # three finished when "d" came in, one over max_finished
+    run(runner, "c", result="c2", cleanup=released.append, fresh=True)
+    assert released == ["a", "c"]
+    runner.ttl = 0.0
+    assert runner.get("user", "b") is None
+    assert released == ["a", "c", "b"]
+
+
+def test_failed_jobs_have_nothing_to_release():
+    released = []
+    runner = JobRunner()
+
+    def fail(job):
+        raise RuntimeError("boom")
+
+    job = runner.submit("user", "export", (), fail, cleanup=released.append)
+    job.wait(5)
+    runner.discard("user", "export")
+    assert str(job.error) == "boom"
+    assert released == []
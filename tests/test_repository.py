@@ -0,0 +1,184 @@
+from datetime import date
+
+import pandas as pd
+
+from logic import Transaction
+from tests.conftest import OTHER_USER_ID, USER_ID, insert, transactions
+
+
+def frame_ids(repository, user_id=USER_ID):
+    return set(repository.frame(user_id).ids)
+
+
+def test_frame_loads_only_the_users_rows(client, repository):
+    mine, theirs = transactions(30), transactions(10, seed=1, user_id=OTHER_USER_ID)
+    insert(client, mine + theirs)
+    assert frame_ids(repository) == {row["id"] for row in mine}
+    frame = repository.frame(USER_ID).to_pandas().set_index("id").sort_index()
+    expected = pd.DataFrame(mine).set_index("id").sort_index()
+    assert (frame["amount"] == expected["amount"]).all()
+    assert (frame["detail"] == expected["detail"]).all()
+    assert (frame["date"].dt.strftime("%Y-%m-%d") == expected["date"]).all()
+
+
+def test_sync_merges_inserts_from_elsewhere(client, repository):
+    insert(client, transactions(20))
+    before = frame_ids(repository)
+    new = transactions(5, seed=1)
+    insert(client, new)
+    assert frame_ids(repository) == before
+    assert repository.sync(USER_ID) >= len(new)
+    assert frame_ids(repository) == before | {row["id"] for row in new}
+
+
+def test_sync_applies_tombstones(client, repository):
+    rows = transactions(20)
+    insert(client, rows)
+    repository.frame(USER_ID)
+    gone = [row["id"] for row in rows[:3]]
+    client.table("transactions").delete().in_("id", gone).execute()
+    repository.sync(USER_ID)
+    assert frame_ids(repository) == {row["id"] for row in rows[3:]}
+
+
+def test_sync_applies_updates_once(client, repository):
+    rows = transactions(10)
+    insert(client, rows)
+    repository.frame(USER_ID)
+    client.table("transactions").update({"amount": 1234.5}).eq("id", rows[0]["id"]).execute()
+    repository.sync(USER_ID)
+    frame = repository.frame(USER_ID).to_pandas()
+    assert len(frame) == len(rows)
+    assert frame.loc[frame["id"] == rows[0]["id"], "amount"].tolist() == [1234.5]
+
+
+def stamped(records, updated_at):
+    return [dict(record, updated_at=updated_at) for record in records]
+
+
+def test_sync_advances_the_watermark(client, repository, session_state):
+    insert(client, stamped(transactions(10), "2024-06-01T10:00:00.000+00:00"))
+    repository.frame(USER_ID)
+    assert session_state.transactions_sync_state[USER_ID]["watermark"] == "2024-06-01T10:00:00.000+00:00"
+
+    insert(client, stamped(transactions(3, seed=1), "2024-06-02T10:00:00.000+00:00"))
+    assert repository.sync(USER_ID) == 3
+    assert session_state.transactions_sync_state[USER_ID]["watermark"] == "2024-06-02T10:00:00.000+00:00"
+    # Rows at exactly the watermark come back again, but are not merged twice
+    frame = repository.frame(USER_ID)
+    assert repository.sync(USER_ID) == 0
+    assert repository.frame(USER_ID) is frame
+    assert len(frame) == 13
+
+
+def test_sync_skips_the_sessions_own_writes(client, repository):
+    insert(client, stamped(transactions(10), "2024-06-01T10:00:00.000+00:00"))
+    repository.frame(USER_ID)
+    rows = transactions(4, seed=1)
+    repository.add(Transaction(**rows[0]))
+    repository.add_many(USER_ID, rows[1:], batch_size=2)
+    repository.delete(USER_ID, rows[1]["id"])
+    frame = repository.frame(USER_ID)
+    assert repository.sync(USER_ID) == 0
+    assert repository.frame(USER_ID) is frame
+    assert frame_ids(repository) == {row["id"] for row in transactions(10)} | {row["id"] for row in rows if row is not rows[1]}
+
+
+def test_sync_applies_edits_to_the_sessions_own_writes(client, repository):
+    record = transactions(1)[0]
+    repository.frame(USER_ID)
+    repository.add(Transaction(**record))
+    client.table("transactions").update({"amount": 99.0, "updated_at": "2999-01-01T00:00:00.000+00:00"}).eq("id", record["id"]).execute()
+    assert repository.sync(USER_ID) == 1
+    assert repository.frame(USER_ID).to_pandas()["amount"].tolist() == [99.0]
+
+
+def test_frame_loads_without_updated_at(repository, session_state):
+    # Before schema.sql is applied the rows carry no updated_at
+    rows = transactions(5)
+    repository._load_frame(USER_ID, rows)
+    assert len(repository.frame(USER_ID)) == 5
+    assert session_state.transactions_sync_state[USER_ID]["watermark"] is None
+
+
+def test_local_writes_patch_the_cached_frame(client, repository):
+    insert(client, transactions(10))
+    before = frame_ids(repository)
+    record = transactions(1, seed=1)[0]
+    repository.add(Transaction(
+        record["id"], USER_ID, record["amount"], record["category"], record["detail"],
+        record["transaction_type"], record["date"],
+    ))
+    assert frame_ids(repository) == before | {record["id"]}
+    repository.delete(USER_ID, record["id"])
+    assert frame_ids(repository) == before
+
+
+def walk(repository, page_size, **filters):
+    rows, after, first = [], None, True
+    while True:
+        frame, total, after = repository.page(USER_ID, after=after, page_size=page_size, **filters)
+        if first:
+            count, first = total, False
+        else:
+            assert total is None
+        assert len(frame) <= page_size
+        rows.extend(frame.to_pandas().itertuples(index=False))
+        if after is None:
+            return rows, count
+
+
+def test_keyset_pages_cover_every_row_once(client, repository):
+    rows = transactions(103)
+    insert(client, rows + transactions(7, seed=1, user_id=OTHER_USER_ID))
+    expected = sorted(rows, key=lambda row: (row["date"], row["id"]), reverse=True)
+    for page_size in (1, 10, 103, 500):
+        seen, total = walk(repository, page_size)
+        assert total == len(rows)
+        assert [row.id for row in seen] == [row["id"] for row in expected]
+
+
+def test_keyset_pages_split_same_day_rows(client, repository):
+    # Ten rows on one day: the cursor's id decides where each page starts
+    rows = transactions(10)
+    for row in rows:
+        row["date"] = "2024-05-01"
+    insert(client, rows)
+    seen, total = walk(repository, 3)
+    assert total == 10
+    assert [row.id for row in seen] == sorted((row["id"] for row in rows), reverse=True)
+
+
+def test_keyset_pages_apply_filters(client, repository):
+    rows = transactions(200)
+    insert(client, rows)
+    filters = {"start_date": date(2024, 3, 1), "end_date": date(2024, 6, 30), "category": "Food", "transaction_type": "expense"}
+    seen, total = walk(repository, 7, **filters)
+    expected = [
+        row["id"] for row in rows
+        if "2024-03-01" <= row["date"] <= "2024-06-30" and row["category"] == "Food" and row["transaction_type"] == "expense"
+    ]
+    assert total == len(expected)
+    assert sorted(row.id for row in seen) == sorted(expected)
+
+
+def test_iter_pages_yields_every_row(client, repository):
+    rows = transactions(55)
+    insert(client, rows)
+    pages = list(repository.iter_pages(USER_ID, page_size=10))
+    assert [len(page) for page in pages] == [10] * 5 + [5]
+    assert {i for page in pages for i in page.ids} == {row["id"] for row in rows}
+
+
+def test_aggregate_views_match_groupby(client, repository):
+    rows = transactions(300)
+    insert(client, rows)
+    df = pd.DataFrame(rows)
+    expected = df.groupby(["category", "transaction_type"]).agg(amount=("amount", "sum"), count=("amount", "size"))
+    totals = repository.category_totals(USER_ID).set_index(["category", "transaction_type"]).sort_index()
+    pd.testing.assert_series_equal(totals["amount"], expected["amount"], check_exact=False)
+    assert (totals["count"] == expected["count"]).all()
+
+    daily = repository.daily_totals(USER_ID)
+    assert daily["count"].sum() == len(rows)
+    assert abs(daily["amount"].sum() - df["amount"].sum()) < 1e-6
@@ -0,0 +1,96 @@
+import pytest
+
+import local_database
+from logic import TransactionRepository
+from tests.conftest import USER_ID, insert, transactions
+
+QUERIES = [
+    ("coffee", {}),
+    ("Coffee shop", {}),
+    ("COFFEE", {"category": "Food"}),
+    ("olé", {}),
+    ("s", {}),
+    ("", {"category": "Utilities"}),
+    ("", {"min_amount": 10.0, "max_amount": 40.0}),
+    ("station", {"min_amount": 25.0}),
+    ("no such merchant", {}),
+]
+
+
+@pytest.fixture
+def rows(client):
+    rows = transactions(400)
+    insert(client, rows + transactions(50, seed=1, user_id="00000000-0000-4000-8000-000000000002"))
+    return rows
+
+
+def expected(client, query, filters, limit=1000, offset=0):
+    params = {{"min_amount": "p_min_amount", "max_amount": "p_max_amount", "category": "p_category"}[k]: v for k, v in filters.items()}
+    return local_database.search_transactions(client.connection, USER_ID, query, p_limit=limit, p_offset=offset, **params)
+
+
+@pytest.mark.parametrize("query, filters", QUERIES)
+def test_local_index_matches_search_transactions(client, repository, rows, query, filters):
+    repository.frame(USER_ID)
+    frame, total = repository.search(USER_ID, query, page_size=1000, **filters)
+    matches = expected(client, query, filters)
+    assert total == len(matches)
+    assert list(frame.ids) == [row["id"] for row in matches]
+
+
+@pytest.mark.parametrize("query, filters", QUERIES)
+def test_local_and_database_pages_line_up(client, repository, rows, query, filters):
+    # Switching from the database to the local index mid-way neither repeats nor skips rows
+    remote = TransactionRepository(client)
+    first, _ = remote.search(USER_ID, query, page=0, page_size=7, **filters)
+    repository.frame(USER_ID)
+    second, _ = repository.search(USER_ID, query, page=1, page_size=7, **filters)
+    assert list(first.ids) + list(second.ids) == [row["id"] for row in expected(client, query, filters, limit=14)]
+
+
+def test_ties_break_on_id_past_the_page_boundary(client, repository):
+    # Same detail and day: only the id orders them
+    rows = [dict(row, detail="Rent", date="2024-05-01") for row in transactions(30)]
+    insert(client, rows)
+    repository.frame(USER_ID)
+    ids = sorted((row["id"] for row in rows), reverse=True)
+    pages = [list(repository.search(USER_ID, "rent", page=page, page_size=8)[0].ids) for page in range(4)]
+    assert sum(pages, []) == ids
+
+
+@pytest.mark.parametrize("query, filters", QUERIES)
+def test_database_search_pages(client, rows, query, filters):
+    # No local frame: the search_transactions function answers
+    repository = TransactionRepository(client)
+    matches = expected(client, query, filters)
+    for page in range(-(-len(matches) // 20)):
+        frame, total = repository.search(USER_ID, query, page=page, page_size=20, **filters)
+        assert total == len(matches)
+        assert list(frame.ids) == [row["id"] for row in matches[page * 20:(page + 1) * 20]]
+    assert not repository.has_frame(USER_ID)
+
+
+def test_scores_rank_closer_details_first(client, repository, rows):
+    repository.frame(USER_ID)
+    frame, _ = repository.search(USER_ID, "coffee shop", page_size=1000)
+    details = frame.data["detail"].tolist()
+    assert set(details) == {"Coffee Shop"}
+    frame, _ = repository.search(USER_ID, "coffee", page_size=1000)
+    details = frame.data["detail"].tolist()
+    # "Coffee Shop" and "Corner Coffee" are equally similar to "coffee" (7 of 12 trigrams); newer rows win ties
+    assert set(details) == {"Coffee Shop", "Corner Coffee"}
+    dates = frame.data["date"].tolist()
+    assert dates == sorted(dates, reverse=True)
+
+
+def test_index_follows_writes(client, repository, rows):
+    repository.frame(USER_ID)
+    before = repository.search(USER_ID, "netflix", page_size=1000)[1]
+    new = [dict(row, detail="Netflix Family") for row in transactions(5, seed=2)]
+    insert(client, new)
+    repository.sync(USER_ID)
+    assert repository.search(USER_ID, "netflix", page_size=1000)[1] == before + 5
+    repository.delete(USER_ID, new[0]["id"])
+    frame, total = repository.search(USER_ID, "netflix family", page_size=1000)
+    assert total == 4
+    assert set(frame.ids) == {row["id"] for row in new[1:]}
@@ -0,0 +1,39 @@
+import time
+
+import security
+from tests.conftest import USER_ID
+
+
+def test_token_round_trip():
+    assert security.verify_token(security.issue_token(USER_ID)) == USER_ID
+
+
+def test_rejects_expired_tampered_and_missing_tokens():
+    token = security.issue_token(USER_ID)
+    payload, signature = token.split(".")
+    assert security.verify_token(security.issue_token(USER_ID, ttl=-1)) is None
+    assert security.verify_token(payload + "." + signature[::-1]) is None
+    assert security.verify_token("garbage") is None
+    assert security.verify_token(None) is None
+
+
+def test_revoked_token_stops_working():
+    token = security.issue_token(USER_ID)
+    security.revoke_token(token)
+    assert security.verify_token(token) is None
+
+
+def test_rotation_replaces_the_token(monkeypatch):
+    token = security.issue_token(USER_ID)
+    user_id, rotated = security.rotate_token(token)
+    assert user_id == USER_ID
+    assert rotated != token
+    assert security.verify_token(rotated) == USER_ID
+    # Other tabs loading at the same moment still get in
+    assert security.verify_token(token) == USER_ID
+
+    later = time.time() + security.ROTATION_GRACE_SECONDS + 1
+    monkeypatch.setattr(time, "time", lambda: later)
+    assert security.verify_token(token) is None
+    assert security.rotate_token(token) == (None, None)
+    assert security.verify_token(rotated) == USER_ID
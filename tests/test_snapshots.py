@@ -0,0 +1,66 @@
+import pytest
+import streamlit as st
+
+from logic import TransactionRepository
+from snapshots import SnapshotCache
+from tests.conftest import USER_ID, insert, transactions
+
+
+class CountingSnapshotCache(SnapshotCache):
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.saves = []
+
+    def save(self, user_id, frame, watermark):
+        self.saves.append(len(frame))
+        super().save(user_id, frame, watermark)
+
+
+@pytest.fixture
+def snapshots(tmp_path):
+    return CountingSnapshotCache(str(tmp_path), min_interval=60.0)
+
+
+def test_restore_catches_up_from_the_snapshot(client, snapshots):
+    insert(client, transactions(20))
+    TransactionRepository(client, snapshots=snapshots).frame(USER_ID)
+    snapshots.flush()
+    new = transactions(5, seed=1)
+    insert(client, new)
+    client.table("transactions").delete().eq("id", new[0]["id"]).execute()
+
+    # A new session starts from the snapshot and only fetches the changes after it
+    st.session_state.clear()
+    repository = TransactionRepository(client, snapshots=snapshots)
+    restored, _ = snapshots.load(USER_ID)
+    assert len(restored) == 20
+    assert set(repository.frame(USER_ID).ids) == {row["id"] for row in transactions(20) + new[1:]}
+
+
+def test_sync_saves_are_coalesced_off_the_script_thread(client, snapshots):
+    insert(client, transactions(20))
+    repository = TransactionRepository(client, snapshots=snapshots)
+    repository.frame(USER_ID)
+    snapshots.flush()
+    assert snapshots.saves == [20]
+    for seed in (1, 2, 3):
+        insert(client, transactions(2, seed=seed))
+        repository.sync(USER_ID)
+    # Within min_interval of the last save nothing is written yet
+    assert snapshots.saves == [20]
+    snapshots.flush()
+    assert snapshots.saves == [20, 26]
+    assert len(snapshots.load(USER_ID)[0]) == 26
+
+
+def test_discard_drops_a_queued_save(client, snapshots):
+    insert(client, transactions(5))
+    repository = TransactionRepository(client, snapshots=snapshots)
+    repository.frame(USER_ID)
+    snapshots.flush()
+    insert(client, transactions(2, seed=1))
+    repository.sync(USER_ID)
+    snapshots.discard(USER_ID)
+    snapshots.flush()
+    assert snapshots.saves == [5]
+    assert not snapshots.exists(USER_ID)
@@ -0,0 +1,56 @@
+import json
+
+import pytest
+
+import tracing
+
+
+@pytest.fixture
+def trace_file(tmp_path):
+    path = tmp_path / "spans.jsonl"
+    tracing.configure_export(str(path))
+    yield path
+    tracing.configure_export(None)
+
+
+def exported(path):
+    return [json.loads(line) for line in path.read_text().splitlines()]
+
+
+@pytest.fixture
+def section(monkeypatch):
+    # Outside a running app st.fragment does not call the function; keep just the tracing
+    monkeypatch.setattr(tracing.st, "fragment", lambda function, run_every=None: function)
+
+    @tracing.fragment
+    def section():
+        with tracing.span("stage"):
+            pass
+
+    return section
+
+
+def test_fragment_rerun_gets_a_trace_of_its_own(trace_file, section):
+    section()
+    spans = exported(trace_file)
+    assert [span["name"] for span in spans] == [f"rerun fragment {section.__qualname__}", "stage"]
+    assert len({span["traceId"] for span in spans}) == 1
+    assert spans[1]["parentSpanId"] == spans[0]["spanId"]
+
+
+def test_fragment_in_a_full_rerun_is_one_of_its_spans(trace_file, section):
+    tracing.begin_rerun("Transactions")
+    section()
+    tracing.end_rerun()
+    assert [(span.name, span.depth) for span in tracing.spans()] == [
+        ("rerun Transactions", 0), (f"fragment {section.__qualname__}", 1), ("stage", 2),
+    ]
+    assert len({span["traceId"] for span in exported(trace_file)}) == 1
+
+
+def test_spans_after_a_rerun_ended_are_not_attached_to_it(trace_file):
+    tracing.begin_rerun("Dashboard")
+    tracing.end_rerun()
+    with tracing.span("late"):
+        pass
+    assert [span["name"] for span in exported(trace_file)] == ["rerun Dashboard"]
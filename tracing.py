@@ -0,0 +1,284 @@
+import functools
+import json
+import logging
+import os
+import threading
+import time
+from contextlib import contextmanager
+from logging.handlers import RotatingFileHandler
+
+import streamlit as st
+
+TRACE_MAX_BYTES = 5 * 1024 * 1024
+TRACE_BACKUPS = 3
+
+# Spans of the rerun running on this thread (Streamlit runs each script rerun on its own thread)
+_local = threading.local()
+_exporter = logging.getLogger("savvysmart.traces")
+_exporter.propagate = False
+
+
+class Span:
+    __slots__ = ("name", "span_id", "parent_id", "depth", "start_ns", "end_ns", "attributes")
+
+    def __init__(self, name, parent=None, attributes=None):
+        self.name = name
+        self.span_id = os.urandom(8).hex()
+        self.parent_id = parent.span_id if parent else None
+        self.depth = parent.depth + 1 if parent else 0
+        self.start_ns = time.time_ns()
+        self.end_ns = None
+        self.attributes = dict(attributes or {})
+
+    def set(self, **attributes):
+        self.attributes.update(attributes)
+
+    @property
+    def duration_ms(self):
+        return ((self.end_ns or time.time_ns()) - self.start_ns) / 1e6
+
+    def to_otlp(self, trace_id):
+        # One span in OTLP/JSON encoding (int64 values are strings there)
+        def value(v):
+            if isinstance(v, bool):
+                return {"boolValue": v}
+            if isinstance(v, int):
+                return {"intValue": str(v)}
+            if isinstance(v, float):
+                return {"doubleValue": v}
+            return {"stringValue": str(v)}
+
+        return {
+            "traceId": trace_id,
+            "spanId": self.span_id,
+            "parentSpanId": self.parent_id or "",
+            "name": self.name,
+            "kind": 1,
+            "startTimeUnixNano": str(self.start_ns),
+            "endTimeUnixNano": str(self.end_ns),
+            "attributes": [{"key": k, "value": value(v)} for k, v in self.attributes.items()],
+        }
+
+
+def configure_export(path, max_bytes=TRACE_MAX_BYTES, backups=TRACE_BACKUPS):
+    """Append every finished rerun's spans to ``path`` as JSON lines, rotating the file."""
+    target = os.path.abspath(path) if path else None
+    if [getattr(handler, "baseFilename", None) for handler in _exporter.handlers] == ([target] if target else []):
+        return  # already exporting there; main.py calls this on every rerun
+    for handler in list(_exporter.handlers):
+        _exporter.removeHandler(handler)
+        handler.close()
+    if path:
+        os.makedirs(os.path.dirname(target), exist_ok=True)
+        handler = RotatingFileHandler(target, maxBytes=max_bytes, backupCount=backups, encoding="utf-8")
+        handler.setFormatter(logging.Formatter("%(message)s"))
+        _exporter.addHandler(handler)
+        _exporter.setLevel(logging.INFO)
+
+
+def export_enabled():
+    return bool(_exporter.handlers)
+
+
+def begin_rerun(name, detailed=False):
+    """Start collecting spans for one script run. ``detailed`` also measures payload bytes."""
+    _local.trace_id = os.urandom(16).hex()
+    _local.spans = []
+    _local.stack = []
+    _local.detailed = detailed
+    _local.root = Span(f"rerun {name}")
+    _local.spans.append(_local.root)
+    _local.stack.append(_local.root)
+
+
+def end_rerun():
+    root = getattr(_local, "root", None)
+    if root is None or root.end_ns is not None:
+        return
+    root.end_ns = time.time_ns()
+    _local.stack = []
+    if export_enabled():
+        for recorded in _local.spans:
+            if recorded.end_ns is not None:
+                _exporter.info(json.dumps(recorded.to_otlp(_local.trace_id)))
+
+
+def fragment(function=None, *, run_every=None):
+    """``st.fragment`` whose runs are traced.
+
+    Run as part of a full rerun, the fragment is a span of that rerun. Rerun
+    on its own (a widget inside it changed), it has no rerun around it, so it
+    starts and exports a trace of its own.
+    """
+    def decorate(function):
+        name = f"fragment {function.__qualname__}"
+
+        @functools.wraps(function)
+        def traced(*args, **kwargs):
+            if getattr(_local, "stack", None):
+                with span(name):
+                    return function(*args, **kwargs)
+            begin_rerun(name, detailed=st.session_state.get("debug_trace", False))
+            try:
+                return function(*args, **kwargs)
+            finally:
+                end_rerun()
+
+        return st.fragment(traced, run_every=run_every)
+
+    return decorate(function) if function else decorate
+
+
+def detailed():
+    return getattr(_local, "detailed", False)
+
+
+def spans():
+    """Spans of the current rerun, in start order."""
+    return list(getattr(_local, "spans", []))
+
+
+def attach(recorded):
+    """Record a span finished elsewhere (e.g. on the event loop thread) under the innermost open span."""
+    stack = getattr(_local, "stack", None)
+    if not stack:
+        return
+    recorded.parent_id = stack[-1].span_id
+    recorded.depth = stack[-1].depth + 1
+    _local.spans.append(recorded)
+
+
+@contextmanager
+def span(name, **attributes):
+    """Time the enclosed block as a child of the innermost open span.
+
+    Outside a rerun (or on a worker thread) the block runs untraced.
+    """
+    stack = getattr(_local, "stack", None)
+    if not stack:
+        yield Span(name, attributes=attributes)
+        return
+    recorded = Span(name, stack[-1], attributes)
+    _local.spans.append(recorded)
+    stack.append(recorded)
+    try:
+        yield recorded
+    except Exception as e:
+        recorded.set(error=type(e).__name__)
+        raise
+    finally:
+        recorded.end_ns = time.time_ns()
+        stack.pop()
+
+
+def payload_bytes(data):
+    # JSON size of a response; only computed in detailed mode since it costs a serialization
+    return len(json.dumps(data, default=str)) if detailed() else None
+
+
+class TracedQuery:
+    """Wraps a query builder so ``execute()`` is recorded as a ``db.<action> <table>`` span."""
+
+    ACTIONS = ("select", "insert", "update", "upsert", "delete")
+
+    def __init__(self, query, table, action="select"):
+        self._query = query
+        self._table = table
+        self._action = action
+
+    def __getattr__(self, name):
+        attribute = getattr(self._query, name)
+        if not callable(attribute):
+            return attribute
+
+        def call(*args, **kwargs):
+            result = attribute(*args, **kwargs)
+            if hasattr(result, "execute"):
+                return type(self)(result, self._table, name if name in self.ACTIONS else self._action)
+            return result
+
+        return call
+
+    def execute(self):
+        with span(f"db.{self._action} {self._table}", table=self._table) as recorded:
+            response = self._query.execute()
+            data = response.data
+            recorded.set(rows=len(data) if isinstance(data, list) else int(data is not None))
+            size = payload_bytes(data)
+            if size is not None:
+                recorded.set(bytes=size)
+            return response
+
+
+class AsyncTracedQuery(TracedQuery):
+    """Async ``TracedQuery``. Spans are kept on ``.span`` rather than recorded,
+    since the query runs on another thread; the caller attaches them."""
+
+    span = None
+
+    async def execute(self):
+        self.span = recorded = Span(f"db.{self._action} {self._table}", attributes={"table": self._table})
+        try:
+            response = await self._query.execute()
+        except Exception as e:
+            recorded.set(error=type(e).__name__)
+            raise
+        finally:
+            recorded.end_ns = time.time_ns()
+        data = response.data
+        recorded.set(rows=len(data) if isinstance(data, list) else int(data is not None))
+        return response
+
+
+class TracedAuth:
+    def __init__(self, auth):
+        self._auth = auth
+
+    def __getattr__(self, name):
+        attribute = getattr(self._auth, name)
+        if not callable(attribute):
+            return attribute
+
+        def call(*args, **kwargs):
+            with span(f"auth.{name}"):
+                return attribute(*args, **kwargs)
+
+        return call
+
+
+class TracedClient:
+    """Storage client wrapper recording every query and auth call of the current rerun."""
+
+    def __init__(self, client):
+        self._client = client
+        self.auth = TracedAuth(client.auth)
+
+    def __getattr__(self, name):
+        return getattr(self._client, name)
+
+    def table(self, name):
+        return TracedQuery(self._client.table(name), name)
+
+    def rpc(self, name, params=None):
+        return TracedQuery(self._client.rpc(name, params or {}), name, "rpc")
+
+
+class AsyncTracedClient:
+    def __init__(self, client):
+        self._client = client
+
+    def __getattr__(self, name):
+        return getattr(self._client, name)
+
+    def table(self, name):
+        return AsyncTracedQuery(self._client.table(name), name)
+
+
+def plotly_chart(fig, **kwargs):
+    """``st.plotly_chart`` recorded as a ``chart <title>`` span with its point count."""
+    title = fig.layout.title.text or "untitled"
+    points = sum(len(trace.x) for trace in fig.data if getattr(trace, "x", None) is not None)
+    with span(f"chart {title}", points=points) as recorded:
+        st.plotly_chart(fig, **kwargs)
+        if detailed():
+            recorded.set(bytes=len(fig.to_json()))
@@ -1,12 +1,78 @@
 import streamlit as st
-import pandas as pd
-import plotly.express as px
-from logic import User, generate_uuid
-from database import supabase # Import the supabase client
-import bcrypt
+from lazy import lazy_import
+from logic import CATEGORIES, TRANSACTION_TYPES, User, Transaction, TransactionRepository, generate_uuid
+from database import supabase, async_database, create_snapshot_cache, get_setting # Import the supabase client
+from budgets import ALL, KINDS, Budget, BudgetEngine, month_of
+from jobs import CANCELLED, DONE, create_job_runner
+import security
 from datetime import date  # Import date
-from statsmodels.tsa.arima.model import ARIMA
-import io
+from tracing import fragment, plotly_chart, span
+
+# Analytics modules are imported on first use, so the sign-in page never loads them
+pd = lazy_import("pandas")
+px = lazy_import("plotly.express")
+charts = lazy_import("charts")
+data_io = lazy_import("data_io")
+forecasting = lazy_import("forecasting")
+
+# Budgets and savings goals, evaluated against running totals the repository patches on every write
+budget_engine = BudgetEngine(
+    supabase, reconcile_interval=float(get_setting("BUDGET_RECONCILE_SECONDS", 300)), async_database=async_database
+)
+
+# Shared, session-cached access to the 'transactions' table
+transaction_repository = TransactionRepository(
+    supabase, async_database=async_database, snapshots=create_snapshot_cache(), budgets=budget_engine
+)
+
+# Forecast fits, exports and full-history loads run here, off the script thread,
+# and their results are kept for later reruns (see jobs.py)
+job_runner = create_job_runner()
+JOB_WAIT_SECONDS = 0.25
+JOB_POLL_SECONDS = 0.5
+HISTORY_PREVIEW_ROWS = 50
+# How far ahead the Analysis page projects recurring charges
+RECURRING_HORIZON_DAYS = 30
+SEARCH_PAGE_SIZE = 25
+
+
+def follow_job(job, label):
+    """Show a background job's progress until it is done; returns whether it is.
+
+    Quick jobs are simply waited for. Otherwise a small section polls the job
+    every JOB_POLL_SECONDS, with a Cancel button, and reruns the app once the
+    job is done so that the page renders the result.
+    """
+    if job.wait(JOB_WAIT_SECONDS):
+        return True
+
+    # Not traced: it reruns every JOB_POLL_SECONDS and only reads the job's progress
+    @st.fragment(run_every=JOB_POLL_SECONDS)
+    def poll():
+        if job.done:
+            st.rerun()
+        st.progress(job.progress, text=job.message or label)
+        st.button("Cancel", key=f"cancel_{job.key[1]}", on_click=job.cancel)
+
+    # In a container of its own, so every call gets its own fragment
+    with st.container():
+        poll()
+    return False
+
+
+def show_budget_alerts(user_id):
+    # Limits and goals crossed by this session's inserts and deletes
+    for alert in budget_engine.pop_alerts(user_id):
+        st.toast(alert.message, icon="🎯" if alert.level == "reached" else "⚠️")
+
+
+def job_outcome(job, what, retry):
+    """Error or cancellation notice of a finished job that did not succeed, with a Retry button."""
+    if job.status == CANCELLED:
+        st.info(f"{what} cancelled.")
+    else:
+        st.error(f"{what} failed: {job.error}")
+    st.button("Retry", key=f"retry_{job.key[1]}", on_click=retry)
 
 
 class AuthPage:
@@ -45,8 +111,16 @@ class AuthPage:
                         else:
                             st.success("Logged in")
                             user_id = res.user.id
-                            # Get user data from 'users' table
-                            user_data = supabase.table("users").select("*").eq("id", user_id).single().execute().data
+                            # Get user data from 'users' table, loading the dashboard totals at the same time
+                            profile, = transaction_repository.prefetch(
+                                user_id, "cube",
+                                extra=[lambda client: client.table("users").select("*").eq("id", user_id).single()],
+                            )
+                            user_data = profile.data
+                            # Returning visits with this token skip the password check and the lookup above
+                            security.remember_profile(user_data)
+                            st.session_state.session_token = security.issue_token(user_id)
+                            st.session_state.pop("signed_out", None)
                             st.session_state.user = user_data
                             st.session_state.page = "Dashboard"  # Set the page to Dashboard after login
                             st.rerun() 
@@ -66,9 +140,8 @@ class AuthPage:
                     res = supabase.auth.sign_up({"email": email, "password": password})
 
                     if res.user:
-                        # Hash the password before storing it
-                        salt = bcrypt.gensalt()
-                        hashed_password = bcrypt.hashpw(password.encode('utf-8'), salt).decode('utf-8')
+                        # Hash the password before storing it (on the bounded bcrypt pool)
+                        hashed_password = security.hash_password(password)
 
                         # Convert created_at to ISO 8601 string format
                         created_at_iso = res.user.created_at.isoformat() if res.user.created_at else None
@@ -118,17 +191,19 @@ class DashboardPage:
 
         st.subheader(f"Welcome, {user.username}!")
 
-        # Get transactions
-        res = supabase.table("transactions").select("*").eq("user_id", user.id).execute()
-        df = pd.DataFrame(res.data)
+        # A date x category x type cube, built from the local frame when this session
+        # or a snapshot has one, otherwise from per-day totals summed by the database;
+        # every card, table and chart below is a roll-up of it
+        with span("dashboard.cube"):
+            cube = transaction_repository.cube(user.id)
 
-        if df.empty:
+        if cube.empty:
             st.info("No transactions yet.")
             return
 
         # Total income & expense
-        income = df[df["transaction_type"] == "income"]["amount"].sum()
-        expense = df[df["transaction_type"] == "expense"]["amount"].sum()
+        income = cube.total("income")
+        expense = cube.total("expense")
         savings = income - expense  # Calculate savings
         
         # Create a grid layout for cards
@@ -183,70 +258,93 @@ class DashboardPage:
         # Add another horizontal line
         st.markdown("---")
 
-        # Interactive line chart for income and expense trends using Plotly
-        df['date'] = pd.to_datetime(df['date'])
-        df_grouped = df.groupby(["date", "transaction_type"])["amount"].sum().reset_index()
-        st.markdown("### Income and Expense Trends")
-        fig = px.line(
-            df_grouped, x="date", y="amount", color="transaction_type",
-            labels={"amount": "Amount", "date": "Date", "transaction_type": "Transaction Type"},
-            title="Income and Expense Trends"
-        )
-        st.plotly_chart(fig, use_container_width=True)
-
-        # Add another horizontal line
-        st.markdown("---")
+        # Trend charts rerun on their own when the range slider moves
+        self.render_trends(cube)
 
         # Heatmaps for total income and expense using Plotly
         st.markdown("### Heatmaps")
         col3, col4 = st.columns(2)
         with col3:
             st.markdown("#### Income Heatmap")
-            income_heatmap = df[df["transaction_type"] == "income"].pivot_table(
-                index="category", columns="date", values="amount", aggfunc="sum", fill_value=0
-            )
-            fig = px.imshow(
-                income_heatmap, labels=dict(x="Date", y="Category", color="Amount"),
-                title="Income Heatmap", color_continuous_scale="Blues"
-            )
-            st.plotly_chart(fig, use_container_width=True)
+            income_rows = cube.cells("income")
+            # Bucket size adapts to the date span so the matrix stays small
+            with span("dashboard.heatmap", transaction_type="income", rows=len(income_rows)):
+                income_heatmap, resolution = charts.heatmap_matrix(income_rows["date"], income_rows["category"], income_rows["amount"])
+            if income_heatmap.empty:
+                st.info("No income data.")
+            else:
+                fig = px.imshow(
+                    income_heatmap, labels=dict(x=resolution, y="Category", color="Amount"),
+                    title="Income Heatmap", color_continuous_scale="Blues"
+                )
+                plotly_chart(fig, use_container_width=True)
 
         with col4:
             st.markdown("#### Expense Heatmap")
-            expense_heatmap = df[df["transaction_type"] == "expense"].pivot_table(
-                index="category", columns="date", values="amount", aggfunc="sum", fill_value=0
-            )
-            fig = px.imshow(
-                expense_heatmap, labels=dict(x="Date", y="Category", color="Amount"),
-                title="Expense Heatmap", color_continuous_scale="Reds"
-            )
-            st.plotly_chart(fig, use_container_width=True)
+            expense_rows = cube.cells("expense")
+            # Bucket size adapts to the date span so the matrix stays small
+            with span("dashboard.heatmap", transaction_type="expense", rows=len(expense_rows)):
+                expense_heatmap, resolution = charts.heatmap_matrix(expense_rows["date"], expense_rows["category"], expense_rows["amount"])
+            if expense_heatmap.empty:
+                st.info("No expense data.")
+            else:
+                fig = px.imshow(
+                    expense_heatmap, labels=dict(x=resolution, y="Category", color="Amount"),
+                    title="Expense Heatmap", color_continuous_scale="Reds"
+                )
+                plotly_chart(fig, use_container_width=True)
 
         # Add another horizontal line
         st.markdown("---")
 
         # Interactive bar chart for category-wise comparison using Plotly
         st.markdown("### Category-wise Comparison")
-        category_comparison = df.groupby(["category", "transaction_type"])["amount"].sum().reset_index()
+        category_comparison = cube.by_category()[["category", "transaction_type", "amount"]]
         fig = px.bar(
             category_comparison, x="category", y="amount", color="transaction_type",
             labels={"amount": "Amount", "category": "Category", "transaction_type": "Transaction Type"},
             title="Category-wise Comparison"
         )
-        st.plotly_chart(fig, use_container_width=True)
+        plotly_chart(fig, use_container_width=True)
+
+        # Add another horizontal line
+        st.markdown("---")
+
+    @fragment
+    def render_trends(self, cube):
+        # Date range for the trend charts; each line is downsampled to a fixed
+        # point budget, so narrowing the range shows it at higher resolution
+        first_day, last_day = cube.dates[0].date(), cube.dates[-1].date()
+        chart_start, chart_end = first_day, last_day
+        if first_day < last_day:
+            chart_start, chart_end = st.slider(
+                "Chart Range", min_value=first_day, max_value=last_day, value=(first_day, last_day), key="dashboard_chart_range"
+            )
+        trend_cube = cube.between(chart_start, chart_end)
+
+        # Interactive line chart for income and expense trends using Plotly
+        with span("dashboard.trends", days=len(trend_cube.dates)):
+            df_grouped = charts.downsample_lines(trend_cube.by_date("transaction_type"), "date", "amount", color="transaction_type")
+        st.markdown("### Income and Expense Trends")
+        fig = px.line(
+            df_grouped, x="date", y="amount", color="transaction_type",
+            labels={"amount": "Amount", "date": "Date", "transaction_type": "Transaction Type"},
+            title="Income and Expense Trends"
+        )
+        plotly_chart(fig, use_container_width=True)
 
         # Add another horizontal line
         st.markdown("---")
 
         # Category Trends
         st.markdown("### Category Trends")
-        category_trends = df.groupby(["date", "category"])["amount"].sum().reset_index()
+        category_trends = charts.downsample_lines(trend_cube.by_date("category"), "date", "amount", color="category")
         fig = px.line(
             category_trends, x="date", y="amount", color="category",
             labels={"amount": "Amount", "date": "Date", "category": "Category"},
             title="Category Trends Over Time"
         )
-        st.plotly_chart(fig, use_container_width=True)
+        plotly_chart(fig, use_container_width=True)
 
         # Add another horizontal line
         st.markdown("---")
@@ -259,59 +357,185 @@ class TransactionPage:
         st.markdown("### Add a New Transaction")
         with st.form("add_tx"):
             amount = st.number_input("Amount", min_value=0.0, format="%.2f")
-            category = st.selectbox("Category", ["Food", "Transport", "Entertainment", "Utilities", "Health", "Education", "Salary", "Investment", "Other"])
+            category = st.selectbox("Category", CATEGORIES)
             detail = st.text_input("Detail")
-            t_type = st.selectbox("Type", ["income", "expense"])
+            t_type = st.selectbox("Type", TRANSACTION_TYPES)
             t_date = st.date_input("Date", value=date.today())
             submitted = st.form_submit_button("Add Transaction")
 
             if submitted:
-                supabase.table("transactions").insert({
-                    "id": generate_uuid(),
-                    "user_id": user.id,
-                    "amount": amount,
-                    "category": category,
-                    "detail": detail,
-                    "transaction_type": t_type,
-                    "date": t_date.isoformat()
-                }).execute()
+                transaction_repository.add(
+                    Transaction(generate_uuid(), user.id, amount, category, detail, t_type, t_date)
+                )
+                st.session_state.tx_pagination_key = None
                 st.success("Transaction Added")
+                show_budget_alerts(user.id)
+
+        # Bulk Import
+        st.markdown("### Import Transactions")
+        uploaded = st.file_uploader("Upload a CSV, Excel or bank statement (OFX/QFX) file", type=data_io.IMPORT_FORMATS)
+        col1, col2 = st.columns(2)
+        with col1:
+            batch_size = st.number_input("Rows per Batch", min_value=50, max_value=5000, value=data_io.IMPORT_BATCH_SIZE, step=50)
+        with col2:
+            max_workers = st.number_input("Parallel Requests", min_value=1, max_value=8, value=data_io.IMPORT_MAX_WORKERS)
+        if uploaded is not None and st.button("Import"):
+            status = st.empty()
+            with span("transactions.import", file=uploaded.name, bytes=uploaded.size) as import_span:
+                report = data_io.import_transactions(
+                    transaction_repository, user.id, uploaded, uploaded.name,
+                    batch_size=int(batch_size), max_workers=int(max_workers),
+                    progress=lambda r: status.text(f"Read {r.rows_read} rows ({r.rows_per_second:,.0f} rows/s)..."),
+                )
+                import_span.set(rows=report.inserted)
+            status.empty()
+            st.session_state.tx_pagination_key = None
+            st.success(
+                f"Imported {report.inserted} of {report.rows_read} rows in {report.seconds:.1f}s "
+                f"({report.rows_per_second:,.0f} rows/s). "
+                f"Skipped {report.duplicates} duplicates and {report.rejected} invalid rows."
+            )
+            for batch, message in report.errors:
+                st.error(f"Batch {batch} failed: {message}")
+            show_budget_alerts(user.id)
+
+        # Add a horizontal line
+        st.markdown("---")
+
+        # Searching and paging through results rerun on their own
+        self.render_search(user.id)
 
         # Add a horizontal line
         st.markdown("---")
 
+        # Filters, paging, delete and export rerun on their own (see render_transactions)
+        self.render_transactions(user.id)
+
+    @fragment
+    def render_search(self, user_id):
+        st.markdown("### Search Transactions")
+        query = st.text_input("Search Details", placeholder="e.g. netflix", key="search_query")
+        col1, col2, col3 = st.columns(3)
+        with col1:
+            category = st.selectbox("Category", ["All"] + CATEGORIES, key="search_category")
+        with col2:
+            min_amount = st.number_input("Min Amount", min_value=0.0, value=None, format="%.2f", key="search_min_amount")
+        with col3:
+            max_amount = st.number_input("Max Amount", min_value=0.0, value=None, format="%.2f", key="search_max_amount")
+        if not query.strip() and category == "All" and min_amount is None and max_amount is None:
+            return
+        filters = dict(
+            query=query.strip(),
+            category=None if category == "All" else category,
+            min_amount=min_amount,
+            max_amount=max_amount,
+        )
+
+        # Results are ranked, so pages are numbered; back to the first one when the search changes
+        search_key = tuple(filters.values())
+        if st.session_state.get("search_key") != search_key:
+            st.session_state.search_key = search_key
+            st.session_state.search_page = 0
+        page = st.session_state.search_page
+
+        with span("transactions.search") as search_span:
+            frame, total = transaction_repository.search(user_id, page=page, page_size=SEARCH_PAGE_SIZE, **filters)
+            search_span.set(rows=total)
+        if not total:
+            st.info("No matching transactions.")
+            return
+
+        df = frame.to_pandas()
+        first_row = page * SEARCH_PAGE_SIZE
+        st.caption(f"Showing {first_row + 1}-{first_row + len(df)} of {total} matches, best first")
+        display_df = df[['date', 'detail', 'category', 'transaction_type', 'amount']].copy()
+        display_df['amount'] = display_df['amount'].apply(lambda x: f"${x:,.2f}")
+        st.dataframe(display_df, hide_index=True)
+
+        def turn(step):
+            st.session_state.search_page += step
+
+        col1, col2 = st.columns(2)
+        with col1:
+            if page > 0:
+                st.button("Previous Results", on_click=turn, args=(-1,))
+        with col2:
+            if first_row + len(df) < total:
+                st.button("Next Results", on_click=turn, args=(1,))
+
+        labels = {
+            row.id: f"{row.date:%Y-%m-%d} · {row.detail or row.category} · ${row.amount:,.2f}"
+            for row in df.itertuples()
+        }
+        selected_id = st.selectbox("Select a Result to Delete", ["None"] + list(labels), format_func=lambda i: labels.get(i, i))
+        if selected_id != "None" and st.button("Delete Result"):
+            transaction_repository.delete(user_id, selected_id)
+            st.session_state.search_key = None
+            st.session_state.tx_pagination_key = None
+            st.session_state.tx_notice = "Transaction Deleted"
+            # A full rerun, so the transactions list below drops the row too
+            st.rerun()
+
+    @fragment
+    def render_transactions(self, user_id):
         # Filter Transactions
         st.markdown("### Filter Transactions")
         start_date = st.date_input("Start Date", value=date.today().replace(day=1))
         end_date = st.date_input("End Date", value=date.today())
-        selected_category = st.selectbox("Filter by Category", ["All"] + ["Food", "Transport", "Entertainment", "Utilities", "Health", "Education", "Salary", "Investment", "Other"])
-        selected_type = st.selectbox("Filter by Type", ["All", "income", "expense"])
-
-        # Fetch transactions
-        res = supabase.table("transactions").select("*").eq("user_id", user.id).execute()
-        df = pd.DataFrame(res.data)
-
-        if not df.empty:
-            # Apply filters
-            df['date'] = pd.to_datetime(df['date'])
-            df = df[(df['date'] >= pd.Timestamp(start_date)) & (df['date'] <= pd.Timestamp(end_date))]
-            if selected_category != "All":
-                df = df[df['category'] == selected_category]
-            if selected_type != "All":
-                df = df[df['transaction_type'] == selected_type]
-
+        selected_category = st.selectbox("Filter by Category", ["All"] + CATEGORIES)
+        selected_type = st.selectbox("Filter by Type", ["All"] + TRANSACTION_TYPES)
+
+        # Filters are applied by the database; only the current page is fetched
+        filters = dict(
+            start_date=start_date,
+            end_date=end_date,
+            category=None if selected_category == "All" else selected_category,
+            transaction_type=None if selected_type == "All" else selected_type,
+        )
+        page_size = st.selectbox("Rows per Page", [25, 50, 100], index=1)
+
+        # Keyset pagination: keep a stack of page cursors, reset whenever the filters change
+        pagination_key = (start_date, end_date, selected_category, selected_type, page_size)
+        if st.session_state.get("tx_pagination_key") != pagination_key:
+            st.session_state.tx_pagination_key = pagination_key
+            st.session_state.tx_cursors = [None]
+            st.session_state.tx_total = None
+        cursors = st.session_state.tx_cursors
+
+        notice = st.session_state.pop("tx_notice", None)
+        if notice:
+            st.success(notice)
+        show_budget_alerts(user_id)
+
+        frame, total, next_cursor = transaction_repository.page(user_id, after=cursors[-1], page_size=page_size, **filters)
+        if total is not None:
+            st.session_state.tx_total = total
+        total = st.session_state.tx_total or 0
+
+        if total:
             # Display filtered transactions with the 'id' column
             st.markdown("### Transactions")
-            if df.empty:
-                st.info("No transactions found for the selected filters.")
-            else:
-                df['amount'] = df['amount'].apply(lambda x: f"${x:,.2f}")
-                st.dataframe(df[['id', 'date', 'category', 'transaction_type', 'amount', 'detail']])
+            with span("transactions.to_pandas", rows=len(frame)):
+                df = frame.to_pandas()
+            first_row = (len(cursors) - 1) * page_size
+            st.caption(f"Showing {first_row + 1}-{first_row + len(df)} of {total} transactions")
+            display_df = df[['id', 'date', 'category', 'transaction_type', 'amount', 'detail']].copy()
+            display_df['amount'] = display_df['amount'].apply(lambda x: f"${x:,.2f}")
+            st.dataframe(display_df)
+
+            # Button callbacks run before the section reruns, so no extra st.rerun() is needed
+            col1, col2 = st.columns(2)
+            with col1:
+                if len(cursors) > 1:
+                    st.button("Previous Page", on_click=cursors.pop)
+            with col2:
+                if next_cursor is not None:
+                    st.button("Next Page", on_click=cursors.append, args=(next_cursor,))
 
             # Add a horizontal line
             st.markdown("---")
 
-            # Select and delete transaction using 'id'
+            # Select and delete transaction using 'id' (from the current page)
             st.markdown("### Delete Transaction")
             selected_id = st.selectbox("Select Transaction ID to Delete", ["None"] + df["id"].tolist())
             if selected_id != "None":
@@ -320,39 +544,75 @@ class TransactionPage:
                 st.dataframe(selected_row)
 
                 if st.button("Delete"):
-                    supabase.table("transactions").delete().eq("id", selected_id).execute()
-                    st.success("Transaction Deleted")
-                    st.rerun()  # Refresh the page to update the table
+                    transaction_repository.delete(user_id, selected_id)
+                    st.session_state.search_key = None
+                    st.session_state.tx_pagination_key = None
+                    st.session_state.tx_notice = "Transaction Deleted"
+                    # A full rerun, so the search results above drop the row too
+                    st.rerun()
 
         else:
-            st.info("No transactions available.")
+            st.info("No transactions found for the selected filters.")
 
         # Add a horizontal line
         st.markdown("---")
 
         # New Functionality: Export Transactions
         st.markdown("### Export Transactions")
-        if not df.empty:
-            export_format = st.selectbox("Select Export Format", ["CSV", "Excel"])
+        if total:
+            formats = list(data_io.EXPORT_FORMATS)
+            export_format = st.selectbox(
+                "Select Export Format", formats, index=formats.index(data_io.default_export_format(total))
+            )
+            # Exports run as a background job into a temporary file, which stays
+            # downloadable until it is downloaded or the job expires
+            export_inputs = (export_format,) + tuple(filters.values())
+
+            def start_export():
+                job_runner.submit(
+                    user_id, "export", export_inputs, self.export, user_id, filters, export_format, total,
+                    fresh=True, cleanup=data_io.remove_export,
+                )
+
             if st.button("Export"):
-                if export_format == "CSV":
-                    csv = df.to_csv(index=False)
-                    st.download_button(
-                        label="Download CSV",
-                        data=csv,
-                        file_name="transactions.csv",
-                        mime="text/csv",
-                    )
-                elif export_format == "Excel":
-                    excel_buffer = io.BytesIO()
-                    with pd.ExcelWriter(excel_buffer, engine="xlsxwriter") as writer:
-                        df.to_excel(writer, index=False, sheet_name="Transactions")
-                    st.download_button(
-                        label="Download Excel",
-                        data=excel_buffer,
-                        file_name="transactions.xlsx",
-                        mime="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
-                    )
+                start_export()
+            job = job_runner.get(user_id, "export", export_inputs)
+            if job is not None and follow_job(job, f"Exporting {total} transactions..."):
+                if job.status == DONE:
+                    self.render_download(job, export_format, lambda: job_runner.discard(user_id, "export", export_inputs))
+                else:
+                    job_outcome(job, "Export", start_export)
+
+    @staticmethod
+    def render_download(job, export_format, downloaded):
+        extension, mime = data_io.EXPORT_FORMATS[export_format]
+        if job.result is None:
+            return  # downloaded, e.g. in another tab
+        try:
+            exported_file = open(job.result, "rb")
+        except FileNotFoundError:
+            return
+        with exported_file:
+            st.download_button(
+                label=f"Download {export_format}",
+                data=exported_file,
+                file_name=f"transactions.{extension}",
+                mime=mime,
+                on_click=downloaded,
+            )
+
+    def export(self, job, user_id, filters, export_format, total):
+        # Runs on a job worker; the file is built one keyset page at a time
+        exported = 0
+
+        def pages():
+            nonlocal exported
+            for page in transaction_repository.iter_pages(user_id, page_size=data_io.EXPORT_PAGE_SIZE, **filters):
+                exported += len(page)
+                job.report(exported / total, f"Exported {exported:,} of {total:,} transactions...")
+                yield page
+
+        return data_io.export_to_file(pages(), export_format)
 
 class AnalysisPage:
     def render(self, user: User):
@@ -366,21 +626,94 @@ class AnalysisPage:
             unsafe_allow_html=True
         )
 
-        # Fetch transactions
-        res = supabase.table("transactions").select("*").eq("user_id", user.id).execute()
-        df = pd.DataFrame(res.data)
+        # Fetch per-day totals by category and type; the trends and forecasts
+        # below only need daily sums, which the database computes. The table at
+        # the bottom needs every transaction, which loads in the background
+        transaction_repository.prefetch(user.id, "daily_totals", "category_totals")
+        df = transaction_repository.daily_totals(user.id)
 
         if df.empty:
             st.info("No transaction data.")
             return
 
-        df['date'] = pd.to_datetime(df['date'])
-        df.set_index('date', inplace=True)
-        df = df.sort_index()
+        df = df.set_index('date').sort_index()
+        category_totals = transaction_repository.category_totals(user.id)
+
+        # Add a horizontal line
+        st.markdown("---")
+
+        # Filters and trend charts rerun on their own when a filter changes
+        self.render_trends(df)
+
+        # Add a horizontal line
+        st.markdown("---")
+
+        # The forecast controls only rerun the forecasting section; fits are memoized
+        self.render_forecasts(df, user.id)
+
+        # Add a horizontal line
+        st.markdown("---")
+
+        # Pie Chart for Transaction Distribution
+        st.markdown("### Transaction Distribution")
+        transaction_distribution = category_totals.groupby("transaction_type")["amount"].sum().reset_index()
+        fig = px.pie(
+            transaction_distribution, values="amount", names="transaction_type",
+            title="Transaction Distribution by Type",
+            color_discrete_sequence=px.colors.sequential.RdBu
+        )
+        plotly_chart(fig, use_container_width=True)
+
+        # Add a horizontal line
+        st.markdown("---")
+
+        # Detailed Table for Transactions
+        st.markdown("### Detailed Transactions Table")
+        self.render_history(user.id)
+
+        # Add a horizontal line
+        st.markdown("---")
+
+        # Subscriptions, rent, salary... found in the full history
+        st.markdown("### Recurring Payments")
+        self.render_recurring(user.id)
+
+        # Add a horizontal line
+        st.markdown("---")
+
+        # Comparison of Income and Expense by Category
+        st.markdown("### Income vs Expense by Category")
+
+        category_comparison = category_totals.groupby(["category", "transaction_type"])["amount"].sum().unstack(fill_value=0).reset_index()
+
+        if 'income' in category_comparison.columns and 'expense' in category_comparison.columns:
+            category_comparison["Net"] = category_comparison["income"] - category_comparison["expense"]
+        elif 'expense' in category_comparison.columns:
+            category_comparison["Net"] = -category_comparison["expense"]
+        elif 'income' in category_comparison.columns:
+            category_comparison["Net"] = category_comparison["income"]
+        else:
+            numeric_cols = category_comparison.select_dtypes(include='number').columns
+            category_comparison["Net"] = category_comparison[numeric_cols].sum(axis=1)
+
+        st.dataframe(category_comparison, use_container_width=True)
 
         # Add a horizontal line
         st.markdown("---")
 
+        # Bar Chart for Net Balance by Category
+        st.markdown("### Net Balance by Category")
+        fig = px.bar(
+            category_comparison, x="category", y="Net",
+            labels={"Net": "Net Balance", "category": "Category"},
+            title="Net Balance by Category",
+            color="Net",
+            color_continuous_scale=px.colors.sequential.Viridis
+        )
+        plotly_chart(fig, use_container_width=True)
+
+    @fragment
+    def render_trends(self, df):
         # User interface for filtering
         st.markdown("### Filter Transactions for Analysis")
         transaction_types = df['transaction_type'].unique().tolist()
@@ -391,11 +724,12 @@ class AnalysisPage:
         end_date = st.date_input("End Date", value=df.index.max().date())
 
         # Apply filters
-        filtered_df = df[(df.index >= pd.Timestamp(start_date)) & (df.index <= pd.Timestamp(end_date))]
-        if selected_type != "All":
-            filtered_df = filtered_df[filtered_df['transaction_type'] == selected_type]
-        if selected_category != "All":
-            filtered_df = filtered_df[filtered_df['category'] == selected_category]
+        with span("analysis.filter", rows=len(df)):
+            filtered_df = df[(df.index >= pd.Timestamp(start_date)) & (df.index <= pd.Timestamp(end_date))]
+            if selected_type != "All":
+                filtered_df = filtered_df[filtered_df['transaction_type'] == selected_type]
+            if selected_category != "All":
+                filtered_df = filtered_df[filtered_df['category'] == selected_category]
 
         if filtered_df.empty:
             st.warning("No data available for the selected filters.")
@@ -411,6 +745,7 @@ class AnalysisPage:
             st.warning("Not enough data to display transaction trends.")
         else:
             daily_df = daily.reset_index()  # Reset index to get 'date' as a column
+            daily_df = charts.downsample_lines(daily_df, 'date', 'amount')
             fig = px.line(
                 daily_df,  # Use the daily DataFrame
                 x='date', 
@@ -418,7 +753,7 @@ class AnalysisPage:
                 labels={"date": "Date", "amount": "Amount"},
                 title="Transaction Trends"
             )
-            st.plotly_chart(fig, use_container_width=True)
+            plotly_chart(fig, use_container_width=True)
 
         # Add a horizontal line
         st.markdown("---")
@@ -443,20 +778,92 @@ class AnalysisPage:
             # Fix: assign name to index so reset_index gives column 'date'
             income_expense_df.index.name = "date"
             income_expense_df = income_expense_df.reset_index()
+            income_expense_df = charts.downsample_lines(income_expense_df, 'date', ["income", "expense"])
 
             fig = px.line(
                 income_expense_df,
                 x='date',
-                y=["income", "expense"],
+                y='value',
+                color='variable',
                 labels={"value": "Amount", "date": "Date", "variable": "Transaction Type"},
                 title="Income vs Expense Trends"
             )
-            st.plotly_chart(fig, use_container_width=True)
+            plotly_chart(fig, use_container_width=True)
+
+
+    def render_history(self, user_id):
+        # A first visit loads the whole history on a job worker; the latest page is shown meanwhile
+        if not transaction_repository.has_frame(user_id):
+            # A finished load may be minutes old; frame() below syncs what changed since
+            job = job_runner.submit(user_id, "history", (), self.load_history, user_id)
+            if not follow_job(job, "Loading the full transaction history..."):
+                preview, _, _ = transaction_repository.page(user_id, page_size=HISTORY_PREVIEW_ROWS)
+                st.caption(f"The latest {len(preview)} transactions; the full history is loading.")
+                st.dataframe(preview.to_pandas().set_index('date'), use_container_width=True)
+                return
+            if job.status != DONE:
+                job_outcome(job, "Loading the transaction history", lambda: job_runner.submit(
+                    user_id, "history", (), self.load_history, user_id, fresh=True
+                ))
+                return
+            transaction_repository.adopt_frame(user_id, *job.result)
+
+        with span("analysis.table") as table_span:
+            transactions_df = transaction_repository.frame(user_id).to_pandas().set_index('date').sort_index()
+            table_span.set(rows=len(transactions_df))
+        st.dataframe(transactions_df, use_container_width=True)
+
+    def render_recurring(self, user_id):
+        if not transaction_repository.has_frame(user_id):
+            st.caption("Shown once the full transaction history has loaded.")
+            return
+        with span("analysis.recurring") as recurring_span:
+            index = transaction_repository.recurring(user_id)
+            series = index.recurring()
+            upcoming = index.upcoming(RECURRING_HORIZON_DAYS)
+            recurring_span.set(rows=index.rows, series=len(series))
+        if series.empty:
+            st.info("No recurring transactions found yet.")
+            return
+
+        active = series[series["active"]]
+        expenses = upcoming[upcoming["transaction_type"] == "expense"]["amount"].sum()
+        col1, col2 = st.columns(2)
+        col1.metric("Active Recurring Payments", len(active))
+        col2.metric(f"Due in the Next {RECURRING_HORIZON_DAYS} Days", f"${expenses:,.2f}")
+
+        if not upcoming.empty:
+            st.markdown("#### Upcoming")
+            st.dataframe(upcoming.set_index("date"), use_container_width=True)
+        st.markdown("#### All Recurring Series")
+        st.dataframe(
+            series.drop(columns="every_days").set_index("detail"), use_container_width=True,
+            column_config={
+                "average_amount": st.column_config.NumberColumn("Average", format="$%.2f"),
+                "last_amount": st.column_config.NumberColumn("Last", format="$%.2f"),
+                "active": st.column_config.CheckboxColumn("Active"),
+            },
+        )
 
+    @staticmethod
+    def load_history(job, user_id):
+        # Job threads have no session state; the script thread adopts the result
+        job.report(message="Loading the full transaction history...")
+        return transaction_repository.fetch_frame(user_id)
 
-        # Add a horizontal line
-        st.markdown("---")
+    @staticmethod
+    def fit_models(job, series_by_name, aggregation_level, model_name):
+        # Runs on a job worker; fits finished so far are shown while the others run
+        fitted = {}
 
+        def on_fit(name, result):
+            fitted[name] = result
+            job.report(len(fitted) / len(series_by_name), f"Fitted the {name} forecast...", partial=dict(fitted))
+
+        return forecasting.fit_forecasts(series_by_name, aggregation_level, model_name, on_fit=on_fit)
+
+    @fragment
+    def render_forecasts(self, df, user_id):
         # Forecasting for income and expense
         st.markdown("### Forecasting")
         aggregation_level = st.selectbox("Aggregation Level", ["Daily", "Weekly", "Monthly"], key="aggregation_level")
@@ -470,17 +877,36 @@ class AnalysisPage:
             max_forecast_days = 6  # Approximately 6 months
 
         forecast_days = st.slider("Days to Forecast", 1, max_forecast_days, 7, key="forecast_days")
+        forecast_model = st.selectbox("Forecast Model", [forecasting.AUTO] + list(forecasting.MODELS), key="forecast_model",
+                                      help="Auto picks the model with the lowest error in a rolling backtest among "
+                                           "ARIMA, Holt and seasonal naive, plus Croston when a quarter or more of the periods are empty.")
 
         # Resample data based on aggregation level
-        if aggregation_level == "Weekly":
-            resampled_income = df[df['transaction_type'] == 'income'].resample('W').sum(numeric_only=True)['amount']
-            resampled_expense = df[df['transaction_type'] == 'expense'].resample('W').sum(numeric_only=True)['amount']
-        elif aggregation_level == "Monthly":
-            resampled_income = df[df['transaction_type'] == 'income'].resample('M').sum(numeric_only=True)['amount']
-            resampled_expense = df[df['transaction_type'] == 'expense'].resample('M').sum(numeric_only=True)['amount']
-        else:  # Daily
-            resampled_income = df[df['transaction_type'] == 'income'].resample('D').sum(numeric_only=True)['amount']
-            resampled_expense = df[df['transaction_type'] == 'expense'].resample('D').sum(numeric_only=True)['amount']
+        freq = forecasting.FREQUENCIES[aggregation_level]
+        with span("analysis.resample", frequency=freq):
+            resampled_income = df[df['transaction_type'] == 'income'].resample(freq).sum(numeric_only=True)['amount']
+            resampled_expense = df[df['transaction_type'] == 'expense'].resample(freq).sum(numeric_only=True)['amount']
+
+        # Fit both models (slow backends concurrently) in a background job keyed
+        # by the resampled data; fits are memoized on it, so reruns (e.g. moving
+        # the slider) only call forecast()
+        series_by_name = {name: series for name, series in [("income", resampled_income), ("expense", resampled_expense)] if len(series) >= 2}
+        with span("analysis.forecast_fit", model=forecast_model):
+            fit_inputs = tuple(
+                forecasting.series_key(series, aggregation_level, forecast_model) for series in series_by_name.values()
+            ) + tuple(series_by_name)
+
+            def start_fit(fresh=False):
+                return job_runner.submit(
+                    user_id, "forecast", fit_inputs, self.fit_models,
+                    series_by_name, aggregation_level, forecast_model, fresh=fresh,
+                )
+
+            job = start_fit()
+            if follow_job(job, "Fitting forecast models..."):
+                if job.status != DONE:
+                    job_outcome(job, "Forecasting", lambda: start_fit(fresh=True))
+        model_fits = job.result if job.status == DONE else dict(job.partial or {})
 
         col1, col2 = st.columns(2)
 
@@ -489,19 +915,25 @@ class AnalysisPage:
             st.markdown("#### Income Forecast")
             if len(resampled_income) < 2:
                 st.warning("Not enough income data to perform forecasting.")
+            elif "income" not in model_fits:
+                st.info("Fitting the income model..." if not job.done else "No income forecast.")
             else:
                 try:
-                    model_income = ARIMA(resampled_income, order=(1, 1, 1))
-                    model_fit_income = model_income.fit()
-                    forecast_income = model_fit_income.forecast(steps=forecast_days)
-                    forecast_income.index = pd.date_range(resampled_income.index[-1] + pd.Timedelta(days=1), periods=forecast_days, freq='D')
+                    model_fit_income = model_fits["income"]
+                    if isinstance(model_fit_income, Exception):
+                        raise model_fit_income
+                    forecast_income = pd.Series(
+                        model_fit_income.forecast(forecast_days),
+                        index=forecasting.forecast_index(resampled_income.index, forecast_days),
+                    )
 
                     # Plot forecast
                     fig = px.line()
                     fig.add_scatter(x=resampled_income.index, y=resampled_income.values, mode='lines', name='Historical Income')
                     fig.add_scatter(x=forecast_income.index, y=forecast_income.values, mode='lines', name='Forecast Income', line=dict(dash='dot'))
                     fig.update_layout(title="Income Forecast", xaxis_title="Date", yaxis_title="Amount")
-                    st.plotly_chart(fig, use_container_width=True)
+                    plotly_chart(fig, use_container_width=True)
+                    st.caption(f"Model: {model_fit_income.name}")
 
                 except Exception as e:
                     st.error(f"Income Forecasting failed: {e}")
@@ -511,76 +943,93 @@ class AnalysisPage:
             st.markdown("#### Expense Forecast")
             if len(resampled_expense) < 2:
                 st.warning("Not enough expense data to perform forecasting.")
+            elif "expense" not in model_fits:
+                st.info("Fitting the expense model..." if not job.done else "No expense forecast.")
             else:
                 try:
-                    model_expense = ARIMA(resampled_expense, order=(1, 1, 1))
-                    model_fit_expense = model_expense.fit()
-                    forecast_expense = model_fit_expense.forecast(steps=forecast_days)
-                    forecast_expense.index = pd.date_range(resampled_expense.index[-1] + pd.Timedelta(days=1), periods=forecast_days, freq='D')
+                    model_fit_expense = model_fits["expense"]
+                    if isinstance(model_fit_expense, Exception):
+                        raise model_fit_expense
+                    forecast_expense = pd.Series(
+                        model_fit_expense.forecast(forecast_days),
+                        index=forecasting.forecast_index(resampled_expense.index, forecast_days),
+                    )
 
                     # Plot forecast
                     fig = px.line()
                     fig.add_scatter(x=resampled_expense.index, y=resampled_expense.values, mode='lines', name='Historical Expense')
                     fig.add_scatter(x=forecast_expense.index, y=forecast_expense.values, mode='lines', name='Forecast Expense', line=dict(dash='dot'))
                     fig.update_layout(title="Expense Forecast", xaxis_title="Date", yaxis_title="Amount")
-                    st.plotly_chart(fig, use_container_width=True)
+                    plotly_chart(fig, use_container_width=True)
+                    st.caption(f"Model: {model_fit_expense.name}")
 
                 except Exception as e:
                     st.error(f"Expense Forecasting failed: {e}")
 
-        # Add a horizontal line
-        st.markdown("---")
 
-        # Pie Chart for Transaction Distribution
-        st.markdown("### Transaction Distribution")
-        transaction_distribution = df.groupby("transaction_type")["amount"].sum().reset_index()
-        fig = px.pie(
-            transaction_distribution, values="amount", names="transaction_type",
-            title="Transaction Distribution by Type",
-            color_discrete_sequence=px.colors.sequential.RdBu
+class BudgetPage:
+    def render(self, user: User):
+        st.markdown(
+            f"""
+            <div style="display: flex; align-items: center; gap: 10px;">
+                <img src="https://cdn-icons-png.flaticon.com/512/2942/2942269.png" style="width: 30px; height: 30px;">
+                <h2 style="margin: 0;">Budgets & Goals</h2>
+            </div>
+            """,
+            unsafe_allow_html=True
         )
-        st.plotly_chart(fig, use_container_width=True)
-
-        # Add a horizontal line
-        st.markdown("---")
 
-        # Detailed Table for Transactions
-        st.markdown("### Detailed Transactions Table")
-        st.dataframe(df, use_container_width=True)
+        # Statuses come from running monthly totals, not from re-summing the history
+        ledger = budget_engine.ledger(user.id)
+        current = month_of(date.today())
+        months = [current] + [month for month in ledger.months() if month != current]
+        month = st.selectbox("Month", months)
+
+        st.markdown("### Progress")
+        if not ledger.budgets:
+            st.info("No budgets or goals yet. Add one below.")
+        for status in ledger.statuses(month):
+            budget = status.budget
+            col1, col2 = st.columns([5, 1])
+            with col1:
+                verb = "saved" if budget.kind == "savings" else "spent"
+                st.progress(
+                    min(max(status.share, 0.0), 1.0),
+                    text=f"**{budget.label}**: ${status.value:,.2f} {verb} of ${budget.amount:,.2f} ({status.share:.0%})",
+                )
+                if status.level == "over":
+                    st.error(f"Over the limit by ${status.value - budget.amount:,.2f}")
+                elif status.level == "warning":
+                    st.warning("Close to the limit")
+                elif status.level == "reached":
+                    st.success("Goal reached")
+            with col2:
+                st.button("Delete", key=f"delete_budget_{budget.id}", on_click=budget_engine.delete_budget, args=(user.id, budget.id))
 
         # Add a horizontal line
         st.markdown("---")
 
-        # Comparison of Income and Expense by Category
-        st.markdown("### Income vs Expense by Category")
-
-        category_comparison = df.groupby(["category", "transaction_type"])["amount"].sum().unstack(fill_value=0).reset_index()
-
-        if 'income' in category_comparison.columns and 'expense' in category_comparison.columns:
-            category_comparison["Net"] = category_comparison["income"] - category_comparison["expense"]
-        elif 'expense' in category_comparison.columns:
-            category_comparison["Net"] = -category_comparison["expense"]
-        elif 'income' in category_comparison.columns:
-            category_comparison["Net"] = category_comparison["income"]
-        else:
-            numeric_cols = category_comparison.select_dtypes(include='number').columns
-            category_comparison["Net"] = category_comparison[numeric_cols].sum(axis=1)
-
-        st.dataframe(category_comparison, use_container_width=True)
+        st.markdown("### Add a Budget or Goal")
+        with st.form("add_budget", clear_on_submit=True):
+            kind = st.selectbox("Type", list(KINDS), format_func=KINDS.get)
+            category = st.selectbox("Category (spending limits only)", ["All categories"] + CATEGORIES)
+            amount = st.number_input("Amount per Month", min_value=0.01, value=100.0, format="%.2f")
+            if st.form_submit_button("Add"):
+                budget_engine.add_budget(
+                    Budget.create(user.id, kind, ALL if category == "All categories" else category, amount)
+                )
+                st.rerun()
 
         # Add a horizontal line
         st.markdown("---")
 
-        # Bar Chart for Net Balance by Category
-        st.markdown("### Net Balance by Category")
-        fig = px.bar(
-            category_comparison, x="category", y="Net",
-            labels={"Net": "Net Balance", "category": "Category"},
-            title="Net Balance by Category",
-            color="Net",
-            color_continuous_scale=px.colors.sequential.Viridis
-        )
-        st.plotly_chart(fig, use_container_width=True)
+        # Full recompute from the database, e.g. after changes made on another device
+        if st.button("Recalculate Totals"):
+            drift = budget_engine.reconcile(user.id)
+            if drift:
+                st.warning(f"Corrected {len(drift)} running totals from the database.")
+            else:
+                st.success("Running totals match the database.")
 
 
 class ProfilePage:
@@ -624,6 +1073,7 @@ class ProfilePage:
                 supabase.table("users").update({"avatar_url": new_url}).eq("id", user.id).execute()
                 st.success("Avatar updated successfully!")
                 st.session_state.user["avatar_url"] = new_url
+                security.update_profile(user.id, avatar_url=new_url)
                 st.rerun()
             else:
                 st.warning("Please enter a valid URL.")
@@ -639,6 +1089,7 @@ class ProfilePage:
                 supabase.table("users").update({"username": new_name}).eq("id", user.id).execute()
                 st.success("Name updated successfully!")
                 st.session_state.user["username"] = new_name
+                security.update_profile(user.id, username=new_name)
                 st.rerun()
             else:
                 st.warning("Please enter a valid name.")